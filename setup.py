@@ -57,6 +57,7 @@ setup(name='python-textops3',
                         'python-dateutil',
                         'python-slugify',
                         'chardet'],
-      extras_require={'docs': ['Sphinx', 'sphinxcontrib-napoleon']},
+      extras_require={'docs': ['Sphinx', 'sphinxcontrib-napoleon'],
+                      'fast': ['pyahocorasick']},
       eager_resources=['docs'],
       zip_safe=False)
@@ -0,0 +1,558 @@
+# -*- coding: utf-8 -*-
+#
+# Created : 2026-10-17
+#
+# @author: Eric Lapouyade
+#
+""" Micro-benchmarks for python-textops3
+
+Usage::
+
+    python tests/benchmarks.py                  # run all benchmarks
+    python tests/benchmarks.py compiled_plan    # run only some benchmarks
+"""
+import sys
+import os
+import timeit
+import tracemalloc
+import io
+import re
+import subprocess
+import collections
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import textops
+from textops import *
+
+benchmarks = []
+
+def benchmark(fn):
+    benchmarks.append(fn)
+    return fn
+
+def timeit_best(fn, number, repeat=5):
+    """ Returns the best time in seconds for one call of fn() """
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number
+
+def report(label, seconds, ref=None):
+    line = '    %-40s %12.2f us' % (label, seconds * 1e6)
+    if ref:
+        line += '   x%.2f' % (ref / seconds)
+    print(line)
+
+def peak_memory(fn):
+    """ Returns the peak memory in bytes allocated while calling fn() """
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def report_memory(label, nbytes, ref=None):
+    line = '    %-40s %12.2f MB' % (label, nbytes / 1e6)
+    if ref:
+        line += '   x%.2f' % (ref / nbytes)
+    print(line)
+
+@benchmark
+def compiled_plan():
+    """Per-invocation overhead of a short chain on a short input"""
+    chain = grep('error').cut(col=1).sed('1','one').upper()
+    text = ['error 1']
+
+    def uncompiled():
+        chain._plan = None
+        text >> chain
+
+    def compiled():
+        text >> chain
+
+    ref = timeit_best(uncompiled, 20000)
+    report('compile + run on every call', ref)
+    report('run from the cached plan', timeit_best(compiled, 20000), ref)
+
+@benchmark
+def fused_line_ops():
+    """Chain of line-wise ops on 100k lines, fused or not"""
+    text = [ ' 2026-10-17 %s request %d ' % ('ERROR' if i % 3 else 'INFO', i) for i in range(100000) ]
+    chain = dostrip().iffn(lambda l:l[-1] in '13579').mapif(str.upper, lambda l:'ERROR' in l)
+
+    def unfused():
+        chain.fusion = False
+        for line in text | chain:
+            pass
+
+    def fused():
+        chain.fusion = True
+        for line in text | chain:
+            pass
+
+    ref = timeit_best(unfused, 3)
+    report('one generator per op', ref)
+    report('fused into a single loop', timeit_best(fused, 3), ref)
+
+@benchmark
+def parallel_scaling():
+    """CPU-bound chain on 50k lines, single process vs parallel() with 1 to cpu_count workers"""
+    text = [ '2026-10-17 12:%02d:%02d host%d sshd[%d]: Failed password for user%d from 10.0.%d.%d'
+             % (i % 60, i % 59, i % 7, i, i % 97, i % 256, i % 253) for i in range(50000) ]
+    pattern = r'(?P<date>\S+) (?P<time>\S+) (?P<host>\S+) (?P<prog>\w+)\[(?P<pid>\d+)\]: (?P<msg>.*)'
+    ops = sed(r'(\d+)\.(\d+)\.(\d+)\.(\d+)', r'\4.\3.\2.\1').parseg(pattern)
+
+    def single():
+        for line in text | ops:
+            pass
+
+    ref = timeit_best(single, 1, 3)
+    report('single process (%d CPUs)' % (os.cpu_count() or 1), ref)
+    workers = 1
+    while workers <= max(os.cpu_count() or 1, 4):
+        chain = parallel(workers, chunk_lines=5000) | ops
+        def parallelized():
+            for line in text | chain:
+                pass
+        report('parallel(%d)' % workers, timeit_best(parallelized, 1, 3), ref)
+        workers *= 2
+
+@benchmark
+def foreach_file_scaling():
+    """parseg on 8 files of 25k lines, cat() one file after another vs foreach_file()"""
+    pattern = r'(?P<date>\S+) (?P<time>\S+) (?P<host>\S+) (?P<prog>\w+)\[(?P<pid>\d+)\]: (?P<msg>.*)'
+    paths = []
+    for nb in range(8):
+        paths.append('/tmp/textops_bench_foreach_%d.log' % nb)
+        with open(paths[-1], 'w') as fh:
+            fh.write('\n'.join(syslog_lines(25000)))
+    chain = cat().parseg(pattern).raw
+    count = cat().parseg(pattern).grepc(r'user42\b', 'msg').raw
+
+    def sequential():
+        for line in paths | chain:
+            pass
+
+    def sequential_count():
+        return paths | count
+
+    ref = timeit_best(sequential, 1, 3)
+    report('cat() then ops, all dicts', ref)
+    count_ref = timeit_best(sequential_count, 1, 3)
+    report('cat() then ops, grepc (%d CPUs)' % (os.cpu_count() or 1), count_ref)
+    workers = 1
+    while workers <= max(os.cpu_count() or 1, 4):
+        sharded_chain = foreach_file(cat().parseg(pattern), workers).raw
+        sharded_count = foreach_file(cat().parseg(pattern).grepc(r'user42\b', 'msg'), workers,
+                                     combine=sum)
+        def sharded():
+            for line in paths | sharded_chain:
+                pass
+        def sharded_count_fn():
+            return paths | sharded_count
+        assert sharded_count_fn() == sequential_count()
+        report('foreach_file(%d), all dicts' % workers, timeit_best(sharded, 1, 3), ref)
+        report('foreach_file(%d), grepc, combine=sum' % workers,
+               timeit_best(sharded_count_fn, 1, 3), count_ref)
+        workers *= 2
+    for path in paths:
+        os.remove(path)
+
+@benchmark
+def batched_ops():
+    """grep/sed/cut/mapfn/linetester chain on 100k lines, one generator per op vs op_batch()"""
+    text = [ '2026-10-17 %s request %d' % ('ERROR' if i % 3 else 'INFO', i) for i in range(100000) ]
+    chain = grep('ERROR').sed('request','req').cut(col=3).mapfn(int).greaterthan(50000)
+
+    def unbatched():
+        chain.fusion = False
+        for line in text | chain:
+            pass
+
+    def batched():
+        chain.fusion = True
+        for line in text | chain:
+            pass
+
+    ref = timeit_best(unbatched, 3)
+    report('one generator per op', ref)
+    report('chunks of %d lines through op_batch()' % textops.base.BATCH_LINES,
+           timeit_best(batched, 3), ref)
+
+@benchmark
+def raw_mode():
+    """Throughput and peak memory of 200k result lines, extended or raw"""
+    text = [ '2026-10-17 %s request number %d' % ('ERROR' if i % 3 else 'INFO', i)
+             for i in range(300000) ]
+    chain = grep('ERROR').cut(col=(1,3,4))
+    raw_chain = grep('ERROR').cut(col=(1,3,4)).raw
+
+    def to_file(chain):
+        out = io.StringIO()
+        for cols in text | chain:
+            out.write(' '.join(cols))
+
+    for label, fn in [ ('>> to a list', lambda c: text >> c), ('| written to a file', to_file) ]:
+        ref = timeit_best(lambda: fn(chain), 1, 3)
+        report('%s, extended' % label, ref)
+        report('%s, raw' % label, timeit_best(lambda: fn(raw_chain), 1, 3), ref)
+        ref = peak_memory(lambda: fn(chain))
+        report_memory('%s, extended' % label, ref)
+        report_memory('%s, raw' % label, peak_memory(lambda: fn(raw_chain)), ref)
+
+@benchmark
+def profiling_overhead():
+    """Cost of the instrumentation hooks, disabled and enabled"""
+    short = ['error 1']
+    text = [ '2026-10-17 %s request %d' % ('ERROR' if i % 3 else 'INFO', i) for i in range(100000) ]
+    chain = grep('ERROR').cut(col=3).upper()
+
+    def run_short():
+        for line in short | chain:
+            pass
+
+    def run_long():
+        for line in text | chain:
+            pass
+
+    for label, fn, number in [ ('1 line', run_short, 20000), ('100k lines', run_long, 3) ]:
+        ref = timeit_best(fn, number)
+        report('%s, no profiler' % label, ref)
+        with Profiler() as prof:
+            report('%s, profiler active' % label, timeit_best(fn, number), ref)
+
+@benchmark
+def import_time():
+    """Time to start python and import textops, in a new interpreter each time"""
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    def start(code):
+        return lambda: subprocess.check_call([sys.executable, '-c', code], cwd=base_dir)
+
+    ref = timeit_best(start('pass'), 5)
+    report('python alone', ref)
+    for code in [ 'import textops', 'from textops import grep', 'from textops import *' ]:
+        report(code, timeit_best(start(code), 5) - ref)
+
+@benchmark
+def regex_cache():
+    """600 distinct grep/sed patterns applied in turn to a short input, with a cold or a warm cache"""
+    text = [ 'host%d error %d' % (i, i) for i in range(10) ]
+    chains = [ grep('host%d ' % i).sed(r'error (\d+)', r'E\1 %d' % i) for i in range(600) ]
+
+    def run_all():
+        for chain in chains:
+            text >> chain
+
+    textops.set_regex_cache_size(0)
+    ref = timeit_best(run_all, 5)
+    report('re module cache only', ref)
+    textops.set_regex_cache_size(1024)
+    report('textops cache (1024 regexes)', timeit_best(run_all, 5), ref)
+    print('    %s' % (textops.regex_cache_info(),))
+
+def syslog_lines(nb):
+    return [ '2026-10-17 12:%02d:%02d host%d sshd[%d]: Failed password for user%d from 10.0.%d.%d'
+             % (i % 60, i % 59, i % 7, i, i % 997, i % 256, i % 253) for i in range(nb) ]
+
+@benchmark
+def multi_pattern():
+    """mgrep, sgrep and grepany with 10, 100 and 1000 patterns on 5k syslog lines"""
+    text = syslog_lines(5000)
+
+    def one_by_one(patterns):
+        # what mgrep did before MultiPattern : one search per pattern and per line
+        regexes = [ re.compile(pattern) for pattern in patterns ]
+        dct = {}
+        for line in text:
+            for i, regex in enumerate(regexes):
+                if regex.search(line):
+                    dct.setdefault(i, []).append(line)
+        return dct
+
+    for nb in (10, 100, 1000):
+        patterns = [ r'user%d\b' % (i * 7) if i % 2 else r'^2026-10-17 12:%02d:' % (i % 60)
+                     for i in range(nb) ]
+        patterns_dict = dict(enumerate(patterns))
+        textops.MultiPattern(patterns)    # the combined regexes are cached
+        ref = timeit_best(lambda: one_by_one(patterns), 1, 3)
+        report('%d patterns, one search per pattern' % nb, ref)
+        report('%d patterns, mgrep' % nb, timeit_best(lambda: text | mgrep(patterns_dict), 1, 3), ref)
+        report('%d patterns, sgrep' % nb, timeit_best(lambda: text | sgrep(patterns), 1, 3), ref)
+        report('%d patterns, grepany' % nb,
+               timeit_best(lambda: text >> grepany(patterns), 1, 3), ref)
+
+@benchmark
+def fixed_strings():
+    """grep vs fgrep on 20k syslog lines, with one literal and with a blocklist of 2000 IPs"""
+    text = syslog_lines(20000)
+    blocklist = [ '10.0.%d.%d' % (i % 256, i * 7 % 253) for i in range(2000) ]
+    regex = '|'.join( re.escape(ip) for ip in blocklist )
+    textops.compile_regex(regex)
+
+    ref = timeit_best(lambda: text >> grep('user42 '), 3)
+    report('1 literal, grep', ref)
+    report('1 literal, fgrep', timeit_best(lambda: text >> fgrep('user42 '), 3), ref)
+    ref = timeit_best(lambda: text >> grep(regex), 1, 3)
+    report('2000 literals, grep with an alternation', ref)
+    report('2000 literals, fgrep', timeit_best(lambda: text >> fgrep(blocklist), 1, 3), ref)
+
+@benchmark
+def literal_prefilter():
+    """grep, grepc, parseg, cutre and state_pattern on 100k syslog lines, 0.5% of them matching"""
+    text = syslog_lines(100000)
+    for i in range(0, len(text), 200):
+        text[i] = ( '2026-10-17 12:00:%02d host1 sshd[%d]: Accepted publickey for user%d => key%d'
+                    % (i % 60, i, i % 97, i) )
+    pattern = r'\d+ sshd\[\d+\]: Accepted publickey for (?P<user>\w+)'
+    parse_pattern = r'(?P<date>\S+) (?P<time>\S+) (?P<host>\S+) sshd\[(?P<pid>\d+)\]: Accepted (?P<msg>.*)'
+    sep = r'\s*=>\s*'
+    states = (('top', '', r'.*Accepted publickey for (?P<user>\w+)', 'users.{user}', '{user}'),)
+    for regex in (pattern, parse_pattern, sep, states[0][2]):
+        textops.required_literal(textops.compile_regex(regex))
+
+    def without_prefilter(fn):
+        # the required literals are hidden to get the timings of the regex engine alone
+        saved = dict(textops.base._required_literals)
+        for regex in saved:
+            textops.base._required_literals[regex] = (None, False)
+        try:
+            return timeit_best(fn, 1, 3)
+        finally:
+            textops.base._required_literals.update(saved)
+
+    for label, fn in [ ('grep', lambda: text >> grep(pattern)),
+                       ('grepc', lambda: text | grepc(pattern)),
+                       ('parseg', lambda: text >> parseg(parse_pattern)),
+                       ('cutre', lambda: text >> cutre(sep, col=1)),
+                       ('state_pattern', lambda: text | state_pattern(states)) ]:
+        ref = without_prefilter(fn)
+        report('%s, regex on every line' % label, ref)
+        report('%s, required literal prefilter' % label, timeit_best(fn, 1, 3), ref)
+
+@benchmark
+def grep_type_paths():
+    """grep and grepc on 100k strings, lists by index, dicts by key and objects by attribute"""
+    text = syslog_lines(100000)
+    Event = collections.namedtuple('Event', 'date time host msg')
+    inputs = [ ('strings', text, {}),
+               ('lists, key=3', [ line.split(' ', 3) for line in text ], {'key': 3}),
+               ('dicts, key=msg', [ dict(zip(('date', 'time', 'host', 'msg'), line.split(' ', 3)))
+                                    for line in text ], {'key': 'msg'}),
+               ('objects, attr=msg', [ Event(*line.split(' ', 3)) for line in text ], {'attr': 'msg'}) ]
+    for label, lines, kwargs in inputs:
+        def generic():
+            # what grep did before the dedicated loops : the per line isinstance() cascade
+            fn = grep.line_fn('user42 ', **kwargs)
+            return [ line for line in map(fn, lines) if line is not SKIP_LINE ]
+        ref = timeit_best(generic, 1, 3)
+        report('%s, generic line_fn' % label, ref)
+        report('%s, grep' % label, timeit_best(lambda: lines >> grep('user42 ', **kwargs), 1, 3), ref)
+        report('%s, grepc' % label, timeit_best(lambda: lines | grepc('user42 ', **kwargs), 1, 3), ref)
+
+@benchmark
+def bytes_mode():
+    """grep + cut on a 200k lines syslog file (0.5% matching), read as str or as bytes"""
+    path = '/tmp/textops_bench_syslog.log'
+    text = syslog_lines(200000)
+    for i in range(0, len(text), 200):
+        text[i] = text[i].replace('Failed password', 'Accepted publickey')
+    with open(path, 'w') as fh:
+        fh.write('\n'.join(text))
+
+    ref = timeit_best(lambda: path >> cat().grep('Accepted').cut(col=8), 1, 3)
+    report('cat, str patterns', ref)
+    report('bcat, str patterns (decoded by grep)',
+           timeit_best(lambda: path >> bcat().grep('Accepted').cut(col=8), 1, 3), ref)
+    report('bcat, bytes patterns',
+           timeit_best(lambda: path >> bcat().grep(b'Accepted').cut(col=8), 1, 3), ref)
+    report('bcat, bytes patterns + tostr()',
+           timeit_best(lambda: path | bcat().grep(b'Accepted').cut(col=8).tostr(), 1, 3), ref)
+    os.remove(path)
+
+@benchmark
+def file_counts():
+    """lcount and grepc on a 1M lines syslog file (0.5% matching), line by line vs binary blocks"""
+    path = '/tmp/textops_bench_syslog.log'
+    text = syslog_lines(1000000)
+    for i in range(0, len(text), 200):
+        text[i] = text[i].replace('Failed password', 'Accepted publickey')
+    with open(path, 'w') as fh:
+        fh.write('\n'.join(text))
+
+    def unmerged(chain):
+        chain.fusion = False
+        return lambda: path | chain
+
+    ref = timeit_best(unmerged(cat().lcount()), 1, 3)
+    report('cat().lcount() line by line', ref)
+    report('cat().lcount() merged', timeit_best(lambda: path | cat().lcount(), 1, 3), ref)
+    report('wcl()', timeit_best(lambda: path | wcl(), 1, 3), ref)
+    for pattern in ('Accepted', r'Accepted \w+ for user\d+', 'password'):
+        ref = timeit_best(unmerged(cat().grepc(pattern)), 1, 3)
+        report('cat().grepc(%r) line by line' % pattern, ref)
+        report('cat().grepc(%r) merged' % pattern,
+               timeit_best(lambda: path | cat().grepc(pattern), 1, 3), ref)
+    os.remove(path)
+
+@benchmark
+def context_window():
+    """tail, less, findhighlight and grepctx on 200k syslog lines (0.5% matching)"""
+    text = syslog_lines(200000)
+    for i in range(0, len(text), 200):
+        text[i] = text[i].replace('Failed password', 'Accepted publickey')
+
+    def list_tail():
+        buffer = []
+        for line in text:
+            buffer.append(line)
+            if len(buffer) > 10000:
+                buffer.pop(0)
+        return buffer
+
+    def list_less():
+        buffer = []
+        for line in text:
+            buffer.append(line)
+            if len(buffer) > 10000:
+                yield buffer.pop(0)
+
+    ref = timeit_best(list_tail, 1, 3)
+    report('list.pop(0) buffer, last 10000 lines', ref)
+    report('tail(10000)', timeit_best(lambda: text >> tail(10000).raw, 1, 3), ref)
+    ref = timeit_best(lambda: list(list_less()), 1, 3)
+    report('list.pop(0) buffer, all but 10000 lines', ref)
+    report('less(10000)', timeit_best(lambda: text >> less(10000).raw, 1, 3), ref)
+    report('findhighlight(nlines=2)',
+           timeit_best(lambda: text >> findhighlight('Accepted', nlines=2).raw, 1, 3))
+    report('findhighlight(nlines=2, line_nbr=True)',
+           timeit_best(lambda: text >> findhighlight('Accepted', nlines=2, line_nbr=True).raw, 1, 3))
+    report('grepctx(before=2, after=2)',
+           timeit_best(lambda: text >> grepctx('Accepted', 2, 2).raw, 1, 3))
+
+@benchmark
+def time_range():
+    """5 minutes out of a sorted 1M lines day log, cat().inrange() vs timerange()"""
+    path = '/tmp/textops_bench_day.log'
+    with open(path, 'w') as fh:
+        for i, line in enumerate(syslog_lines(1000000)):
+            secs = i * 86400 // 1000000
+            fh.write('2026-10-17 %02d:%02d:%02d%s\n' % (secs // 3600, secs // 60 % 60, secs % 60,
+                                                       line[19:]))
+    start, end = '2026-10-17 10:00:00', '2026-10-17 10:05:00'
+
+    ref = timeit_best(lambda: path >> cat().inrange(start, end), 1, 3)
+    report('cat().inrange()', ref)
+    report('timerange()', timeit_best(lambda: path >> timerange(start, end), 1, 3), ref)
+    report('timerange() with ts_format',
+           timeit_best(lambda: path >> timerange(start, end, ts_format='%Y-%m-%d %H:%M:%S'), 1, 3),
+           ref)
+    assert path >> timerange(start, end) == path >> cat().inrange(start, end)
+    os.remove(path)
+
+@benchmark
+def uniq_lines():
+    """uniq on 50k syslog lines having 5000 distinct ones, list lookups vs set, LRU and Bloom"""
+    text = [ line[20:] for line in syslog_lines(5000) ] * 10
+    records = [ line.split() for line in text ]
+
+    def list_uniq():
+        seen = []
+        for line in text:
+            if line not in seen:
+                seen.append(line)
+                yield line
+
+    ref = timeit_best(lambda: list(list_uniq()), 1, 1)
+    report('list lookups', ref)
+    report('uniq()', timeit_best(lambda: text >> uniq().raw, 1, 3), ref)
+    report('uniq() on lists', timeit_best(lambda: records >> uniq().raw, 1, 3), ref)
+    report('uniq(key=1) on lists', timeit_best(lambda: records >> uniq(key=1).raw, 1, 3), ref)
+    report('uniq(window=1000)', timeit_best(lambda: text >> uniq(window=1000).raw, 1, 3), ref)
+    report('uniq(bloom=5000)', timeit_best(lambda: text >> uniq(bloom=5000).raw, 1, 3), ref)
+    assert text >> uniq() == list(list_uniq())
+
+@benchmark
+def external_sorting():
+    """Sort a 300k lines file read by cat(), in memory vs max_memory=8MB (time and peak memory)"""
+    path = '/tmp/textops_bench_sort.log'
+    with open(path, 'w') as fh:
+        for line in syslog_lines(300000):
+            fh.write(line[20:] + '\n')
+    consume = lambda chain: collections.deque(path | chain, maxlen=0)
+
+    ref = timeit_best(lambda: consume(cat().dosort().raw), 1, 3)
+    report('dosort()', ref)
+    report('dosort(max_memory=8MB)',
+           timeit_best(lambda: consume(cat().dosort(max_memory=8 << 20).raw), 1, 3), ref)
+    ref = peak_memory(lambda: consume(cat().dosort().raw))
+    report_memory('dosort()', ref)
+    report_memory('dosort(max_memory=8MB)',
+                  peak_memory(lambda: consume(cat().dosort(max_memory=8 << 20).raw)), ref)
+    assert path >> cat().dosort(max_memory=8 << 20) == path >> cat().dosort()
+    os.remove(path)
+
+@benchmark
+def top_k():
+    """20 biggest out of 300k access log dicts : sort then head vs merged sort+head vs topk"""
+    logs = [ {'url': '/page/%d' % (i * 7919 % 1000), 'bytes': i * 104729 % 1000003}
+             for i in range(300000) ]
+    unmerged = sortdicts('bytes', reverse=True).head(20).raw
+    unmerged.fusion = False
+
+    ref = timeit_best(lambda: logs >> unmerged, 1, 3)
+    report('sortdicts() then head(20)', ref)
+    report('sortdicts().head(20) merged',
+           timeit_best(lambda: logs >> sortdicts('bytes', reverse=True).head(20).raw, 1, 3), ref)
+    report('topk(20)', timeit_best(lambda: logs >> topk(20, 'bytes').raw, 1, 3), ref)
+    assert logs >> topk(20, 'bytes').raw == logs >> unmerged
+
+@benchmark
+def group_by():
+    """hits, bytes and max size per url on 200k access log dicts : doreduce lambda vs groupby"""
+    logs = [ {'url': '/page/%d' % (i * 7919 % 100), 'size': str(i * 104729 % 10007)}
+             for i in range(200000) ]
+
+    def reduce_fn(groups, log):
+        group = groups.setdefault(log['url'], {'url': log['url'], 'hits': 0, 'bytes': 0, 'max': 0})
+        size = int(log['size'])
+        group['hits'] += 1
+        group['bytes'] += size
+        group['max'] = max(group['max'], size)
+        return groups
+    aggs = {'hits': 'count', 'bytes': ('sum', 'size'), 'max': ('max', 'size', int)}
+
+    ref = timeit_best(lambda: list((logs >> doreduce(reduce_fn, {}).raw).values()), 1, 3)
+    report('doreduce(lambda)', ref)
+    report('groupby()', timeit_best(lambda: logs >> groupby('url', aggs).raw, 1, 3), ref)
+    assert logs >> groupby('url', aggs) == list((logs >> doreduce(reduce_fn, {})).values())
+
+@benchmark
+def hash_join():
+    """200k access log dicts joined with 20k accounts : hand-written dict vs hashjoin"""
+    logs = [ {'uid': str(i * 7919 % 25000), 'url': '/page/%d' % (i % 100)} for i in range(200000) ]
+    accounts = [ {'uid': str(i), 'account': 'user%d' % i} for i in range(20000) ]
+
+    def dict_join():
+        by_uid = {}
+        for account in accounts:
+            by_uid.setdefault(account['uid'], []).append(account)
+        for log in logs:
+            for account in by_uid.get(log['uid'], ()):
+                merged = dict(log)
+                merged.update((k, v) for k, v in account.items() if k not in log)
+                yield merged
+
+    ref = timeit_best(lambda: list(dict_join()), 1, 3)
+    report('hand-written dict', ref)
+    report('hashjoin()', timeit_best(lambda: logs >> hashjoin(accounts, 'uid').raw, 1, 3), ref)
+    report('hashjoin(max_memory=1MB), spilled',
+           timeit_best(lambda: logs >> hashjoin(accounts, 'uid', max_memory=1 << 20).raw, 1, 1),
+           ref)
+    assert logs >> hashjoin(accounts, 'uid').raw == list(dict_join())
+    assert logs >> hashjoin(accounts, 'uid', max_memory=1 << 20).raw == list(dict_join())
+
+if __name__ == '__main__':
+    names = sys.argv[1:]
+    for fn in benchmarks:
+        if not names or fn.__name__ in names:
+            print('%s : %s' % (fn.__name__, fn.__doc__))
+            fn()
@@ -8,6 +8,7 @@ modules = [ 'textops.base',
             'textops.ops.fileops',
             'textops.ops.listops',
             'textops.ops.parse',
+            'textops.ops.poolops',
             'textops.ops.recode',
             'textops.ops.runops',
             'textops.ops.strops',
@@ -27,6 +28,42 @@ for m in modules:
     failed += fcount
     tested += tcount
 
+# every op must be in the __all__ of its submodule, and this __all__ in the table of textops.ops
+import textops.ops
+for m in modules:
+    if m.startswith('textops.ops.'):
+        mod = __import__(m,fromlist=[''])
+        tested += 1
+        if set(mod.__all__) != set(textops.ops._submodules[m.rsplit('.',1)[1]]):
+            print('*** %s.__all__ differs from textops.ops._submodules' % m)
+            failed += 1
+        for name, obj in vars(mod).items():
+            if isinstance(obj,type) and issubclass(obj,TextOp) and obj.__module__ == m:
+                tested += 1
+                if name not in mod.__all__ or getattr(textops.ops,name,None) is not obj:
+                    print('*** %s.%s is not declared in %s.__all__' % (m,name,m))
+                    failed += 1
+
+# run() must kill its command when the next op stops reading : checked only if the commands exist,
+# in a thread so that a command not killed makes the test fail instead of hanging
+import shutil
+import threading
+print('Testing run() kill on close ...')
+if shutil.which('yes') and shutil.which('seq'):
+    for cmd, pipeline, expected in [ ('yes', run().head(3).tolist(), ['y', 'y', 'y']),
+                                     ('seq 1000000000', run().first(), '1') ]:
+        tested += 1
+        results = []
+        thread = threading.Thread(target=lambda: results.append(cmd | pipeline), daemon=True)
+        thread.start()
+        thread.join(30)
+        if results != [expected]:
+            print('*** %r | run() : got %r instead of %r (command not killed ?)'
+                  % (cmd, results[0] if results else None, expected))
+            failed += 1
+else:
+    print('Skipped : yes or seq command not found')
+
 base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 for f in files:
     print('Testing %s ...' % f)
@@ -13,6 +13,8 @@ __maintainer__ = 'Eric Lapouyade'
 __status__ = 'Beta'
 
 import logging
+import os
+import re
 
 try:  # Python 2.7+
     from logging import NullHandler
@@ -25,9 +27,33 @@ logger = logging.getLogger(__name__)
 logger.addHandler(NullHandler())
 
 # Do not use .base instead of textops.base otherwise readthedocs.org cannot see base.py module.
-from textops.base import TextOp, WrapOp, WrapOpIter, WrapOpStr, add_textop, add_textop_iter, \
-    StrExt, BytesExt, TupleExt, ListExt, DictExt, NoAttrDict, NoAttr, DefaultList, \
-    DefaultDict, string_formatter, dictmerge, vformat, dformat, eformat, \
-    stru, activate_debug, pp, extend_type, extend_type_gen, decode_bytes
+_base_names = ['TextOp', 'WrapOp', 'WrapOpIter', 'WrapOpStr', 'LineOp', 'SKIP_LINE', 'Pipeline',
+    'Profiler', 'explain_analyze', 'add_textop', 'add_textop_iter', 'StrExt', 'BytesExt',
+    'TupleExt', 'ListExt', 'DictExt', 'NoAttrDict', 'NoAttr', 'DefaultList', 'DefaultDict',
+    'string_formatter', 'dictmerge', 'vformat', 'dformat', 'eformat', 'stru', 'strb',
+    'activate_debug', 'set_debug', 'set_raw', 'pp', 'extend_type', 'extend_type_gen',
+    'decode_bytes', 'compile_regex', 'set_regex_cache_size', 'regex_cache_info', 'clear_regex_cache',
+    'required_literal', 'exact_literal', 'literal_search', 'literal_filter', 'MultiPattern',
+    'FixedStrings', 'BloomFilter', 'pattern_type']
+
+from textops.base import TextOp, WrapOp, WrapOpIter, WrapOpStr, LineOp, SKIP_LINE, Pipeline, \
+    Profiler, explain_analyze, add_textop, add_textop_iter, StrExt, BytesExt, TupleExt, ListExt, \
+    DictExt, NoAttrDict, NoAttr, DefaultList, DefaultDict, string_formatter, dictmerge, vformat, \
+    dformat, eformat, stru, strb, activate_debug, set_debug, set_raw, pp, extend_type, \
+    extend_type_gen, decode_bytes, compile_regex, set_regex_cache_size, regex_cache_info, \
+    clear_regex_cache, required_literal, exact_literal, literal_search, literal_filter, \
+    MultiPattern, FixedStrings, BloomFilter, pattern_type
 from . import ops
-from .ops import *
+
+# ops are imported from their submodule on first access (see textops.ops)
+def __getattr__(name):
+    try:
+        return getattr(ops, name)
+    except AttributeError:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name)) from None
+
+def __dir__():
+    return sorted(set(globals()) | set(dir(ops)))
+
+# re and os were exported by 'from textops import *' in previous versions : scripts may rely on it
+__all__ = _base_names + ['logger', 're', 'os'] + ops.__all__
@@ -10,15 +10,17 @@ import os
 import sys
 import re
 import types
+import itertools
+import operator
+import collections
+import math
+import time
+import threading
 import textops
 from addicted import NoAttrDict, NoAttr
 import string
 import logging
 import pprint
-try:
-    import cchardet as chardet
-except ImportError:
-    import chardet
 from collections import abc
 pp = pprint.PrettyPrinter(indent=4)
 
@@ -45,16 +47,48 @@ class TextOp(object):
 
     All operations must be derived from this class. Subclasses must redefine an ``op()`` method
     that will be called when the operations will be triggered by an input text.
+
+    Operations working line by line may also define a ``line_fn()`` classmethod (see
+    :class:`LineOp`) : consecutive such operations are then fused into a single loop
+    unless ``fusion`` is set to False on the TextOp instance.
+
+    They can also define an ``op_batch(lines, *args, **kwargs)`` classmethod that receives a list of
+    lines and returns the list of the resulting lines : the input text is then processed by chunks
+    of ``BATCH_LINES`` lines with list comprehensions instead of one generator per op.
+    The arguments given to ``op_batch()`` may be prepared once for all the chunks by a
+    ``batch_args(*args, **kwargs)`` classmethod returning the new ``(args, kwargs)`` : this is
+    where costly objects like compiled patterns should be built.
+
+    An op may also define a ``merge_step(step, next_step)`` classmethod returning a
+    :class:`MergedStep` that does the job of the op and of the op following it in a faster way,
+    or None if the two steps cannot be merged (see :func:`merge_steps`).
+
+    An op that may stop reading its input before the end (like :class:`textops.head`) sets
+    ``stops_early`` : the line-wise ops before it are then not processed by chunks, so that no line
+    is processed after the ones it needs.
     """
+    line_fn = None
+    op_batch = None
+    batch_args = None
+    fusable = True
+    fuse_as_head = True
+    absorb_line_ops = False
+    merge_step = None
+    fusion = True
+    raw_mode = False
+    stops_early = False
+
     def __init__(self,*args,**kwargs):
         self.ops = [[self.__class__.__name__, args, kwargs]]
         self.op = None
         self.debug = kwargs.get('debug',False)
+        self._plan = None
 
     def __getattr__(self,attr):
         if not attr.startswith('_'):
             self.ops.append([attr, (), {}])
             self.op = attr
+            self._plan = None
         else:
             raise AttributeError()
         return self
@@ -62,7 +96,8 @@ class TextOp(object):
     def __or__(self,other):
         if not isinstance(other,TextOp):
             raise TextOpException('Please use "|" only between two TextOp or AFTER a string or a list')
-        self.ops += other.ops
+        self.ops += [ list(op) for op in other.ops ]
+        self._plan = None
         return self
 
     def __ror__(self,text):
@@ -71,13 +106,16 @@ class TextOp(object):
     def __rrshift__(self,text):
         result = self._process(text, piped=True)
         if isinstance(result, (types.GeneratorType,enumerate)):
+            if self.raw_mode or _raw_mode:
+                return list(result)
             return ListExt(result)
         return result
 
     def __rshift__(self,other):
         if not isinstance(other,TextOp):
             raise TextOpException('Please use ">>" only between two TextOp or AFTER a string or a list')
-        self.ops += other.ops
+        self.ops += [ list(op) for op in other.ops ]
+        self._plan = None
         return self
 
     def __str__(self):
@@ -97,66 +135,108 @@ class TextOp(object):
             self.ops[-1][1] = args
             self.ops[-1][2] = kwargs
             self.op = None
+            self._plan = None
             return self
         else:
             return self._process(args and args[0] or None)
 
     def _process(self,text=None, piped=False):
-        input_text = text
-        if self.debug:
-            if isinstance(text, types.GeneratorType):
-                text = list(text)
-            logger.debug('=== TextOps : %r' % self)
-            logger.debug(DebugText(text))
-        for i,(op,args,kwargs) in enumerate(self.ops):
-            if not piped and not i and not input_text and args:
-                text = args[0]
-                args = args[1:]
-            opcls = getattr(textops.ops,op,None)
-            if isinstance(opcls,type) and issubclass(opcls, TextOp):
-                try:
-                    text = opcls.op(text, *args, **kwargs)
-                    if self.debug:
-                        if isinstance(text, types.GeneratorType):
-                            text = list(text)
-                        logger.debug('--- Op : %s(%s,%s)',op,args,kwargs)
-                        logger.debug(DebugText(text))
-                    if text is None:
-                         return text
-                except TypeError:
-                    logger.error('*** bad parameters for %s()' % opcls.__name__)
-                    raise
-            elif hasattr(text,op):
-                text = getattr(text,op)(*args, **kwargs)
-            else:
-                extext = extend_type(text)
-                if hasattr(extext,op):
-                    text = getattr(extext,op)(*args, **kwargs)
-                elif isinstance(text, (types.GeneratorType,enumerate,list)):
-                    text = self._apply_op_gen(text,op,*args, **kwargs)
-                else:
-                    raise TextOpException('Unknown OP "%s"' % op)
+        return run_plan(self.plan, text, piped, self.debug, self.fusion, self.raw_mode or _raw_mode)
 
-        return extend_type(text)
+    @property
+    def raw(self):
+        r"""Switch the chain to raw mode and return it
 
-    def _apply_op_gen(self, text, op, *args, **kwargs):
-        for line in text:
-            if hasattr(line,op):
-                yield getattr(line,op)(*args, **kwargs)
-            else:
-                extext = extend_type(text)
-                if hasattr(extext,op):
-                    yield getattr(extext,op)(*args, **kwargs)
-                else:
-                    raise TextOpException('Unknown OP "%s"' % op)
+        In raw mode, results are not extended : plain str, list, dict, or generators of plain
+        objects are returned instead of :class:`StrExt`, :class:`ListExt`, :class:`DictExt` ...
+        This avoids a copy of every string and a wrapper object per item. Use :func:`set_raw`
+        to change the default mode. Note that conversion ops like ``tolist()`` still return
+        extended objects : use ``>>`` to get a plain list.
+
+        Examples:
+
+            >>> type('a b' | cut(col=1))
+            <class 'textops.base.StrExt'>
+            >>> type('a b' | cut(col=1).raw)
+            <class 'str'>
+            >>> lines = ['error 1','info 2','error 3'] >> grep('error').cut(col=1).raw
+            >>> lines, type(lines), type(lines[0])
+            (['1', '3'], <class 'list'>, <class 'str'>)
+            >>> [ type(line) for line in ['a','b'] | grep('a').raw ]
+            [<class 'str'>]
+            >>> set_raw(True)
+            >>> type('a b' | cut(col=1))
+            <class 'str'>
+            >>> set_raw(False)
+        """
+        self.raw_mode = True
+        return self
+
+    @property
+    def plan(self):
+        r"""Execution plan of the chained operations
+
+        The plan is compiled once from :attr:`ops` : op classes are resolved and arguments are
+        bound, it is then cached on the TextOp and compiled again only if the chain is modified.
+
+        Examples:
+
+            >>> ops = grep('error').cut(col=1).upper()
+            >>> ops.plan                                        #doctest: +NORMALIZE_WHITESPACE
+            (PlanStep('grep', ('error',), {}), PlanStep('cut', (), {'col': 1}),
+            PlanStep('upper', (), {}))
+            >>> ops.plan is ops.plan
+            True
+            >>> ops.plan[0].opcls
+            <class 'textops.ops.listops.grep'>
+            >>> ops.plan[2].opcls is None
+            True
+            >>> ['error 1','info 2','error 3'] >> ops
+            ['1', '3']
+            >>> ops = ops.sed('1','one')
+            >>> ['error 1','info 2','error 3'] >> ops
+            ['one', '3']
+            >>> ops.plan.fused                                  #doctest: +NORMALIZE_WHITESPACE
+            (BatchStep(grep('error').cut(col=1)), PlanStep('upper', (), {}),
+            BatchStep(sed('1','one')))
+        """
+        plan = self._plan
+        if plan is None or plan.ops is not self.ops or plan.version != _registry_version:
+            plan = self._plan = compile_plan(self.ops)
+        return plan
+
+    def explain_analyze(self, text):
+        r"""Runs the chained operations on text and returns the profiling report
+
+        The report shows the time spent and the number of items and bytes at the input and at
+        the output of every step, see :class:`Profiler`.
+
+        Examples:
+
+            >>> print(grep('error').cut(col=1).explain_analyze(['error 1','info 2']))  #doctest: +ELLIPSIS
+            Explain analyze : grep('error').cut(col=1)
+               wall ms    self ms     cpu ms   items in  items out   bytes in  bytes out  step
+            ...  grep('error').cut(col=1) [batch]
+        """
+        return explain_analyze(self, text)
+
+    def freeze(self):
+        r"""Returns a frozen copy of the chained operations as a :class:`Pipeline`
+
+        Examples:
+
+            >>> ops = grep('error').cut(col=1)
+            >>> pipeline = ops.freeze()
+            >>> pipeline
+            Pipeline(grep('error').cut(col=1))
+            >>> ops = ops.upper()
+            >>> ['error 1','info 2'] >> pipeline
+            ['1']
+        """
+        return Pipeline(self)
 
     def __repr__(self):
-        rops = []
-        for op,args,kwargs in self.ops:
-            opargs = [ '%r' % v if isinstance(v,(str,int,float)) else v for v in args ]
-            opargs += [ '%s=%r' % (k,v) for k,v in list(kwargs.items()) ]
-            rops.append('%s(%s)' % (op,','.join(map(str,opargs))))
-        return '.'.join(rops)
+        return ops_repr(self.ops)
 
     @classmethod
     def make_gen(cls, text, return_if_none=None):
@@ -494,6 +574,810 @@ class TextOp(object):
         lst = self.l
         return lst.__getitem__(item)
 
+_registry_version = 0
+
+class PlanStep(object):
+    """One step of an execution plan : an op name with its resolved class and bound arguments"""
+    __slots__ = ('name', 'opcls', 'fn', 'args', 'kwargs')
+
+    def __init__(self, name, opcls, args, kwargs):
+        self.name = name
+        self.opcls = opcls
+        self.fn = opcls.op if opcls is not None else None
+        self.args = tuple(args)
+        self.kwargs = dict(kwargs)
+
+    def __repr__(self):
+        return 'PlanStep(%r, %r, %r)' % (self.name, self.args, self.kwargs)
+
+    @property
+    def label(self):
+        """Short description of the step for reports"""
+        return ops_repr([ (self.name, self.args, self.kwargs) ])
+
+class FusedStep(PlanStep):
+    """A run of consecutive line-wise steps executed as a single loop
+
+    The arguments of the step are the ones of the first op of the run so the input text may
+    still be given as the first argument of the first op.
+    """
+    __slots__ = ('steps',)
+
+    def __init__(self, steps):
+        head = steps[0]
+        PlanStep.__init__(self, head.name, head.opcls, head.args, head.kwargs)
+        self.steps = steps
+        self.fn = self.run
+
+    def run(self, text, *args, **kwargs):
+        head = self.steps[0]
+        line_fns = [ line_fn(head.opcls, args, kwargs) ]
+        line_fns += [ line_fn(step.opcls, step.args, step.kwargs) for step in self.steps[1:] ]
+        yield from fused_loop(len(line_fns))(head.opcls._tolist(text), *line_fns)
+
+    def __repr__(self):
+        return 'FusedStep(%s)' % ops_repr([ (s.name, s.args, s.kwargs) for s in self.steps ])
+
+    @property
+    def label(self):
+        return '%s [fused]' % ops_repr([ (s.name, s.args, s.kwargs) for s in self.steps ])
+
+BATCH_LINES = 1000
+
+class BatchStep(PlanStep):
+    """A run of consecutive line-wise steps executed on chunks of lines
+
+    Each op processes the whole chunk at once with its ``op_batch()``, or with its ``line_fn()``
+    if it has no ``op_batch()``. Like :class:`FusedStep`, the arguments of the step are the
+    ones of the first op of the run.
+
+    Only a list of lines (or a string) is processed by chunks : other inputs (generators, files...)
+    may be live sources or may be closed as soon as the needed lines are read, so their lines
+    are processed one by one as they come, like in a :class:`FusedStep`.
+
+    Examples:
+
+        >>> def source():
+        ...     yield 'waiting'
+        ...     yield 'ready'
+        ...     raise Exception('read past the answer')
+        >>> source() | grep('ready').mapfn(str.upper).first()
+        'READY'
+
+    Nor are the lines of a list when an op stopping early follows :
+
+        >>> ['1', '2', 'x'] | mapfn(int).first()
+        1
+        >>> ['1', '2', 'x'] >> mapfn(int).head(1)
+        [1]
+    """
+    __slots__ = ('steps',)
+
+    def __init__(self, steps):
+        head = steps[0]
+        PlanStep.__init__(self, head.name, head.opcls, head.args, head.kwargs)
+        self.steps = steps
+        self.fn = self.run
+
+    def run(self, text, *args, **kwargs):
+        head = self.steps[0]
+        lines = head.opcls._tolist(text)
+        if not isinstance(lines, (list, tuple)):
+            line_fns = [ line_fn(head.opcls, args, kwargs) ]
+            line_fns += [ line_fn(step.opcls, step.args, step.kwargs) for step in self.steps[1:] ]
+            yield from fused_loop(len(line_fns))(lines, *line_fns)
+            return
+        batch_fns = [ batch_fn(head.opcls, args, kwargs) ]
+        batch_fns += [ batch_fn(step.opcls, step.args, step.kwargs) for step in self.steps[1:] ]
+        for i in range(0, len(lines), BATCH_LINES):
+            chunk = lines[i:i + BATCH_LINES]
+            for fn in batch_fns:
+                chunk = fn(chunk)
+            yield from chunk
+
+    def __repr__(self):
+        return 'BatchStep(%s)' % ops_repr([ (s.name, s.args, s.kwargs) for s in self.steps ])
+
+    @property
+    def label(self):
+        return '%s [batch]' % ops_repr([ (s.name, s.args, s.kwargs) for s in self.steps ])
+
+def line_fn(opcls, args, kwargs):
+    """Returns a function processing one line for an op with its arguments
+
+    It returns the processed line or ``SKIP_LINE``. An op having only an ``op_batch()`` is given
+    one line at a time.
+    """
+    if has_line_fn(opcls):
+        return opcls.line_fn(*args, **kwargs)
+    op_batch = opcls.op_batch
+    if opcls.batch_args is not None:
+        args, kwargs = opcls.batch_args(*args, **kwargs)
+    def fn(line):
+        lines = op_batch([line], *args, **kwargs)
+        return lines[0] if lines else SKIP_LINE
+    return fn
+
+def batch_fn(opcls, args, kwargs):
+    """Returns a function processing a list of lines for an op with its arguments
+
+    The arguments are prepared once by the ``batch_args()`` of the op if any, then given to each
+    ``op_batch()`` call.
+    """
+    if has_op_batch(opcls):
+        op_batch = opcls.op_batch
+        if opcls.batch_args is not None:
+            args, kwargs = opcls.batch_args(*args, **kwargs)
+        return lambda lines: op_batch(lines, *args, **kwargs)
+    fn = opcls.line_fn(*args, **kwargs)
+    return lambda lines: [ line for line in map(fn, lines) if line is not SKIP_LINE ]
+
+class AbsorbingStep(PlanStep):
+    """A step whose op runs itself the line-wise steps following it
+
+    The op receives these steps in its ``line_steps`` keyword argument.
+    """
+    __slots__ = ('steps',)
+
+    def __init__(self, step, steps):
+        PlanStep.__init__(self, step.name, step.opcls, step.args, step.kwargs)
+        self.steps = steps
+        self.fn = self.run
+
+    def run(self, text, *args, **kwargs):
+        return self.opcls.op(text, *args, line_steps=self.steps, **kwargs)
+
+    def __repr__(self):
+        steps = ((self.name, self.args, self.kwargs),) + tuple( (s.name, s.args, s.kwargs) for s in self.steps )
+        return 'AbsorbingStep(%s)' % ops_repr(steps)
+
+    @property
+    def label(self):
+        steps = ((self.name, self.args, self.kwargs),) + tuple( (s.name, s.args, s.kwargs) for s in self.steps )
+        return '%s [absorbed]' % ops_repr(steps)
+
+class MergedStep(PlanStep):
+    """Consecutive steps replaced by a single function doing the same job in a faster way
+
+    The function is given by the ``merge_step()`` classmethod of the first op and, like for a
+    :class:`FusedStep`, it receives the input text and the arguments of the first op.
+    """
+    __slots__ = ('steps',)
+
+    def __init__(self, steps, fn):
+        head = steps[0]
+        PlanStep.__init__(self, head.name, head.opcls, head.args, head.kwargs)
+        self.steps = steps
+        self.fn = fn
+
+    def __repr__(self):
+        return 'MergedStep(%s)' % ops_repr([ (s.name, s.args, s.kwargs) for s in self.steps ])
+
+    @property
+    def label(self):
+        return '%s [merged]' % ops_repr([ (s.name, s.args, s.kwargs) for s in self.steps ])
+
+_fused_loops = {}
+
+def fused_loop(nb_fns):
+    """Returns a generator function applying ``nb_fns`` line functions on every line
+
+    The loop is unrolled so that a line goes through all the functions without any inner loop
+    nor generator hand-off : the generated code is cached by number of functions.
+    """
+    loop = _fused_loops.get(nb_fns)
+    if loop is None:
+        fns = ', '.join('fn%d' % i for i in range(nb_fns))
+        src = 'def fused_loop(lines, %s):\n    for line in lines:\n' % fns
+        for i in range(nb_fns):
+            src += '        line = fn%d(line)\n        if line is SKIP_LINE: continue\n' % i
+        src += '        yield line\n'
+        namespace = {'SKIP_LINE': SKIP_LINE}
+        exec(src, namespace)
+        loop = _fused_loops[nb_fns] = namespace['fused_loop']
+    return loop
+
+class Plan(tuple):
+    """Compiled execution plan : a tuple of :class:`PlanStep`
+
+    ``ops`` is the ops list the plan has been compiled from and ``version`` the ops registry
+    version at compile time : it changes each time a new op is declared with :func:`add_textop`.
+    ``fused`` holds the same steps where runs of line-wise ops are replaced by a :class:`FusedStep`
+    and where the steps merged by an op ``merge_step()`` are replaced by a :class:`MergedStep`.
+    """
+    ops = None
+    version = None
+    fused = None
+
+def resolve_op(name):
+    """Returns the TextOp class registered as ``name`` in :mod:`textops.ops` or None"""
+    opcls = getattr(textops.ops,name,None)
+    if isinstance(opcls,type) and issubclass(opcls, TextOp):
+        return opcls
+    return None
+
+def is_text_method(name):
+    """Tells whether ``name`` is a method of the texts the ops are run on (str, bytes, list...)"""
+    return any( hasattr(cls, name) for cls in (StrExt, BytesExt, ListExt, TupleExt, DictExt) )
+
+def compile_plan(ops):
+    """Compiles a list of ``[op_name, args, kwargs]`` into an execution :class:`Plan`"""
+    plan = Plan(PlanStep(name, resolve_op(name), args, kwargs) for name,args,kwargs in ops)
+    plan.ops = ops
+    plan.version = _registry_version
+    plan.fused = fuse_steps(merge_steps(plan))
+    return plan
+
+def _defining_class(cls, attr):
+    for klass in cls.__mro__:
+        if attr in klass.__dict__:
+            return klass
+
+def _has_own(opcls, attr):
+    # the attr must not be shadowed by an op() overriden in a child class
+    if opcls is None or getattr(opcls, attr) is None:
+        return False
+    return issubclass(_defining_class(opcls,attr), _defining_class(opcls,'op'))
+
+def has_line_fn(opcls):
+    """Tells whether an op defines a ``line_fn()`` not shadowed by an ``op()`` overriden in a child class"""
+    return _has_own(opcls,'line_fn')
+
+def has_op_batch(opcls):
+    """Tells whether an op defines an ``op_batch()`` not shadowed by an ``op()`` overriden in a child class"""
+    return _has_own(opcls,'op_batch')
+
+def is_line_op(opcls):
+    """Tells whether an op works line by line, that is has a ``line_fn()`` or an ``op_batch()``"""
+    return has_line_fn(opcls) or has_op_batch(opcls)
+
+def is_fusable(opcls, head=False):
+    """Tells whether an op can be part of a :class:`FusedStep` or a :class:`BatchStep`
+
+    The op must work line by line and have its ``fusable`` attribute set. The first op of a run must
+    also accept any input text (``fuse_as_head``).
+    """
+    if head and opcls is not None and not opcls.fuse_as_head:
+        return False
+    return is_line_op(opcls) and opcls.fusable
+
+def merge_steps(steps):
+    """Replaces a step and the next one by the :class:`MergedStep` the ``merge_step()`` of its op returns"""
+    steps = list(steps)
+    merged = []
+    i = 0
+    while i < len(steps):
+        step = steps[i]
+        if step.opcls is not None and step.opcls.merge_step is not None and i + 1 < len(steps):
+            merged_step = step.opcls.merge_step(step, steps[i+1])
+            if merged_step is not None:
+                merged.append(merged_step)
+                i += 2
+                continue
+        merged.append(step)
+        i += 1
+    return tuple(merged)
+
+def fuse_steps(steps):
+    """Replaces runs of consecutive line-wise steps by a :class:`BatchStep` or a :class:`FusedStep`
+
+    A run having at least one op with an ``op_batch()`` is processed by chunks in a
+    :class:`BatchStep` unless an op stopping early (``stops_early``) follows it, otherwise runs of
+    at least 2 ops are fused in a :class:`FusedStep`.
+    The line-wise steps following an op having ``absorb_line_ops`` set are given to that op
+    within an :class:`AbsorbingStep`.
+    """
+    steps = list(steps)
+    fused = []
+    i = 0
+    while i < len(steps):
+        step = steps[i]
+        j = i + 1
+        if isinstance(step, MergedStep):
+            fused.append(step)
+        elif step.opcls is not None and step.opcls.absorb_line_ops:
+            while j < len(steps) and is_line_op(steps[j].opcls):
+                j += 1
+            fused.append(AbsorbingStep(step, tuple(steps[i+1:j])))
+        elif is_fusable(step.opcls, head=True):
+            while j < len(steps) and is_fusable(steps[j].opcls):
+                j += 1
+            run = tuple(steps[i:j])
+            stopping = any(getattr(s.opcls, 'stops_early', False) for s in steps[j:])
+            if not stopping and any(has_op_batch(s.opcls) for s in run):
+                fused.append(BatchStep(run))
+            else:
+                fused.append(FusedStep(run) if len(run) > 1 else step)
+        else:
+            fused.append(step)
+        i = j
+    return tuple(fused)
+
+def close_gens(gens):
+    """Closes generators in the pipeline order"""
+    for gen in gens:
+        gen.close()
+
+def closing_gen(gen, upstream, extend=True):
+    """Yields the items of ``gen`` then closes the ``upstream`` generators
+
+    The upstream generators are closed as soon as ``gen`` is exhausted or closed, even when they
+    have not been read to the end : an op like :class:`textops.head` that stops reading its
+    input releases the opened files and kills the commands run by the operations before it.
+    """
+    try:
+        if extend:
+            for item in gen:
+                yield extend_type(item)
+        else:
+            yield from gen
+    finally:
+        close_gens(upstream)
+        gen.close()
+
+def run_plan(plan, text=None, piped=False, debug=False, fusion=True, raw=False):
+    """Runs an execution :class:`Plan` against an input text
+
+    Line-wise ops are fused into a single loop if ``fusion`` is True, except in debug mode
+    where the result of every op has to be logged. If ``raw`` is True, the result is returned
+    as is, otherwise it is extended with :func:`extend_type`.
+    """
+    input_text = text
+    if debug:
+        logger.debug('=== TextOps : %s' % ops_repr(plan.ops))
+        if isinstance(text, types.GeneratorType):
+            text = debug_gen(text, '--- Input :')
+        else:
+            logger.debug(DebugText(text))
+    steps = plan.fused if fusion and not debug else plan
+    run = PlanRun(plan.ops) if _profilers else None
+    # generators produced by the steps : they are closed as soon as the consumption stops
+    gens = []
+    try:
+        for i,step in enumerate(steps):
+            op, args, kwargs = step.name, step.args, step.kwargs
+            if not piped and not i and not input_text and args:
+                text = args[0]
+                args = args[1:]
+            if run is not None:
+                stage = run.begin(step, text)
+            if step.fn is not None:
+                try:
+                    text = step.fn(text, *args, **kwargs)
+                    if debug:
+                        if isinstance(text, types.GeneratorType):
+                            text = debug_gen(text, '--- Op : %s(%s,%s)' % (op,args,kwargs))
+                        else:
+                            logger.debug('--- Op : %s(%s,%s)',op,args,kwargs)
+                            logger.debug(DebugText(text))
+                    if text is None:
+                        if run is not None:
+                            stage.end(text)
+                        close_gens(gens)
+                        return text
+                except TypeError:
+                    logger.error('*** bad parameters for %s()' % step.opcls.__name__)
+                    raise
+            elif hasattr(text,op):
+                text = getattr(text,op)(*args, **kwargs)
+            else:
+                extext = extend_type(text)
+                if hasattr(extext,op):
+                    text = getattr(extext,op)(*args, **kwargs)
+                elif isinstance(text, (types.GeneratorType,enumerate,list)):
+                    text = apply_op_gen(text,op,*args, **kwargs)
+                else:
+                    raise TextOpException('Unknown OP "%s"' % op)
+            if run is not None:
+                text = stage.end(text)
+            if isinstance(text, types.GeneratorType):
+                gens.append(text)
+    except BaseException:
+        close_gens(gens)
+        raise
+
+    if gens and text is gens[-1]:
+        if len(gens) > 1:
+            return closing_gen(text, gens[:-1], not raw)
+    elif not isinstance(text, abc.Iterator):
+        # the result has been computed : nothing will read the upstream generators anymore
+        close_gens(gens)
+    if raw:
+        return text
+    return extend_type(text)
+
+_profilers = []
+_profilers_lock = threading.Lock()
+
+class Profiler(object):
+    r"""Collects execution statistics of every step of the operations run while it is active
+
+    A profiler is activated with :meth:`start` or with a ``with`` statement and records a
+    :class:`PlanRun` for each chain run in any thread, with one :class:`StageStats` per executed
+    step (a fused or batched run of ops is a single step). The results of the steps are not
+    modified except that generators are wrapped to count items and to time each ``next()``.
+    When no profiler is active, the only cost is one test per chain run. Profilers can be started
+    and stopped from any thread : the list of the active profilers is protected by a lock.
+
+    Args:
+        callback (callable): a function called with a :class:`StageStats` each time a step is
+            finished, that is when its output generator is exhausted or closed (Optionnal)
+
+    Examples:
+
+        >>> ops = grep('error').cut(col=1).upper()
+        >>> with Profiler() as prof:
+        ...     result = ['error 1','info 2','error 3'] >> ops
+        >>> result
+        ['1', '3']
+        >>> run = prof.runs[0]
+        >>> [ (stage.label, stage.items_in, stage.items_out) for stage in run.stages ]
+        [("grep('error').cut(col=1) [batch]", 3, 2), ('upper()', 2, 2)]
+        >>> [ (stage.bytes_in, stage.bytes_out) for stage in run.stages ]
+        [(20, 2), (2, 2)]
+        >>> print(prof.report())                            #doctest: +ELLIPSIS, +NORMALIZE_WHITESPACE
+        Explain analyze : grep('error').cut(col=1).upper()
+           wall ms    self ms     cpu ms   items in  items out   bytes in  bytes out  step
+        ...          3          2         20          2  grep('error').cut(col=1) [batch]
+        ...          2          2          2          2  upper()
+        >>> finished = []
+        >>> with Profiler(callback=finished.append):
+        ...     lines = ['a','b'] | grep('a').tolist()
+        >>> [ stage.label for stage in finished ]
+        ["grep('a') [batch]", 'tolist()']
+    """
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.runs = []
+
+    def start(self):
+        with _profilers_lock:
+            _profilers.append(self)
+        return self
+
+    def stop(self):
+        with _profilers_lock:
+            if self in _profilers:
+                _profilers.remove(self)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def report(self):
+        """Returns an *explain analyze* like report of all the recorded runs"""
+        return '\n\n'.join( run.report() for run in self.runs )
+
+def explain_analyze(ops, text):
+    """Runs ops (a :class:`TextOp` or a :class:`Pipeline`) on text and returns the profiling report
+
+    The result is fully consumed and thrown away.
+    """
+    with Profiler() as prof:
+        TextOp.consume(text | ops)
+    return prof.report()
+
+class PlanRun(object):
+    """Statistics of one execution of a :class:`Plan` : one :class:`StageStats` per step"""
+    def __init__(self, ops):
+        self.ops = ops
+        self.stages = []
+        with _profilers_lock:
+            self.profilers = list(_profilers)
+            for profiler in self.profilers:
+                profiler.runs.append(self)
+
+    def begin(self, step, text):
+        upstream = self.stages[-1] if self.stages and self.stages[-1].streaming else None
+        stage = StageStats(self, step.label, text, upstream)
+        self.stages.append(stage)
+        return stage
+
+    def report(self):
+        lines = [ 'Explain analyze : %s' % ops_repr(self.ops),
+                  '   wall ms    self ms     cpu ms   items in  items out   bytes in  bytes out  step' ]
+        for stage in self.stages:
+            lines.append('%10.3f %10.3f %10.3f %10s %10s %10s %10s  %s' % (
+                stage.wall * 1e3, stage.self_wall * 1e3, stage.cpu * 1e3,
+                stage.items_in, stage.items_out, stage.bytes_in, stage.bytes_out, stage.label))
+        return '\n'.join(lines)
+
+class StageStats(object):
+    """Execution statistics of one step
+
+    ``wall`` and ``cpu`` are the times in seconds spent in the op and in its output generator,
+    they include the time spent in the upstream generator if any : ``self_wall`` excludes it.
+    ``items_*`` and ``bytes_*`` count lines/items and the length of str or bytes items at the
+    input and output of the step.
+    """
+    def __init__(self, run, label, text, upstream):
+        self.run = run
+        self.label = label
+        self.upstream = upstream
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.items_out = 0
+        self.bytes_out = 0
+        self.streaming = False
+        self.finished = False
+        if upstream is None:
+            self._items_in, self._bytes_in = count_items(text)
+        self._t0 = time.perf_counter()
+        self._c0 = time.process_time()
+
+    @property
+    def items_in(self):
+        return self.upstream.items_out if self.upstream is not None else self._items_in
+
+    @property
+    def bytes_in(self):
+        return self.upstream.bytes_out if self.upstream is not None else self._bytes_in
+
+    @property
+    def self_wall(self):
+        if self.upstream is not None:
+            return self.wall - self.upstream.wall
+        return self.wall
+
+    def end(self, text):
+        self.wall += time.perf_counter() - self._t0
+        self.cpu += time.process_time() - self._c0
+        if isinstance(text, types.GeneratorType):
+            self.streaming = True
+            return profile_gen(self, text)
+        self.items_out, self.bytes_out = count_items(text)
+        self.finish()
+        return text
+
+    def finish(self):
+        self.finished = True
+        for profiler in self.run.profilers:
+            if profiler.callback is not None:
+                profiler.callback(self)
+
+def profile_gen(stats, gen):
+    perf_counter = time.perf_counter
+    process_time = time.process_time
+    try:
+        while True:
+            t0 = perf_counter()
+            c0 = process_time()
+            try:
+                item = next(gen)
+            except StopIteration:
+                return
+            finally:
+                stats.wall += perf_counter() - t0
+                stats.cpu += process_time() - c0
+            stats.items_out += 1
+            if isinstance(item, (str, bytes)):
+                stats.bytes_out += len(item)
+            yield item
+    finally:
+        gen.close()
+        stats.finish()
+
+def count_items(text):
+    """Returns the number of lines/items and the total length of str/bytes items of a text"""
+    if isinstance(text, (str, bytes)):
+        return text.count('\n' if isinstance(text, str) else b'\n') + 1 if text else 0, len(text)
+    elif isinstance(text, (list, tuple)):
+        return len(text), sum( len(item) for item in text if isinstance(item, (str, bytes)) )
+    elif isinstance(text, dict):
+        return len(text), None
+    elif text is None:
+        return 0, None
+    return None, None
+
+def apply_op_gen(text, op, *args, **kwargs):
+    for line in text:
+        if hasattr(line,op):
+            yield getattr(line,op)(*args, **kwargs)
+        else:
+            extext = extend_type(text)
+            if hasattr(extext,op):
+                yield getattr(extext,op)(*args, **kwargs)
+            else:
+                raise TextOpException('Unknown OP "%s"' % op)
+
+_plan_cache = {}
+PLAN_CACHE_SIZE = 1024
+
+class Pipeline(object):
+    r"""Frozen and hashable chain of text operations
+
+    Unlike a :class:`TextOp` chain that is modified in place each time an op is added, a pipeline
+    never changes once built : adding an op returns a new pipeline. It can therefore be shared
+    and run by many threads at once, and be used as a dict key or with :func:`functools.lru_cache`.
+    The arguments are copied so modifying a list or a dict given to an op has no effect on the
+    pipeline. Pipelines having the same ops share the same compiled :class:`Plan`.
+    An op is added only if its name is a registered op or a method of the texts (like ``upper``),
+    otherwise an AttributeError is raised.
+
+    Args:
+        ops (TextOp or Pipeline): the chain of operations to freeze (Optionnal)
+
+    Examples:
+
+        >>> errors = Pipeline(grep('error').cut(col=1))
+        >>> errors
+        Pipeline(grep('error').cut(col=1))
+        >>> ['error 1','info 2','error 3'] >> errors
+        ['1', '3']
+        >>> list(['error 1','info 2','error 3'] | errors)
+        ['1', '3']
+        >>> errors(['error 1'])
+        ['1']
+        >>> errors.mapfn(int)
+        Pipeline(grep('error').cut(col=1).mapfn(<class 'int'>))
+        >>> errors | doreverse()
+        Pipeline(grep('error').cut(col=1).doreverse())
+        >>> errors
+        Pipeline(grep('error').cut(col=1))
+        >>> errors == grep('error').cut(col=1).freeze()
+        True
+        >>> errors == grep('error').cut(col=2).freeze()
+        False
+        >>> counts = { errors : 1 }
+        >>> counts[Pipeline(grep('error').cut(col=1))]
+        1
+        >>> errors.plan is Pipeline(grep('error').cut(col=1)).plan
+        True
+        >>> errors.raw
+        Pipeline(grep('error').cut(col=1)).raw
+        >>> type((['error 1'] >> errors.raw)[0])
+        <class 'str'>
+        >>> errors.raw == errors
+        False
+        >>> errors.upper()
+        Pipeline(grep('error').cut(col=1).upper())
+        >>> errors.tolsit()
+        Traceback (most recent call last):
+            ...
+        AttributeError: 'Pipeline' object has no attribute 'tolsit'
+        >>> from concurrent.futures import ThreadPoolExecutor
+        >>> lines = [ ['error %d' % i, 'info %d' % i] for i in range(100) ]
+        >>> with ThreadPoolExecutor(4) as executor:
+        ...     results = list(executor.map(lambda text: text >> errors, lines))
+        >>> results == [ [str(i)] for i in range(100) ]
+        True
+    """
+    __slots__ = ('ops', 'raw_mode', '_key', '_plan')
+
+    def __init__(self, ops=(), raw=None):
+        if raw is None:
+            raw = ops.raw_mode if isinstance(ops, (TextOp, Pipeline)) else False
+        if isinstance(ops, (TextOp, Pipeline)):
+            ops = ops.ops
+        ops = tuple( (name, _copy_arg(tuple(args)), _copy_arg(dict(kwargs)))
+                     for name,args,kwargs in ops )
+        object.__setattr__(self, 'ops', ops)
+        object.__setattr__(self, 'raw_mode', bool(raw))
+        object.__setattr__(self, '_key', None)
+        object.__setattr__(self, '_plan', None)
+
+    def __setattr__(self, attr, value):
+        raise AttributeError('Pipeline object is immutable')
+
+    def __delattr__(self, attr):
+        raise AttributeError('Pipeline object is immutable')
+
+    @property
+    def key(self):
+        """Hashable representation of the ops : a TypeError is raised if an argument is not hashable"""
+        key = self._key
+        if key is None:
+            key = tuple( (name, _freeze_arg(args), _freeze_arg(kwargs)) for name,args,kwargs in self.ops )
+            key += (self.raw_mode,)
+            hash(key)
+            object.__setattr__(self, '_key', key)
+        return key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __eq__(self, other):
+        if not isinstance(other, Pipeline):
+            return NotImplemented
+        return self.key == other.key
+
+    def __ne__(self, other):
+        if not isinstance(other, Pipeline):
+            return NotImplemented
+        return self.key != other.key
+
+    @property
+    def plan(self):
+        """Execution :class:`Plan`, shared by all pipelines having the same ops"""
+        plan = self._plan
+        if plan is None or plan.version != _registry_version:
+            plan = get_cached_plan(self)
+            object.__setattr__(self, '_plan', plan)
+        return plan
+
+    def __getattr__(self, attr):
+        if attr.startswith('_') or (resolve_op(attr) is None and not is_text_method(attr)):
+            raise AttributeError("'Pipeline' object has no attribute %r" % attr)
+        def add_op(*args, **kwargs):
+            return Pipeline(self.ops + ((attr, args, kwargs),), self.raw_mode)
+        return add_op
+
+    def explain_analyze(self, text):
+        """Runs the pipeline on text and returns the profiling report (see :class:`Profiler`)"""
+        return explain_analyze(self, text)
+
+    @property
+    def raw(self):
+        """Returns the same pipeline in raw mode (see :attr:`TextOp.raw`)"""
+        return Pipeline(self, raw=True)
+
+    def __or__(self, other):
+        if not isinstance(other, (TextOp, Pipeline)):
+            raise TextOpException('Please use "|" only between a Pipeline and a TextOp or a Pipeline')
+        return Pipeline(self.ops + tuple(other.ops), self.raw_mode or other.raw_mode)
+
+    __rshift__ = __or__
+
+    def __ror__(self, text):
+        return run_plan(self.plan, text, True, raw=self.raw_mode or _raw_mode)
+
+    def __rrshift__(self, text):
+        raw = self.raw_mode or _raw_mode
+        result = run_plan(self.plan, text, True, raw=raw)
+        if isinstance(result, (types.GeneratorType,enumerate)):
+            return list(result) if raw else ListExt(result)
+        return result
+
+    __call__ = __rrshift__
+
+    def __repr__(self):
+        if self.raw_mode:
+            return 'Pipeline(%s).raw' % ops_repr(self.ops)
+        return 'Pipeline(%s)' % ops_repr(self.ops)
+
+def get_cached_plan(pipeline):
+    """Returns the compiled :class:`Plan` of a :class:`Pipeline`, from cache if possible"""
+    try:
+        key = pipeline.key
+    except TypeError:
+        return compile_plan(pipeline.ops)
+    plan = _plan_cache.get(key)
+    if plan is None or plan.version != _registry_version:
+        if len(_plan_cache) >= PLAN_CACHE_SIZE:
+            _plan_cache.clear()
+        plan = _plan_cache[key] = compile_plan(pipeline.ops)
+    return plan
+
+def _copy_arg(arg):
+    if isinstance(arg, list):
+        return [ _copy_arg(v) for v in arg ]
+    elif type(arg) is tuple:
+        return tuple( _copy_arg(v) for v in arg )
+    elif type(arg) is dict:
+        return dict( (k,_copy_arg(v)) for k,v in arg.items() )
+    elif isinstance(arg, set):
+        return set(arg)
+    return arg
+
+def _freeze_arg(arg):
+    if isinstance(arg, (list, tuple)):
+        return (type(arg), tuple( _freeze_arg(v) for v in arg ))
+    elif isinstance(arg, dict):
+        return (dict, frozenset( (k,_freeze_arg(v)) for k,v in arg.items() ))
+    elif isinstance(arg, set):
+        return frozenset(arg)
+    return arg
+
+def ops_repr(ops):
+    rops = []
+    for op,args,kwargs in ops:
+        opargs = [ '%r' % v if isinstance(v,(str,int,float)) else v for v in args ]
+        opargs += [ '%s=%r' % (k,v) for k,v in list(kwargs.items()) ]
+        rops.append('%s(%s)' % (op,','.join(map(str,opargs))))
+    return '.'.join(rops)
+
 def extend_type(obj):
     if isinstance(obj,bytes):
         if not isinstance(obj,BytesExt):
@@ -525,6 +1409,702 @@ def stru(text):
         text = str(text)
     return text
 
+def strb(text):
+    r"""Returns text as bytes, the way :func:`stru` returns it as a str
+
+    It is used by the ops having a bytes pattern : str are utf-8 encoded, other objects are
+    converted into str before.
+
+    Examples:
+
+        >>> strb(b'raw'), strb('été'), strb(42)
+        (b'raw', b'\xc3\xa9t\xc3\xa9', b'42')
+    """
+    if isinstance(text, bytes):
+        return text
+    return str(text).encode('utf-8')
+
+REGEX_CACHE_SIZE = 1024
+_regex_cache = collections.OrderedDict()
+_regex_cache_stats = [0, 0]     # hits, misses
+_regex_cache_lock = threading.Lock()
+
+RegexCacheInfo = collections.namedtuple('RegexCacheInfo', 'hits misses maxsize currsize')
+
+def compile_regex(pattern, flags=0):
+    r"""Returns the compiled regular expression from the textops LRU cache
+
+    Every op compiles its patterns with this function : the compiled regexes are shared between
+    ops and calls and are kept in a cache of ``REGEX_CACHE_SIZE`` entries (see
+    :func:`set_regex_cache_size`), much larger than the one of the :mod:`re` module.
+    The cache can be used from several threads. A pattern that is not a string (already compiled
+    regex, callable...) is returned as is.
+
+    Args:
+        pattern (str or bytes): the regular expression
+        flags (int): regular expression flags (re.I etc...)
+
+    Returns:
+        re.RegexObject: the compiled regular expression
+
+    Examples:
+
+        >>> compile_regex(r'error \d+') is compile_regex(r'error \d+')
+        True
+        >>> compile_regex(r'error \d+') is compile_regex(r'error \d+', re.I)
+        False
+        >>> regex = re.compile('error')
+        >>> compile_regex(regex) is regex
+        True
+    """
+    if not isinstance(pattern, (str, bytes)):
+        return pattern
+    return _cached_pattern((pattern, flags), lambda: re.compile(pattern, flags))
+
+def _cached_pattern(key, build):
+    # the pattern is built by build() on a miss
+    with _regex_cache_lock:
+        pattern = _regex_cache.get(key)
+        if pattern is not None:
+            _regex_cache.move_to_end(key)
+            _regex_cache_stats[0] += 1
+            return pattern
+    # built out of the lock : other threads keep using the cache meanwhile
+    pattern = build()
+    with _regex_cache_lock:
+        _regex_cache_stats[1] += 1
+        _regex_cache[key] = pattern
+        while len(_regex_cache) > REGEX_CACHE_SIZE:
+            _regex_cache.popitem(last=False)
+    return pattern
+
+def set_regex_cache_size(size):
+    """ Change the number of compiled regular expressions kept by :func:`compile_regex`
+
+    The least recently used regexes are dropped if the cache is larger than the new size.
+    """
+    global REGEX_CACHE_SIZE
+    with _regex_cache_lock:
+        REGEX_CACHE_SIZE = size
+        while len(_regex_cache) > REGEX_CACHE_SIZE:
+            _regex_cache.popitem(last=False)
+
+def regex_cache_info():
+    r""" Returns the statistics of the :func:`compile_regex` cache
+
+    Returns:
+        RegexCacheInfo: a named tuple with ``hits``, ``misses``, ``maxsize`` and ``currsize``
+
+    Examples:
+
+        >>> clear_regex_cache()
+        >>> regex_cache_info()
+        RegexCacheInfo(hits=0, misses=0, maxsize=1024, currsize=0)
+        >>> results = [ ['error 1','info 2'] >> grep('error').sed(r'\d','N') for i in range(10) ]
+        >>> results[-1]
+        ['error N']
+        >>> info = regex_cache_info()
+        >>> info.misses, info.currsize, info.hits > 10
+        (2, 2, True)
+    """
+    with _regex_cache_lock:
+        return RegexCacheInfo(_regex_cache_stats[0], _regex_cache_stats[1], REGEX_CACHE_SIZE,
+                              len(_regex_cache))
+
+def clear_regex_cache():
+    """ Empties the :func:`compile_regex` cache and resets its statistics """
+    with _regex_cache_lock:
+        _regex_cache.clear()
+        _regex_cache_stats[:] = [0, 0]
+
+RegexType = type(re.compile(''))
+
+try:
+    from re import _parser as sre_parse
+except ImportError:     # Python < 3.11
+    import sre_parse
+
+def _subpatterns(av):
+    if isinstance(av, sre_parse.SubPattern):
+        yield av
+    elif isinstance(av, (tuple, list)):
+        for item in av:
+            yield from _subpatterns(item)
+
+def _has_groupref(subpattern):
+    for op, av in subpattern:
+        if op in (sre_parse.GROUPREF, sre_parse.GROUPREF_EXISTS):
+            return True
+        if any(_has_groupref(sub) for sub in _subpatterns(av)):
+            return True
+    return False
+
+def regex_kind(regex, flags=0):
+    """Tells how a compiled regex can be combined with others by :class:`MultiPattern`
+
+    Returns:
+        str: ``'anchored'`` if it can only match at the beginning of the string, ``'literal'`` if
+        it starts with a literal character, ``'other'`` if it can be combined but gives no hint
+        to the regex engine, None if it cannot be combined (bytes, back-references, named groups,
+        verbose mode or flags other than ``flags``)
+    """
+    if not isinstance(regex, RegexType) or not isinstance(regex.pattern, str):
+        return None
+    if regex.flags != compile_regex('', flags).flags or regex.flags & re.VERBOSE:
+        return None
+    parsed = sre_parse.parse(regex.pattern, regex.flags)
+    if parsed.state.groupdict or _has_groupref(parsed) or not len(parsed):
+        return None
+    op, av = parsed[0]
+    if op is sre_parse.AT and (av is sre_parse.AT_BEGINNING_STRING or
+                               av is sre_parse.AT_BEGINNING and not regex.flags & re.MULTILINE):
+        return 'anchored'
+    if op is sre_parse.LITERAL and not ( regex.flags & re.IGNORECASE and
+                                         chr(av).lower() != chr(av).upper() ):
+        return 'literal'
+    return 'other'
+
+# below this number of patterns, the ones matching a string are found with one search each
+COMBINED_SEARCH_MIN = 16
+
+class CombinedRegex(object):
+    """Patterns combined into one alternation, each one followed by an empty marker group
+
+    A :meth:`first` or :meth:`matching` call runs the regex engine on the string once for
+    every position where a pattern matches instead of once per pattern. Anchored patterns are
+    only tried at the beginning of the string.
+    """
+    def __init__(self, indexed_regexes, flags=0, anchored=False):
+        self.regexes = indexed_regexes
+        self.anchored = anchored
+        # alternation : the engine returns the first pattern matching at the leftmost position
+        src = '|'.join( '%s(?P<_%d>)' % (regex.pattern,i) for i,regex in indexed_regexes )
+        self.alternation = compile_regex(src, flags)
+        self.marker_index = { group:int(name[1:]) for name,group in
+                              self.alternation.groupindex.items() }
+        # lookaheads : all patterns matching at a given position
+        src = ''.join( '(?:(?=%s)(?P<_%d>))?' % (regex.pattern,i) for i,regex in indexed_regexes )
+        self.lookaheads = compile_regex(src, flags)
+        self.markers = [ (i, self.lookaheads.groupindex['_%d' % i]) for i,regex in indexed_regexes ]
+        self.find = self.alternation.match if anchored else self.alternation.search
+
+    def first(self, text):
+        """Returns the lowest index of the patterns matching the text or None"""
+        m = self.find(text)
+        if m is None or self.anchored:
+            return m and self.marker_index[m.lastindex]
+        search = self.alternation.search
+        marker_index = self.marker_index
+        best = marker_index[m.lastindex]
+        while True:
+            m = search(text, m.start() + 1)
+            if m is None:
+                return best
+            i = marker_index[m.lastindex]
+            if i < best:
+                best = i
+
+    def matching(self, text):
+        """Returns the sorted list of the indexes of the patterns matching the text"""
+        m = self.find(text)
+        if m is None:
+            return []
+        if len(self.regexes) <= COMBINED_SEARCH_MIN:
+            return [ i for i,regex in self.regexes if regex.search(text) ]
+        found = set()
+        match = self.lookaheads.match
+        search = self.alternation.search
+        markers = self.markers
+        while m is not None:
+            pos = m.start()
+            regs = match(text, pos).regs
+            found.update( i for i,group in markers if regs[group][0] >= 0 )
+            if self.anchored:
+                break
+            m = search(text, pos + 1)
+        return sorted(found)
+
+class MultiPattern(object):
+    r"""Matches many regular expressions against a string in a single pass
+
+    Patterns that can only match at the beginning of the string (``^...``) and patterns that
+    start with a literal character are combined into two :class:`CombinedRegex`, so the regex
+    engine classifies the string in one pass whatever the number of patterns. Other patterns are
+    searched one by one. A :class:`MultiPattern` has a :meth:`search` method, so it can be given
+    as a pattern to :class:`textops.grep`.
+
+    Args:
+        patterns (list): regular expressions (strings or compiled)
+        flags (int): regular expression flags (re.I etc...) for the string patterns
+
+    Examples:
+
+        >>> mp = MultiPattern([r'^error', r'user\d+', r'^warn', r'from 10\.0\.'])
+        >>> mp.matching('error : user1 from 10.0.0.1')
+        [0, 1, 3]
+        >>> mp.first('warning : user1')
+        1
+        >>> mp.first('info : nobody') is None
+        True
+        >>> bool(mp.search('error')), bool(mp.search('info'))
+        (True, False)
+    """
+    def __init__(self, patterns, flags=0):
+        self.patterns = [ compile_regex(pattern, flags) for pattern in patterns ]
+        kinds = { 'anchored':[], 'literal':[], 'other':[], None:[] }
+        for i, regex in enumerate(self.patterns):
+            kinds[regex_kind(regex, flags)].append((i, regex))
+        self.combined = [ CombinedRegex(kinds[kind], flags, kind == 'anchored')
+                          for kind in ('anchored', 'literal') if kinds[kind] ]
+        # patterns that does not help the regex engine are faster one by one
+        self.others = kinds['other'] + kinds[None]
+        self.others.sort(key=lambda item:item[0])
+        self.single = len(self.combined) == 1 and not self.others
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def first(self, text):
+        """Returns the index of the first pattern matching the text or None"""
+        best = None
+        for combined in self.combined:
+            i = combined.first(text)
+            if i is not None and (best is None or i < best):
+                best = i
+        for i, regex in self.others:
+            if best is not None and i > best:
+                break
+            if regex.search(text):
+                return i
+        return best
+
+    def matching(self, text):
+        """Returns the sorted list of the indexes of the patterns matching the text"""
+        if self.single:
+            return self.combined[0].matching(text)
+        found = []
+        for combined in self.combined:
+            found.extend(combined.matching(text))
+        found.extend( i for i,regex in self.others if regex.search(text) )
+        found.sort()
+        return found
+
+    def search(self, text):
+        """Returns True if at least one pattern matches the text"""
+        for combined in self.combined:
+            if combined.find(text):
+                return True
+        for i, regex in self.others:
+            if regex.search(text):
+                return True
+        return False
+
+# from this number of literals, FixedStrings uses an Aho-Corasick automaton
+AHO_CORASICK_MIN = 8
+
+class AhoCorasick(object):
+    """Aho-Corasick automaton telling whether a string contains one of many words
+
+    This pure python implementation is used when the ``pyahocorasick`` package is not installed.
+    The automaton is built once, then each string is scanned in a single pass whatever the number
+    of words.
+    """
+    def __init__(self, words):
+        goto = [{}]
+        out = [False]
+        for word in words:
+            state = 0
+            for c in word:
+                nxt = goto[state].get(c)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto.append({})
+                    out.append(False)
+                    goto[state][c] = nxt
+                state = nxt
+            out[state] = True
+        fail = [0] * len(goto)
+        queue = collections.deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for c, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and c not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(c, 0)
+                out[nxt] = out[nxt] or out[fail[nxt]]
+        self.goto = goto
+        self.fail = fail
+        self.out = out
+
+    def search(self, text):
+        """Returns True if the text contains at least one word"""
+        goto, fail, out = self.goto, self.fail, self.out
+        state = 0
+        for c in text:
+            while state and c not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(c, 0)
+            if out[state]:
+                return True
+        return out[0]
+
+class FixedStrings(object):
+    r"""Tells whether a string contains one of some literal strings
+
+    No regular expression is involved : ``in`` is used for a few literals, an Aho-Corasick
+    automaton is built once for ``AHO_CORASICK_MIN`` literals or more (the ``pyahocorasick``
+    package is used if installed). Like a compiled regex, a :class:`FixedStrings` has a
+    ``search()`` method so it can be given as a pattern to :class:`textops.grep`.
+
+    Args:
+        literals (str, bytes or list): the literal string or the literal strings to search
+        ignorecase (bool): if True, the search is case insensitive (Default : False)
+
+    Examples:
+
+        >>> fs = FixedStrings(['10.0.0.1', '10.0.0.2'])
+        >>> fs.search('login from 10.0.0.2'), fs.search('login from 10.0.0.3')
+        (True, False)
+        >>> fs = FixedStrings(['10.0.0.%d' % i for i in range(100)])
+        >>> fs.search('login from 10.0.0.42'), fs.search('login from 10.0.1.3')
+        (True, False)
+        >>> FixedStrings('ERROR', True).search('error 42')
+        True
+        >>> FixedStrings([b'ERROR', b'WARN']).search(b'WARN 42')
+        True
+    """
+    def __init__(self, literals, ignorecase=False):
+        if isinstance(literals, (str, bytes)):
+            literals = [literals]
+        self.ignorecase = ignorecase
+        self.literals = [ literal.lower() for literal in literals ] if ignorecase else list(literals)
+        if len(self.literals) == 1:
+            literal = self.literals[0]
+            self.contains = lambda text: literal in text
+        elif len(self.literals) < AHO_CORASICK_MIN:
+            literals = self.literals
+            self.contains = lambda text: any( literal in text for literal in literals )
+        else:
+            try:
+                if pattern_type(self) is bytes:
+                    raise ImportError('pyahocorasick does not search bytes')
+                import ahocorasick
+            except ImportError:
+                self.contains = AhoCorasick(self.literals).search
+            else:
+                automaton = ahocorasick.Automaton()
+                for literal in self.literals:
+                    automaton.add_word(literal, literal)
+                automaton.make_automaton()
+                if '' in self.literals:
+                    self.contains = lambda text: True
+                else:
+                    self.contains = lambda text: next(automaton.iter(text), None) is not None
+        self.search = (lambda text: self.contains(text.lower())) if ignorecase else self.contains
+
+    def __len__(self):
+        return len(self.literals)
+
+def _fixed_strings(literals, ignorecase=False):
+    # FixedStrings are kept in the compile_regex() cache : an Aho-Corasick automaton is costly
+    if isinstance(literals, (str, bytes)):
+        literals = (literals,)
+    try:
+        key = (FixedStrings, tuple(literals), ignorecase)
+        hash(key)
+    except TypeError:
+        return FixedStrings(literals, ignorecase)
+    return _cached_pattern(key, lambda: FixedStrings(literals, ignorecase))
+
+class BloomFilter(object):
+    r"""Remembers values within a fixed memory size, at the cost of some false positives
+
+    Each value sets ``nhashes`` bits among ``nbits`` : a value is said to have been added if
+    all its bits are set. Values never added may therefore be reported as added, about
+    ``error_rate`` of them once ``capacity`` values have been added, more after that. A value
+    that has been added is never reported as absent. The memory used does not depend on the
+    number or the size of the values, it is about ``capacity * 1.44 * log2(1/error_rate)`` bits.
+
+    Values must be hashable, the Python :func:`hash` is used : a filter is valid only within
+    the process that has filled it.
+
+    Args:
+        capacity (int): the number of distinct values the filter is sized for
+        error_rate (float): the false positive rate once ``capacity`` values have been added
+            (Default : 0.001)
+
+    Examples:
+
+        >>> bf = BloomFilter(1000, 0.01)
+        >>> bf.add('error'), bf.add('error'), 'error' in bf, 'warning' in bf
+        (False, True, True, False)
+        >>> bf.nbits, bf.nhashes, len(bf.bits)
+        (9585, 7, 1199)
+    """
+    def __init__(self, capacity, error_rate=0.001):
+        capacity = max(int(capacity), 1)
+        self.nbits = max(int(-capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.nhashes = max(int(round(self.nbits / capacity * math.log(2))), 1)
+        self.bits = bytearray((self.nbits + 7) // 8)
+
+    def positions(self, value):
+        """Returns the positions of the bits of a value"""
+        # double hashing : the k positions are derived from two independent hashes
+        h1 = hash((value,))
+        h2 = hash((value, None)) | 1
+        nbits = self.nbits
+        return [ (h1 + i * h2) % nbits for i in range(self.nhashes) ]
+
+    def __contains__(self, value):
+        bits = self.bits
+        return all( bits[pos >> 3] & (1 << (pos & 7)) for pos in self.positions(value) )
+
+    def add(self, value):
+        """Adds a value, returns True if it was (probably) already added"""
+        bits = self.bits
+        nbits = self.nbits
+        h1 = hash((value,))
+        h2 = hash((value, None)) | 1
+        found = True
+        for i in range(self.nhashes):
+            pos = (h1 + i * h2) % nbits
+            mask = 1 << (pos & 7)
+            if not bits[pos >> 3] & mask:
+                bits[pos >> 3] |= mask
+                found = False
+        return found
+
+def pattern_type(pattern):
+    r"""Returns the type of the strings a pattern applies to : str or bytes
+
+    Args:
+        pattern: a compiled regex, a :class:`FixedStrings` or any object having a ``search()``
+            method (str is returned for the latter)
+
+    Examples:
+
+        >>> pattern_type(re.compile(rb'\d+')), pattern_type(FixedStrings('ERROR'))
+        (<class 'bytes'>, <class 'str'>)
+    """
+    if isinstance(pattern, RegexType):
+        return type(pattern.pattern)
+    if isinstance(pattern, FixedStrings) and pattern.literals:
+        return bytes if isinstance(pattern.literals[0], bytes) else str
+    return str
+
+_required_literals = {}
+_REPEATS = tuple( getattr(sre_parse, name) for name in
+                  ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT') if hasattr(sre_parse, name) )
+
+def _literal_runs(subpattern):
+    # yields the runs of literal characters (as lists of code points) that any match of the
+    # subpattern contains
+    run = []
+    for op, av in subpattern:
+        if op is sre_parse.LITERAL:
+            run.append(av)
+            continue
+        if run:
+            yield run
+            run = []
+        if op is sre_parse.SUBPATTERN:
+            if not av[1] & re.IGNORECASE:
+                yield from _literal_runs(av[-1])
+        elif op in _REPEATS:
+            if av[0] >= 1:
+                yield from _literal_runs(av[2])
+        elif op is sre_parse.ASSERT or op is getattr(sre_parse, 'ATOMIC_GROUP', None):
+            yield from _literal_runs(av[-1] if op is sre_parse.ASSERT else av)
+    if run:
+        yield run
+
+def _literal_info(regex):
+    if not isinstance(regex, RegexType):
+        return None, False
+    # cached by pattern source : no regex is kept alive by the cache
+    key = (regex.pattern, regex.flags)
+    info = _required_literals.get(key)
+    if info is None:
+        literal, exact = None, False
+        if not regex.flags & (re.IGNORECASE | re.VERBOSE):
+            parsed = sre_parse.parse(regex.pattern, regex.flags)
+            run = max(_literal_runs(parsed), key=len, default=None)
+            if run is not None:
+                literal = bytes(run) if isinstance(regex.pattern, bytes) else ''.join(map(chr, run))
+                exact = all( op is sre_parse.LITERAL for op, av in parsed )
+        if len(_required_literals) >= REGEX_CACHE_SIZE:
+            _required_literals.clear()
+        info = _required_literals[key] = (literal, exact)
+    return info
+
+def required_literal(regex):
+    r"""Returns the longest literal string that any match of a compiled regex must contain
+
+    A string that does not contain this literal cannot match : it can be rejected with a plain
+    ``in`` test, which is much faster than running the regex engine. The result is cached.
+
+    Args:
+        regex (re.RegexObject): a compiled regular expression
+
+    Returns:
+        str or bytes: the required literal or None if none has been found (case insensitive
+        regex, alternation of different literals, optional parts...)
+
+    Examples:
+
+        >>> required_literal(re.compile(r'ERROR .* user=(\w+)'))
+        'ERROR '
+        >>> required_literal(re.compile(r'\d+ (?:sshd|ftpd)\[\d+\]: Failed password'))
+        ']: Failed password'
+        >>> print(required_literal(re.compile(r'error|warning')))
+        None
+        >>> print(required_literal(re.compile(r'ERROR', re.I)))
+        None
+        >>> required_literal(re.compile(rb'sshd\[\d+\]: Failed'))
+        b']: Failed'
+    """
+    return _literal_info(regex)[0]
+
+def exact_literal(regex):
+    r"""Returns the string a compiled regex matches if it is a plain literal, otherwise None
+
+    Examples:
+
+        >>> exact_literal(re.compile(r'sshd\[1\]: Failed'))
+        'sshd[1]: Failed'
+        >>> print(exact_literal(re.compile(r'sshd\[\d+\]: Failed')))
+        None
+    """
+    literal, exact = _literal_info(regex)
+    return literal if exact else None
+
+def literal_search(regex):
+    r"""Returns a search function that rejects strings without the regex required literal
+
+    The function works like ``regex.search`` : it returns the match object or None, but the
+    regex engine is run only on the strings containing :func:`required_literal`. For a regex
+    without any required literal, ``regex.search`` is returned. Objects that are not strings of
+    the literal type are given to ``regex.search`` as they are.
+
+    Args:
+        regex (re.RegexObject): a compiled regular expression or any object having a
+            ``search()`` method
+
+    Returns:
+        callable: the search function
+
+    Examples:
+
+        >>> search = literal_search(re.compile(r'ERROR .* user=(\w+)'))
+        >>> search('INFO login user=eric') is None
+        True
+        >>> search('ERROR bad password user=eric').group(1)
+        'eric'
+        >>> literal_search(re.compile('ERROR'))('1 ERROR')
+        <re.Match object; span=(2, 7), match='ERROR'>
+        >>> literal_search(re.compile('ERROR'))(['ERROR'])      # doctest: +ELLIPSIS
+        Traceback (most recent call last):
+        ...
+        TypeError: expected string or bytes-like object...
+    """
+    literal, exact = _literal_info(regex)
+    search = regex.search
+    if literal is None or (exact and isinstance(literal, bytes) and isinstance(regex, RegexType)):
+        return search
+    literal_type = type(literal)
+    def literal_search_fn(text):
+        if isinstance(text, literal_type) and literal not in text:
+            return None
+        return search(text)
+    return literal_search_fn
+
+def _check_type(values, expected_type):
+    """ Raises TypeError if one of the values is not an instance of expected_type """
+    for value_type in set(map(type, values)):
+        if not issubclass(value_type, expected_type):
+            raise TypeError('%s is not a %s' % (value_type.__name__, expected_type.__name__))
+
+def literal_filter(regex, reverse=False):
+    r"""Returns a function filtering a list of strings with a regex in a tight loop
+
+    The returned function ``fn(lines, values=None)`` returns the lines whose value (the line
+    itself if ``values`` is None) the regex finds, or does not find if ``reverse`` is True.
+    The loop over the values is done by C iterators : the strings lacking the
+    :func:`required_literal` are rejected by ``in`` (``bytes.count()`` for bytes) and the regex
+    engine is only run on the others. The values must be strings (bytes for a bytes regex), otherwise TypeError is raised.
+
+    Args:
+        regex (re.RegexObject): a compiled regular expression or any object having a
+            ``search()`` method
+        reverse (bool): if True, keep the lines whose value is not found
+
+    Returns:
+        callable: the filtering function
+
+    Examples:
+
+        >>> lines = ['ERROR user=eric', 'INFO user=guest', 'ERROR disk']
+        >>> literal_filter(re.compile(r'ERROR .*user='))(lines)
+        ['ERROR user=eric']
+        >>> literal_filter(re.compile(r'ERROR .*user='), reverse=True)(lines)
+        ['INFO user=guest', 'ERROR disk']
+        >>> literal_filter(re.compile('eric'))([(1, 'eric'), (2, 'guest')], ['1 eric', '2 guest'])
+        [(1, 'eric')]
+        >>> literal_filter(re.compile('eric'))([1, 2])
+        Traceback (most recent call last):
+            ...
+        TypeError: int is not a str
+    """
+    literal, exact = _literal_info(regex)
+    search = regex.search
+    # regex.search() checks by itself the type of the values, 'in' and other objects do not
+    check = literal is not None or not isinstance(regex, RegexType)
+    value_type = pattern_type(regex)
+    contains = operator.contains
+    if value_type is bytes:
+        # 'in' on bytes first tries to convert the literal into an int and clears the error :
+        # count() is faster, and the regex engine itself is faster for a plain literal
+        contains = bytes.count
+        if exact and isinstance(regex, RegexType):
+            literal = None
+    compress = itertools.compress
+    def literal_filter(lines, values=None):
+        if values is None:
+            values = lines
+        if check:
+            _check_type(values, value_type)
+        if literal is None or exact:
+            if literal is None:
+                selectors = map(search, values)
+            else:
+                selectors = map(contains, values, itertools.repeat(literal))
+            if reverse:
+                selectors = map(operator.not_, selectors)
+            return list(compress(lines, selectors))
+        candidates = compress(range(len(values)), map(contains, values, itertools.repeat(literal)))
+        if not reverse:
+            return [ lines[i] for i in candidates if search(values[i]) ]
+        selectors = [True] * len(values)
+        for i in candidates:
+            if search(values[i]):
+                selectors[i] = False
+        return list(compress(lines, selectors))
+    return literal_filter
+
+_raw_mode = False
+
+def set_raw(flag):
+    """ Change the default execution mode
+
+    If flag is True, all operations return raw results : results are not extended with
+    :class:`StrExt`, :class:`ListExt`, :class:`DictExt` ..., so plain str, list, dict or
+    generators of plain objects are returned. See :attr:`TextOp.raw`.
+    """
+    global _raw_mode
+    _raw_mode = bool(flag)
+
 def set_debug(flag):
     """ Change debug level
 
@@ -543,6 +2123,7 @@ class WrapOp(TextOp):
 
 class WrapOpStr(TextOp):
     input_argn = 0
+    fuse_as_head = False
     # fn=<to be defined in child class>
     @classmethod
     def op(cls, text, *args,**kwargs):
@@ -553,6 +2134,21 @@ class WrapOpStr(TextOp):
         else:
             return wrap_op_str_gen(text, cls.fn, cls.input_argn, args, kwargs)
 
+    @classmethod
+    def line_fn(cls, *args,**kwargs):
+        args = list(args)
+        argn = cls.input_argn
+        args.insert(argn,None)
+        fn = cls.fn
+        def line_fn(line):
+            args[argn] = line
+            return fn(*args,**kwargs)
+        return line_fn
+
+    @classmethod
+    def op_batch(cls, lines, *args,**kwargs):
+        return list(map(cls.line_fn(*args,**kwargs), lines))
+
 def wrap_op_str_gen(text, fn, argn, args, kwargs):
     args.insert(argn,None)
     for line in text:
@@ -568,6 +2164,46 @@ class WrapOpIter(TextOp):
         args.insert(cls.input_argn,cls._tolist(text))
         return cls.fn(*args,**kwargs)
 
+SKIP_LINE = object()
+
+class LineOp(TextOp):
+    r"""Base class for operations processing the input text line by line
+
+    Subclasses must define a ``line_fn()`` classmethod receiving the op arguments and returning
+    a function that processes one line : it returns the processed line or ``SKIP_LINE``
+    to drop it. Consecutive line-wise ops are fused into a single loop by :func:`run_plan`.
+
+    Examples:
+
+        >>> @add_textop
+        ... class twiceodd(LineOp):
+        ...     @classmethod
+        ...     def line_fn(cls, *args,**kwargs):
+        ...         return lambda line: line * 2 if int(line[-1]) % 2 else SKIP_LINE
+        >>> 'line1\nline2\nline3' >> twiceodd()
+        ['line1line1', 'line3line3']
+        >>> ops = twiceodd().dostrip().iffn(str.isalnum)
+        >>> ops.plan.fused
+        (FusedStep(twiceodd().dostrip().iffn(<method 'isalnum' of 'str' objects>)),)
+        >>> 'line1\nline2\nline3' >> ops
+        ['line1line1', 'line3line3']
+        >>> ops = grep('line').twiceodd().sed('line','l').mapfn(str.upper)
+        >>> ops.plan.fused
+        (BatchStep(grep('line').twiceodd().sed('line','l').mapfn(<method 'upper' of 'str' objects>)),)
+        >>> 'line1\nline2\nline3' >> ops
+        ['L1L1', 'L3L3']
+        >>> ops.fusion = False
+        >>> 'line1\nline2\nline3' >> ops
+        ['L1L1', 'L3L3']
+    """
+    @classmethod
+    def op(cls, text, *args,**kwargs):
+        fn = cls.line_fn(*args,**kwargs)
+        for line in cls._tolist(text):
+            line = fn(line)
+            if line is not SKIP_LINE:
+                yield line
+
 def add_textop(class_or_func):
     """Decorator to declare custom function or custom class as a new textops op
 
@@ -595,6 +2231,7 @@ def add_textop(class_or_func):
         op = type(class_or_func.__name__,(TextOp,), {'fn':staticmethod(class_or_func)})
 
     setattr(textops.ops,class_or_func.__name__,op)
+    _bump_registry_version()
     return op
 
 def add_textop_iter(func):
@@ -632,8 +2269,13 @@ def add_textop_iter(func):
     """
     op = type(func.__name__,(WrapOpIter,), {'fn':staticmethod(func)})
     setattr(textops.ops,func.__name__,op)
+    _bump_registry_version()
     return op
 
+def _bump_registry_version():
+    global _registry_version
+    _registry_version += 1
+
 class DebugText(object):
     def __init__(self,text,nblines=20,more_msg='...'):
         self.text = text
@@ -667,6 +2309,95 @@ class DebugText(object):
         out += end
         return out
 
+DEBUG_SAMPLE_LINES = 10
+
+def debug_gen(gen, title, nblines=None):
+    r"""Streams a generator and logs a sample of its items once it is exhausted or closed
+
+    Only the ``nblines`` first and the ``nblines`` last items are kept (a list and a bounded
+    :class:`collections.deque`), so the generator is not materialized and memory usage does not
+    depend on the number of items : this is used in debug mode.
+
+    Args:
+        gen (generator): the generator to stream
+        title (str): the message logged before the sample
+        nblines (int): number of items to keep at the beginning and at the end
+            (Default : ``DEBUG_SAMPLE_LINES``)
+
+    Examples:
+
+        >>> import io, logging
+        >>> logger = logging.getLogger('textops')
+        >>> stream = io.StringIO()
+        >>> handler = logging.StreamHandler(stream)
+        >>> logger.addHandler(handler)
+        >>> set_debug(True)
+        >>> ops = grep('error',debug=True).cut(col=3)
+        >>> lines = ( 'line %d error %d' % (i, i * 10) for i in range(1000) )
+        >>> result = lines | ops
+        >>> next(result), next(result)
+        ('0', '10')
+        >>> result.close()
+        >>> print(stream.getvalue().rstrip())            #doctest: +NORMALIZE_WHITESPACE
+        === TextOps : grep('error',debug=True).cut(col=3)
+        --- Input :
+        [line 0 error 0, line 1 error 10]
+        --- Op : grep(('error',),{'debug': True})
+        [line 0 error 0, line 1 error 10]
+        --- Op : cut((),{'col': 3})
+        [0, 10]
+        >>> stream.truncate(0), stream.seek(0)
+        (0, 0)
+        >>> result = ( str(i) for i in range(1000) ) >> dostrip(debug=True)
+        >>> print(stream.getvalue().rstrip())            #doctest: +NORMALIZE_WHITESPACE
+        === TextOps : dostrip(debug=True)
+        --- Input :
+        [0, 1, 2, 3, 4, 5, 6, 7, 8, 9,
+        ... 980 more items ...
+        990, 991, 992, 993, 994, 995, 996, 997, 998, 999]
+        --- Op : dostrip((),{'debug': True})
+        [0, 1, 2, 3, 4, 5, 6, 7, 8, 9,
+        ... 980 more items ...
+        990, 991, 992, 993, 994, 995, 996, 997, 998, 999]
+        >>> logger.removeHandler(handler)
+        >>> logger.setLevel(logging.NOTSET)
+    """
+    if nblines is None:
+        nblines = DEBUG_SAMPLE_LINES
+    head = []
+    tail = collections.deque(maxlen=nblines)
+    count = 0
+    try:
+        for item in gen:
+            if count < nblines:
+                head.append(item)
+            else:
+                tail.append(item)
+            count += 1
+            yield item
+    finally:
+        gen.close()
+        logger.debug(title)
+        logger.debug(DebugSample(head, tail, count))
+
+class DebugSample(object):
+    """Lazy representation of the first and last items of a stream for debug logs"""
+    def __init__(self, head, tail, count):
+        self.head = head
+        self.tail = tail
+        self.count = count
+
+    def __repr__(self):
+        fmt = lambda item: stru(item[:120] if isinstance(item, (str, bytes)) else item)
+        out = '[' + ', '.join(map(fmt, self.head))
+        skipped = self.count - len(self.head) - len(self.tail)
+        if skipped:
+            out += ',\n... %s more items ...\n' % skipped
+        elif self.tail:
+            out += ', '
+        out += ', '.join(map(fmt, self.tail)) + ']'
+        return out
+
 def get_attribute_or_textop(obj,name):
     if name.startswith('__'):
         return object.__getattribute__(obj,name)
@@ -674,15 +2405,22 @@ def get_attribute_or_textop(obj,name):
     if op_cls and isinstance(op_cls,type) and issubclass(op_cls,TextOp):
         def fn(*args,**kwargs):
             debug = kwargs.get('debug',False)
+            text = obj
             if debug:
                 logger.debug('='*60)
-                logger.debug('Before %s(%s,%s):', name,args, kwargs)
-                logger.debug('%s', DebugText(obj))
-            result = op_cls.op(obj,*args,**kwargs)
+                if isinstance(text, types.GeneratorType):
+                    text = debug_gen(text, 'Before %s(%s,%s):' % (name,args, kwargs))
+                else:
+                    logger.debug('Before %s(%s,%s):', name,args, kwargs)
+                    logger.debug('%s', DebugText(text))
+            result = op_cls.op(text,*args,**kwargs)
             if debug:
                 logger.debug('-'*60)
-                logger.debug('After %s(%s,%s):', name,args, kwargs)
-                logger.debug('%s', DebugText(result))
+                if isinstance(result, types.GeneratorType):
+                    result = debug_gen(result, 'After %s(%s,%s):' % (name,args, kwargs))
+                else:
+                    logger.debug('After %s(%s,%s):', name,args, kwargs)
+                    logger.debug('%s', DebugText(result))
             return result
     else:
         try:
@@ -1171,7 +2909,11 @@ def decode_bytes(byte_string, encoding=None):
             return s
         except UnicodeDecodeError:
             pass
-    # If given encoding does not work try to detect it :
+    # If given encoding does not work try to detect it (chardet is slow to import : do it now)
+    try:
+        import cchardet as chardet
+    except ImportError:
+        import chardet
     detected_encoding = chardet.detect(byte_string)
     if detected_encoding['confidence'] >= 0.5:
         try:
@@ -1,12 +1,79 @@
-from .cast import *
-from .fileops import *
-from .strops import *
-from .listops import *
-from .runops import *
-from .parse import *
-from .wrapops import *
-from .recode import *
+""" Text operations
+
+The op classes are defined in the submodules below. A submodule is imported on the first access
+to one of its names, so that ``from textops import grep`` does not import the whole library.
+"""
+import importlib
+
+# the public names of each submodule, that is its ``__all__`` (checked by tests/runtests.py)
+_submodules = {
+    'cast' : (
+        'tostr', 'tostre', 'tolist', 'toliste', 'toint', 'tofloat', 'todatetime', 'toslug',
+        'todict', 'tonull', 'pretty'
+    ),
+    'fileops' : (
+        'cat', 'bcat', 'ls', 'stats', 'find', 'findre', 'zipcat', 'zipcatre', 'ziplist',
+        'unzip', 'unzipre', 'tofile', 'replacefile', 'teefile', 'tozipfile', 'togzfile',
+        'gzcat', 'tobz2file', 'bzcat', 'wcl', 'timerange'
+    ),
+    'strops' : (
+        'PyStrWrapper', 'strop', 'length', 'echo', 'splitln', 'matches', 'searches', 'StrOp',
+        'cut', 'cutre', 'cutca', 'cutm', 'cutmi', 'cuts', 'cutsi', 'cutsa', 'cutsai', 'cutdct',
+        'cutkv'
+    ),
+    'listops' : (
+        'ListOpError', 'grep', 'grepi', 'grepv', 'grepvi', 'grepany', 'grepanyi', 'grepanyv',
+        'grepanyvi', 'fgrep', 'fgrepi', 'fgrepv', 'fgrepvi', 'grepc', 'grepci', 'grepcv',
+        'grepcvi', 'haspattern', 'haspatterni', 'rmblank', 'lcount', 'wcount', 'wcounti',
+        'wcountv', 'wcountvi', 'doformat', 'formatitems', 'formatlists', 'formatdicts',
+        'sortlists', 'sortdicts', 'topk', 'bottomk', 'dorender', 'renderitems', 'renderlists',
+        'renderdicts', 'first', 'last', 'head', 'skip', 'tail', 'less', 'skess',
+        'findhighlight', 'grepctx', 'sed', 'sedi', 'dostrip', 'between', 'betweeni',
+        'betweenb', 'betweenbi', 'linetester', 'inrange', 'outrange', 'lessthan', 'lessequal',
+        'greaterthan', 'greaterequal', 'before', 'until', 'beforei', 'after', 'since',
+        'afteri', 'mapfn', 'iffn', 'mapif', 'doreduce', 'merge_dicts', 'groupby', 'hashjoin',
+        'span', 'doslice', 'subslice', 'subitem', 'subitems', 'uniq', 'norepeat', 'splitblock',
+        'resplitblock', 'aggregate'
+    ),
+    'runops' : (
+        'run', 'mrun', 'xrun'
+    ),
+    'parse' : (
+        'index_normalize', 'context_key_not_found', 'ParsingError', 'mgrep', 'mgrepi',
+        'mgrepv', 'mgrepvi', 'sgrep', 'sgrepi', 'sgrepv', 'sgrepvi', 'parseg', 'parsegi',
+        'parsek', 'parseki', 'parsekv', 'parsekvi', 'keyval', 'keyvali', 'find_pattern',
+        'find_patterni', 'find_patterns', 'find_patternsi', 'find_first_pattern',
+        'find_first_patterni', 'parse_indented', 'parse_smart', 'state_pattern'
+    ),
+    'wrapops' : (
+        'dosort', 'doreverse', 'getmax', 'getmin', 'alltrue', 'anytrue', 'linenbr', 'resub'
+    ),
+    'recode' : (
+        'MULTIPLELINESTRING_TAG', 'list_to_multilinestring', 'multilinestring_to_list'
+    ),
+    'poolops' : (
+        'parallel', 'foreach_file'
+    ),
+}
+
+_name_to_submodule = { name:submodule for submodule,names in _submodules.items() for name in names }
 
 SPLIT_SEP_NONE = 0
 SPLIT_SEP_BEGIN = 1
 SPLIT_SEP_END = 2
+
+__all__ = ['SPLIT_SEP_NONE', 'SPLIT_SEP_BEGIN', 'SPLIT_SEP_END'] + sorted(_name_to_submodule)
+
+def __getattr__(name):
+    submodule = _name_to_submodule.get(name)
+    if submodule is None:
+        if name not in _submodules:
+            raise AttributeError("module %r has no attribute %r" % (__name__, name))
+        return importlib.import_module('.' + name, __name__)
+    value = getattr(importlib.import_module('.' + submodule, __name__), name)
+    # next accesses will not go through __getattr__ anymore
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(_name_to_submodule) | set(_submodules))
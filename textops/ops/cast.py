@@ -7,8 +7,9 @@
 """ This modules provides casting features, that is to force the output type """
 
 from textops import TextOp, pp, stru
-import dateutil.parser
-from slugify import slugify
+
+__all__ = ['tostr', 'tostre', 'tolist', 'toliste', 'toint', 'tofloat', 'todatetime', 'toslug',
+    'todict', 'tonull', 'pretty']
 
 class tostr(TextOp):
     r""" Convert the result to a string
@@ -194,6 +195,7 @@ class todatetime(TextOp):
     """
     @classmethod
     def fn(cls, text,*args,**kwargs):
+        import dateutil.parser
         return dateutil.parser.parse(text)
 
 class toslug(TextOp):
@@ -210,6 +212,7 @@ class toslug(TextOp):
     """
     @classmethod
     def fn(cls, text,*args,**kwargs):
+        from slugify import slugify
         return slugify(text)
 
 class todict(TextOp):
@@ -6,15 +6,24 @@
 #
 """ This modules provides casting features, that is to force the output type """
 
-from textops import TextOp, pp, stru
+from textops import TextOp, pp, stru, compile_regex, required_literal, exact_literal
+from textops.base import MergedStep, resolve_op
 from zipfile import ZipFile
+import codecs
+import datetime
+import functools
 import gzip
+import itertools
 import os
 import re
 from glob import iglob
 import fnmatch
 import bz2
 
+__all__ = ['cat', 'bcat', 'ls', 'stats', 'find', 'findre', 'zipcat', 'zipcatre', 'ziplist',
+    'unzip', 'unzipre', 'tofile', 'replacefile', 'teefile', 'tozipfile', 'togzfile', 'gzcat',
+    'tobz2file', 'bzcat', 'wcl', 'timerange']
+
 class cat(TextOp):
     r""" Return the content of the file with the path given in the input text
 
@@ -82,14 +91,341 @@ class cat(TextOp):
     """
     @classmethod
     def op(cls,text, context = {}, encoding='utf-8', encoding_errors='replace', *args,**kwargs):
+        for path in cls.paths(text, context):
+            with open(path, encoding=encoding, errors=encoding_errors) as fh:
+                for line in fh:
+                    yield line.rstrip('\r\n')
+
+    @classmethod
+    def paths(cls, text, context={}):
+        """ Yields the paths of the input text formatted with context that are files """
         for path in cls._tolist(text):
             if context:
                 path = path.format(**context)
             path = os.path.expanduser(path)
             if os.path.isfile(path) or os.path.islink(path):
-                with open(path, encoding=encoding, errors=encoding_errors) as fh:
-                    for line in fh:
-                        yield line.rstrip('\r\n')
+                yield path
+
+    @classmethod
+    def merge_step(cls, step, next_step):
+        """ Merges ``cat().lcount()`` and ``cat().grepc(pattern)`` into a scan of binary blocks
+
+        The lines are counted without being decoded nor even split. For grepc, the regex must
+        require a literal string : only the lines having it are decoded and given to the regex,
+        unless the regex is that literal. It falls back on the normal processing if the file
+        encoding is not utf-8 or the encoding errors are not replaced.
+        """
+        grepc, lcount = resolve_op('grepc'), resolve_op('lcount')
+        next_cls, args, kwargs = next_step.opcls, next_step.args, next_step.kwargs
+        exit_on_found = False
+        if next_cls is lcount and not args and not kwargs:
+            count_fn = lines_count
+        elif next_cls is not None and issubclass(next_cls, grepc) and next_cls.op == grepc.op \
+                and len(args) + len(kwargs) <= 1 and set(kwargs) <= {'pattern'}:
+            pattern = args[0] if args else kwargs.get('pattern')
+            if pattern is None:
+                pattern = next_cls.pattern
+            regex = compile_regex(pattern, next_cls.flags)
+            literal = required_literal(regex)
+            if not isinstance(literal, str) or not literal or set(literal) & set('\r\n\ufffd'):
+                return None
+            search = None if exact_literal(regex) is not None else regex.search
+            exit_on_found = next_cls.exit_on_found
+            count_fn = functools.partial(literal_lines_count, literal=literal.encode('utf-8'),
+                                         search=search, reverse=next_cls.reverse,
+                                         exit_on_found=exit_on_found)
+        else:
+            return None
+        def merged(text, context={}, encoding='utf-8', encoding_errors='replace', *cat_args,
+                   **cat_kwargs):
+            if codecs.lookup(encoding).name != 'utf-8' or encoding_errors != 'replace':
+                lines = cls.op(text, context, encoding, encoding_errors, *cat_args, **cat_kwargs)
+                return next_cls.op(lines, *args, **kwargs)
+            count = 0
+            for path in cls.paths(text, context):
+                with open(path, 'rb') as fh:
+                    count += count_fn(fh)
+                if count and exit_on_found:
+                    break
+            if exit_on_found:
+                return bool(count)
+            return count
+        return MergedStep((step, next_step), merged)
+
+BLOCK_SIZE = 1 << 20
+# above one literal every DENSE_BYTES bytes, the lines of a block are split instead of searched
+DENSE_BYTES = 256
+DENSE_MIN = 64
+
+def lines_count(fh, block_size=BLOCK_SIZE):
+    """ Returns the number of lines :class:`cat` would read in a binary file object
+
+    Like in text mode, ``\\n``, ``\\r\\n`` and ``\\r`` end a line and a last line may have no end.
+    """
+    count = 0
+    last_cr = False
+    last = b''
+    for block in iter(functools.partial(fh.read, block_size), b''):
+        count += block.count(b'\n')
+        if b'\r' in block:
+            count += block.count(b'\r') - block.count(b'\r\n')
+        if last_cr and block[0] == 10:
+            count -= 1  # '\r\n' split between two blocks
+        last_cr = block[-1] == 13
+        last = block
+    if last and last[-1] not in b'\r\n':
+        count += 1
+    return count
+
+def literal_lines_count(fh, literal, search=None, reverse=False, exit_on_found=False,
+                        block_size=BLOCK_SIZE):
+    """ Returns the number of lines :class:`cat` would read in a binary file object having a literal
+
+    Blocks are searched with ``bytes.find()`` : when ``search`` is given, the lines having the
+    utf-8 literal are decoded and also tested with ``search``. If ``reverse`` is True, the lines
+    that are not selected are counted.
+    """
+    if reverse:
+        count = lines_count(fh, block_size)
+        fh.seek(0)
+        return count - literal_lines_count(fh, literal, search, block_size=block_size)
+    count = 0
+    dense = False
+    tail = b''
+    for block in iter(functools.partial(fh.read, block_size), b''):
+        if tail:
+            block = tail + block
+        # blocks are searched up to their last line end, the rest is kept for the next block
+        end = max(block.rfind(b'\n'), block.rfind(b'\r')) + 1
+        block_count, dense = _block_literal_lines(block, end, literal, search, dense)
+        count += block_count
+        tail = block[end:]
+        if count and exit_on_found:
+            return count
+    return count + _block_literal_lines(tail, len(tail), literal, search, dense)[0]
+
+def _block_literal_lines(block, end, literal, search, dense):
+    """ Returns the number of lines of block[:end] having literal and whether they are dense """
+    count = 0
+    found = 0
+    find = block.find
+    has_cr = b'\r' in block
+    pos = 0 if dense else find(literal, 0, end)
+    while pos >= 0:
+        split = dense or (found >= DENSE_MIN and found * DENSE_BYTES > pos)
+        if split or search is not None:
+            bol = block.rfind(b'\n', 0, pos) + 1
+            if has_cr:
+                bol = max(bol, block.rfind(b'\r', bol, pos) + 1)
+        if split:
+            # most lines have the literal : the rest of the block is split and tested by C iterators
+            lines = block[bol:end].splitlines()
+            lines = list(itertools.compress(lines, map(bytes.count, lines, itertools.repeat(literal))))
+            dense = len(lines) * DENSE_BYTES > end - bol
+            if search is not None:
+                lines = [ line for line in lines if search(line.decode('utf-8', 'replace')) ]
+            return count + len(lines), dense
+        found += 1
+        eol = find(b'\n', pos, end)
+        if has_cr:
+            cr = find(b'\r', pos, end)
+            if cr >= 0 and (eol < 0 or cr < eol):
+                eol = cr
+        if eol < 0:
+            eol = end
+        if search is None or search(block[bol:eol].decode('utf-8', 'replace')):
+            count += 1
+        pos = find(literal, eol + 1, end)
+    return count, False
+
+class wcl(TextOp):
+    r""" Count the lines of the files with the paths given in the input text
+
+    The files are read by big binary blocks where line ends are counted : no line is decoded nor
+    even split, this is much faster than ``cat().lcount()`` on big files. The lines are counted
+    like :class:`cat` reads them : ``\n``, ``\r\n`` and ``\r`` end a line and the last line
+    is counted even if it has no line end (``wc -l`` does not count it).
+    If a context dict is specified, the paths are formatted with that context (str.format).
+    ``cat().lcount()`` and ``cat().grepc(pattern)`` (grepc family and haspattern) are run the
+    same way when the regex requires a literal string : only the lines having it are decoded.
+
+    Args:
+        context (dict): The context to format the file path (Optionnal)
+
+    Returns:
+        int: the total number of lines
+
+    Examples:
+        >>> open('/tmp/testfile.txt','w').write('error 1\ninfo 2\r\nerror 3\rerror 4')
+        31
+        >>> '/tmp/testfile.txt' | wcl()
+        4
+        >>> '/tmp/testfile.txt' | lcount(files=True)
+        4
+        >>> ['/tmp/testfile.txt', '/tmp/testfile.txt'] | wcl()
+        8
+        >>> '/tmp/testfile.txt' | cat().lcount()
+        4
+        >>> '/tmp/testfile.txt' | cat().grepc('error')
+        3
+        >>> '/tmp/testfile.txt' | cat().grepcv('error')
+        1
+        >>> '/tmp/testfile.txt' | cat().grepc(r'error [2-9]')
+        2
+        >>> '/tmp/testfile.txt' | cat().haspattern('info')
+        True
+        >>> (cat().grepc('error').tostr()).plan.fused
+        (MergedStep(cat().grepc('error')), PlanStep('tostr', (), {}))
+    """
+    @classmethod
+    def op(cls, text, context={}, *args,**kwargs):
+        count = 0
+        for path in cat.paths(text, context):
+            with open(path, 'rb') as fh:
+                count += lines_count(fh)
+        return count
+
+class timerange(TextOp):
+    r""" Return the lines of log files having a timestamp within a time range
+
+    The files with the paths given in the input text must be sorted by timestamp, like log
+    files are. Instead of reading the files from their start like ``cat().inrange()`` does,
+    the first line in the range is found by a binary search over the file offsets : it
+    seeks in the middle of the remaining part of the file, skips the partial line, parses the
+    timestamp of the next line and goes on in the half where the range begins. Then only
+    the lines of the range are read, so a few minutes can be extracted from a huge log file
+    almost immediately. The lines without timestamp (stack traces...) belong to the line
+    before them.
+
+    The timestamp is the first group (or the whole match if there is no group) of
+    ``ts_pattern`` : without ``ts_format``, timestamps are compared as strings, this works for
+    ISO 8601 timestamps. With ``ts_format``, they are parsed with
+    :meth:`datetime.datetime.strptime` and ``start`` and ``end`` may be given as datetimes
+    or as strings having this format.
+
+    Args:
+        start (str or datetime): the range start, lines having this timestamp are included
+            (None for the beginning of the file)
+        end (str or datetime): the range end, lines having this timestamp are excluded
+            (None for the end of the file)
+        ts_pattern (str or regex): the regex to extract the timestamp of a line
+            (Default : an ISO 8601 date and time ``YYYY-MM-DD HH:MM:SS``)
+        ts_format (str): the :meth:`datetime.datetime.strptime` format of the timestamp
+            (Optionnal)
+        context (dict): The context to format the file path (Optionnal)
+        encoding (str): file encoding (Default: utf-8)
+        encoding_errors (str): 'strict', 'ignore', 'replace', 'xmlcharrefreplace',
+                               'backslashreplace' (Default : 'replace')
+
+    Yields:
+        str: the lines within the time range
+
+    Examples:
+        >>> lines = [ '2026-10-17 10:%02d:00 event %d' % (i // 2, i) for i in range(20) ]
+        >>> lines.insert(9, '  continuation of event 8')
+        >>> open('/tmp/testfile.txt','w').write('\n'.join(lines))
+        595
+        >>> '/tmp/testfile.txt' >> timerange('2026-10-17 10:04', '2026-10-17 10:06') #doctest: +NORMALIZE_WHITESPACE
+        ['2026-10-17 10:04:00 event 8', '  continuation of event 8', '2026-10-17 10:04:00 event 9',
+         '2026-10-17 10:05:00 event 10', '2026-10-17 10:05:00 event 11']
+        >>> '/tmp/testfile.txt' >> timerange('2026-10-17 10:09:00', None)
+        ['2026-10-17 10:09:00 event 18', '2026-10-17 10:09:00 event 19']
+        >>> '/tmp/testfile.txt' >> timerange(None, '2026-10-17 10:01:00')
+        ['2026-10-17 10:00:00 event 0', '2026-10-17 10:00:00 event 1']
+        >>> open('/tmp/testfile.txt','w').write('Oct 17 09:59:58 start\nOct 17 10:00:02 ok\n')
+        41
+        >>> '/tmp/testfile.txt' >> timerange('Oct 17 10:00:00', 'Oct 17 10:05:00',
+        ...                                  r'^(\w+ +\d+ [\d:]+)', '%b %d %H:%M:%S')
+        ['Oct 17 10:00:02 ok']
+    """
+    @classmethod
+    def op(cls, text, start=None, end=None, ts_pattern=r'\d{4}-\d\d-\d\d[ T]\d\d:\d\d:\d\d',
+           ts_format=None, context={}, encoding='utf-8', encoding_errors='replace',
+           *args,**kwargs):
+        regex = compile_regex(ts_pattern)
+        group = 1 if regex.groups else 0
+        if ts_format:
+            if isinstance(start, str):
+                start = datetime.datetime.strptime(start, ts_format)
+            if isinstance(end, str):
+                end = datetime.datetime.strptime(end, ts_format)
+        def timestamp(line):
+            m = regex.search(line)
+            if m is None:
+                return None
+            if ts_format:
+                return datetime.datetime.strptime(m.group(group), ts_format)
+            return m.group(group)
+        for path in cat.paths(text, context):
+            with open(path, 'rb') as fh:
+                offset = 0
+                if start is not None:
+                    offset = cls.bisect(fh, start, timestamp, encoding, encoding_errors)
+                fh.seek(offset)
+                in_range = start is None
+                for line in fh:
+                    line = line.decode(encoding, encoding_errors).rstrip('\r\n')
+                    ts = timestamp(line)
+                    if ts is not None:
+                        if end is not None and ts >= end:
+                            break
+                        in_range = start is None or ts >= start
+                    if in_range:
+                        yield line
+
+    @classmethod
+    def bisect(cls, fh, start, timestamp, encoding, encoding_errors):
+        """ Returns the offset of a line before the first line of a sorted file having start """
+        lo, hi = 0, os.fstat(fh.fileno()).st_size
+        while hi - lo > BISECT_MIN:
+            mid = (lo + hi) // 2
+            fh.seek(mid)
+            fh.readline()
+            while True:
+                pos = fh.tell()
+                line = fh.readline()
+                ts = timestamp(line.decode(encoding, encoding_errors)) if line else None
+                if ts is not None or not line:
+                    break
+            if ts is not None and ts < start:
+                lo = pos
+            else:
+                hi = mid
+        return lo
+
+# below this size, the rest of the file is read instead of being bisected
+BISECT_MIN = 1 << 16
+
+class bcat(TextOp):
+    r""" Return the content of the file with the path given in the input text as bytes lines
+
+    This works like :class:`textops.cat` except that the lines are not decoded. Give bytes
+    patterns to grep, sed or cut (and bytes separators to cut) and the lines are processed as
+    bytes up to the end of the chain : only the lines that reach :class:`textops.tostr` are
+    decoded. On mostly ASCII logs, this saves the decoding of every line.
+
+    Args:
+        context (dict): The context to format the file path (Optionnal)
+
+    Yields:
+        bytes: the file content lines
+
+    Examples:
+        >>> open('/tmp/testfile.txt','w').write('ERROR disk full\nINFO ok\nERROR été\n')
+        34
+        >>> '/tmp/testfile.txt' >> bcat()
+        [b'ERROR disk full', b'INFO ok', b'ERROR \xc3\xa9t\xc3\xa9']
+        >>> '/tmp/testfile.txt' >> bcat().grep(b'^ERROR').sed(b'ERROR ', b'')
+        [b'disk full', b'\xc3\xa9t\xc3\xa9']
+        >>> '/tmp/testfile.txt' | bcat().grep(b'^ERROR').cut(col=1).tostr()
+        'disk\nété'
+    """
+    @classmethod
+    def op(cls,text, context = {}, *args,**kwargs):
+        for path in cat.paths(text, context):
+            with open(path, 'rb') as fh:
+                for line in fh:
+                    yield line.rstrip(b'\r\n')
 
 class ls(TextOp):
     r""" Return a list of files/dirs
@@ -194,8 +530,7 @@ class findre(TextOp):
     """
     @classmethod
     def op(cls,text, pattern='', context = {}, only_files=False, only_dirs=False, *args,**kwargs):
-        if isinstance(pattern,str):
-            pattern = re.compile(pattern)
+        pattern = compile_regex(pattern)
         for path in cls._tolist(text):
             if context:
                 path = path.format(**context)
@@ -261,8 +596,7 @@ class zipcatre(TextOp):
     """
     @classmethod
     def op(cls,text, member_regex, context = {}, password=None, *args,**kwargs):
-        if isinstance(member_regex,str):
-            member_regex = re.compile(member_regex)
+        member_regex = compile_regex(member_regex)
         for path in cls._tolist(text):
             if context:
                 path = path.format(**context)
@@ -355,8 +689,7 @@ class unzipre(TextOp):
     """
     @classmethod
     def op(cls,text, member_regex, topath=None, password=None, context = {}, ignore=False, *args,**kwargs):
-        if isinstance(member_regex,str):
-            member_regex = re.compile(member_regex)
+        member_regex = compile_regex(member_regex)
         if topath and context:
             topath = topath.format(**context)
             topath = os.path.expanduser(topath)
@@ -499,11 +832,20 @@ class gzcat(TextOp):
     r"""Uncompress the gzfile(s) with the name(s) given in input text
 
     If a context dict is specified, the path is formatted with that context (str.format)
-    The gzipped file must have a textual content.
+    The lines are yielded as bytes, like :class:`textops.bcat` does.
 
     Args:
         context (dict): The context to format the file path (Optionnal)
 
+    Yields:
+        bytes: the uncompressed lines
+
+    Examples:
+        >>> ['ERROR disk full', 'INFO ok'] | togzfile('/tmp/testfile.txt.gz')
+        >>> '/tmp/testfile.txt.gz' >> gzcat()
+        [b'ERROR disk full', b'INFO ok']
+        >>> '/tmp/testfile.txt.gz' >> gzcat().grep(b'ERROR')
+        [b'ERROR disk full']
 
     Note:
         A list of filename can be given as input text : all specified files will be uncompressed
@@ -521,7 +863,7 @@ class gzcat(TextOp):
             if os.path.isfile(path) or os.path.islink(path):
                 with gzip.open(path) as fh:
                     for line in fh:
-                        yield line.rstrip('\r\n')
+                        yield line.rstrip(b'\r\n')
 
 
 class tobz2file(TextOp):
@@ -550,13 +892,18 @@ class bzcat(TextOp):
     r"""Uncompress the bz2 file(s) with the name(s) given in input text
 
     If a context dict is specified, the path is formatted with that context (str.format)
-    The gzipped file must have a textual content.
+    The lines are yielded as bytes, like :class:`textops.bcat` does.
 
     Args:
         context (dict): The context to format the file path (Optionnal)
 
+    Yields:
+        bytes: the uncompressed lines
+
     Examples:
-        >>> '/var/log/dmesg' | cat() | grep('error') | togzfile('/tmp/errors.log.gz')
+        >>> ['ERROR disk full', 'INFO ok'] | tobz2file('/tmp/testfile.txt.bz2')
+        >>> '/tmp/testfile.txt.bz2' >> bzcat().grep(b'ERROR')
+        [b'ERROR disk full']
 
     Note:
         A list of filename can be given as input text : all specified files will be uncompressed
@@ -571,4 +918,4 @@ class bzcat(TextOp):
             if os.path.isfile(path) or os.path.islink(path):
                 with bz2.BZ2File(path) as fh:
                     for line in fh:
-                        yield line.rstrip('\r\n')
+                        yield line.rstrip(b'\r\n')
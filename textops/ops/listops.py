@@ -6,7 +6,9 @@
 #
 """ This module gathers list/line operations """
 
-from textops import TextOp, dformat, eformat, StrExt, stru
+from textops import TextOp, LineOp, SKIP_LINE, dformat, eformat, StrExt, stru, strb, \
+    NoAttr, compile_regex, MultiPattern, FixedStrings, pattern_type, literal_search, literal_filter
+from textops.base import MergedStep, _fixed_strings
 import textops
 import re
 import subprocess
@@ -14,12 +16,65 @@ import sys
 import os
 import itertools
 import collections
+import heapq
+import pickle
+import tempfile
+import shutil
 from functools import reduce
+from operator import itemgetter, attrgetter
+
+__all__ = ['ListOpError', 'grep', 'grepi', 'grepv', 'grepvi', 'grepany', 'grepanyi',
+    'grepanyv', 'grepanyvi', 'fgrep', 'fgrepi', 'fgrepv', 'fgrepvi', 'grepc', 'grepci',
+    'grepcv', 'grepcvi', 'haspattern', 'haspatterni', 'rmblank', 'lcount', 'wcount', 'wcounti',
+    'wcountv', 'wcountvi', 'doformat', 'formatitems', 'formatlists', 'formatdicts',
+    'sortlists', 'sortdicts', 'topk', 'bottomk', 'dorender', 'renderitems', 'renderlists',
+    'renderdicts', 'first', 'last', 'head', 'skip', 'tail', 'less', 'skess', 'findhighlight',
+    'grepctx', 'sed', 'sedi', 'dostrip', 'between', 'betweeni', 'betweenb', 'betweenbi',
+    'linetester', 'inrange', 'outrange', 'lessthan', 'lessequal', 'greaterthan',
+    'greaterequal', 'before', 'until', 'beforei', 'after', 'since', 'afteri', 'mapfn', 'iffn',
+    'mapif', 'doreduce', 'merge_dicts', 'groupby', 'hashjoin', 'span', 'doslice', 'subslice',
+    'subitem', 'subitems', 'uniq', 'norepeat', 'splitblock', 'resplitblock', 'aggregate']
 
 class ListOpError(Exception):
     pass
 
-class grep(TextOp):
+# below this number of lines, choosing a dedicated loop costs more than it saves
+DEDICATED_LOOP_MIN = 16
+
+def _line_type(regex):
+    # Returns the type of the lines a pattern is applied to as they are and the function
+    # converting the other lines : bytes lines are not decoded for a bytes pattern
+    if pattern_type(regex) is bytes:
+        return bytes, strb
+    return str, stru
+
+def _grep_select_fn(regex, reverse, sample, key=None, has_key=None, attr=None, has_attr=None):
+    # Returns a function selecting the lines to keep from a list of lines like sample, in a loop
+    # dedicated to their type : whole strings, lists or dicts by key, objects by attr.
+    # It raises an exception on a line not fitting the loop, the caller has then to fall back
+    # to the generic line by line code. None is returned if there is no dedicated loop.
+    select = literal_filter(regex, reverse)
+    if isinstance(sample, _line_type(regex)[0]):
+        return select
+    if has_key is not None or has_attr is not None:
+        return None
+    if key is not None:
+        if not ( isinstance(sample, dict) or
+                 isinstance(sample, (list, tuple)) and isinstance(key, int) ):
+            return None
+        get_value = itemgetter(key)
+    elif attr is not None:
+        get_value = attrgetter(attr)
+    else:
+        return None
+    def select_values(lines):
+        # a str or bytes line would be tested as a whole by the generic code
+        if any( issubclass(line_type, (str, bytes)) for line_type in set(map(type, lines)) ):
+            raise TypeError('a line is a str or bytes')
+        return select(lines, list(map(get_value, lines)))
+    return select_values
+
+class grep(LineOp):
     r"""Select lines having a specified pattern
 
     This works like the shell command 'egrep' : it will filter the input text and retain only
@@ -36,6 +91,8 @@ class grep(TextOp):
         has_key (int or str): test only if the test_key is in the inner list or dict (optional)
         attr (str): for list of objects, test the pattern on the object `attr` attribute (optional)
         has_attr (int or str): For list of objects, test if the attribute `has_attr` exists (optional)
+        fixed (bool): the pattern is a literal string or a list of literal strings,
+            see :class:`textops.fgrep` (optional)
 
     Yields:
         str, list or dict: the filtered input text
@@ -68,38 +125,93 @@ class grep(TextOp):
         [{'way to grep': 2}]
         >>> [{'more simple':1},{'way to grep':2},{'list of dicts':3}] | grep('3').tolist()
         [{'list of dicts': 3}]
+        >>> ['a.b', 'axb'] >> grep('a.b')
+        ['a.b', 'axb']
+        >>> ['a.b', 'axb'] >> grep('a.b', fixed=True)
+        ['a.b']
+        >>> [('error', 1), ('info', 2), 'error 3'] >> grep('error', key=0)
+        [('error', 1), 'error 3']
 
     """
     flags = 0
     reverse = False
     pattern = ''
+    fixed = False
+
     @classmethod
-    def op(cls,text,pattern=None, key=None, has_key=None, attr=None, has_attr=None, *args,**kwargs):
+    def regex(cls, pattern, fixed=None):
         if pattern is None:
             pattern = cls.pattern
-        regex = re.compile(pattern,cls.flags) if isinstance(pattern,str) else pattern
-        for line in cls._tolist(text):
+        if fixed is None:
+            fixed = cls.fixed
+        if fixed and not isinstance(pattern, FixedStrings):
+            return _fixed_strings(pattern, bool(cls.flags & re.IGNORECASE))
+        return compile_regex(pattern,cls.flags)
+
+    @classmethod
+    def line_fn(cls,pattern=None, key=None, has_key=None, attr=None, has_attr=None, fixed=None,
+                *args,**kwargs):
+        reverse = cls.reverse
+        regex = cls.regex(pattern, fixed)
+        search = literal_search(regex)
+        line_type, to_text = _line_type(regex)
+        def line_fn(line):
             try:
-                if isinstance(line,str):
-                    if bool(regex.search(stru(line))) != cls.reverse:  # kind of XOR with cls.reverse
-                        yield line
+                if isinstance(line,line_type):
+                    if bool(search(line)) != reverse:  # kind of XOR with cls.reverse
+                        return line
                 elif has_key is not None:
-                    if has_key in line != cls.reverse:  # kind of XOR with cls.reverse
-                        yield line
+                    if has_key in line != reverse:  # kind of XOR with cls.reverse
+                        return line
                 elif key is not None:
-                    if bool(regex.search(stru(line[key]))) != cls.reverse:  # kind of XOR with cls.reverse
-                        yield line
+                    if bool(search(to_text(line[key]))) != reverse:  # kind of XOR with cls.reverse
+                        return line
                 elif has_attr is not None:
-                    if hasattr(line,has_attr) != cls.reverse:  # kind of XOR with cls.reverse
-                        yield line
+                    if hasattr(line,has_attr) != reverse:  # kind of XOR with cls.reverse
+                        return line
                 elif attr is not None:
-                    if bool(regex.search(stru(getattr(line,attr,'')))) != cls.reverse:  # kind of XOR with cls.reverse
-                        yield line
+                    if bool(search(to_text(getattr(line,attr,'')))) != reverse:  # kind of XOR with cls.reverse
+                        return line
                 else:
-                    if bool(regex.search(stru(line))) != cls.reverse:  # kind of XOR with cls.reverse
-                        yield line
+                    if bool(search(to_text(line))) != reverse:  # kind of XOR with cls.reverse
+                        return line
             except (ValueError, TypeError, IndexError, KeyError):
                 pass
+            return SKIP_LINE
+        return line_fn
+
+    @classmethod
+    def batch_args(cls,pattern=None, key=None, has_key=None, attr=None, has_attr=None, fixed=None,
+                   *args,**kwargs):
+        # the regex or the FixedStrings automaton is built once for all the chunks
+        return (cls.regex(pattern, fixed), key, has_key, attr, has_attr, fixed) + args, kwargs
+
+    @classmethod
+    def op_batch(cls,lines,pattern=None, key=None, has_key=None, attr=None, has_attr=None,
+                 fixed=None, *args,**kwargs):
+        regex = cls.regex(pattern, fixed)
+        select = None
+        if len(lines) >= DEDICATED_LOOP_MIN:
+            # a loop dedicated to the type of the lines is chosen from the first one
+            select = _grep_select_fn(regex, cls.reverse, lines[0], key, has_key, attr, has_attr)
+        if select is not None:
+            try:
+                return select(lines)
+            except (ValueError, TypeError, IndexError, KeyError, AttributeError):
+                pass    # the lines are not all of the same type
+        if key is None and has_key is None and attr is None and has_attr is None:
+            search = literal_search(regex)
+            line_type, to_text = _line_type(regex)
+            try:
+                if cls.reverse:
+                    return [ line for line in lines
+                             if not search(line if isinstance(line,line_type) else to_text(line)) ]
+                return [ line for line in lines
+                         if search(line if isinstance(line,line_type) else to_text(line)) ]
+            except (ValueError, TypeError, IndexError, KeyError):
+                pass    # some lines have to be skipped : do it line by line
+        fn = cls.line_fn(pattern, key, has_key, attr, has_attr, fixed)
+        return [ line for line in map(fn, lines) if line is not SKIP_LINE ]
 
 class grepi(grep):
     r"""grep case insensitive
@@ -166,6 +278,196 @@ class grepvi(grepv):
     """
     flags = re.IGNORECASE
 
+class fgrep(grep):
+    r"""Select lines having a literal string
+
+    This works like the shell command 'fgrep' : the pattern is not a regular expression but
+    a literal string, or a list of literal strings to select lines having at least one of them.
+    One literal is searched with ``in``, many literals (ex: an IP blocklist) are searched with an
+    Aho-Corasick automaton built once (see :class:`textops.FixedStrings`).
+    It accepts the same arguments as :class:`textops.grep`.
+
+    Args:
+        pattern (str or list): a literal string or a list of literal strings (case sensitive)
+        key (int or str): test the pattern only one column or one key (optional)
+        has_key (int or str): test only if the test_key is in the inner list or dict (optional)
+        attr (str): for list of objects, test the pattern on the object `attr` attribute (optional)
+        has_attr (int or str): For list of objects, test if the attribute `has_attr` exists (optional)
+
+    Yields:
+        str, list or dict: the filtered input text
+
+    Examples:
+        >>> logs = ['login from 10.0.0.1', 'login from 10.0.1.3', 'login from 10.0.0.12']
+        >>> logs >> fgrep('10.0.0.1')
+        ['login from 10.0.0.1', 'login from 10.0.0.12']
+        >>> blocklist = [ '10.0.1.%d' % i for i in range(256) ]
+        >>> logs >> fgrep(blocklist)
+        ['login from 10.0.1.3']
+        >>> [['login', '10.0.1.3'], ['logout', '10.0.1.3']] >> fgrep('out', 0)
+        [['logout', '10.0.1.3']]
+    """
+    fixed = True
+
+class fgrepi(fgrep):
+    r"""fgrep case insensitive
+
+    This works like :class:`textops.fgrep`, except it is case insensitive.
+
+    Args:
+        pattern (str or list): a literal string or a list of literal strings (case insensitive)
+        key (int or str): test only one column or one key (optional)
+
+    Yields:
+        str, list or dict: the filtered input text
+
+    Examples:
+        >>> ['Error 1', 'ERROR 2', 'warning 3'] >> fgrepi('error')
+        ['Error 1', 'ERROR 2']
+    """
+    flags = re.IGNORECASE
+
+class fgrepv(fgrep):
+    r"""fgrep with inverted matching
+
+    This works like :class:`textops.fgrep`, except it returns lines that does NOT have the
+    literal string(s).
+
+    Args:
+        pattern (str or list): a literal string or a list of literal strings (case sensitive)
+        key (int or str): test only one column or one key (optional)
+
+    Yields:
+        str, list or dict: the filtered input text
+
+    Examples:
+        >>> logs = ['login from 10.0.0.1', 'login from 10.0.1.3', 'login from 10.0.0.12']
+        >>> logs >> fgrepv([ '10.0.1.%d' % i for i in range(256) ])
+        ['login from 10.0.0.1', 'login from 10.0.0.12']
+    """
+    reverse = True
+
+class fgrepvi(fgrepv):
+    r"""fgrep case insensitive with inverted matching
+
+    This works like :class:`textops.fgrepv`, except it is case insensitive.
+
+    Args:
+        pattern (str or list): a literal string or a list of literal strings (case insensitive)
+        key (int or str): test only one column or one key (optional)
+
+    Yields:
+        str, list or dict: the filtered input text
+
+    Examples:
+        >>> ['Error 1', 'ERROR 2', 'warning 3'] >> fgrepvi('error')
+        ['warning 3']
+    """
+    flags = re.IGNORECASE
+
+class grepany(grep):
+    r"""Select lines matching at least one pattern of a list
+
+    This works like :class:`textops.grep` with many patterns : the patterns are combined into a
+    :class:`textops.MultiPattern` so each line is tested in a single pass of the regex engine,
+    even with hundreds of patterns.
+
+    Args:
+        patterns (list): regular expression strings (case sensitive)
+        key (int or str): test the patterns only one column or one key (optional)
+        has_key (int or str): test only if the test_key is in the inner list or dict (optional)
+        attr (str): for list of objects, test the patterns on the object `attr` attribute (optional)
+        has_attr (int or str): For list of objects, test if the attribute `has_attr` exists (optional)
+
+    Yields:
+        str, list or dict: the filtered input text
+
+    Examples:
+        >>> input = 'error1\nerror2\nwarning1\ninfo1\nwarning2\ninfo2'
+        >>> input >> grepany(['^err','1$'])
+        ['error1', 'error2', 'warning1', 'info1']
+        >>> input | cutca(r'(\D+)(\d+)').grepany(['warn','info'],0).tolist()
+        [['warning', '1'], ['info', '1'], ['warning', '2'], ['info', '2']]
+    """
+    @classmethod
+    def multipattern(cls, patterns):
+        if isinstance(patterns, MultiPattern):
+            return patterns
+        if isinstance(patterns, str):
+            patterns = [patterns]
+        return MultiPattern(patterns, cls.flags)
+
+    @classmethod
+    def line_fn(cls, patterns, *args,**kwargs):
+        return super(grepany, cls).line_fn(cls.multipattern(patterns), *args,**kwargs)
+
+    @classmethod
+    def batch_args(cls, patterns, *args,**kwargs):
+        # the MultiPattern is built once for all the chunks
+        return (cls.multipattern(patterns),) + args, kwargs
+
+    @classmethod
+    def op_batch(cls, lines, patterns, *args,**kwargs):
+        return super(grepany, cls).op_batch(lines, cls.multipattern(patterns), *args,**kwargs)
+
+class grepanyi(grepany):
+    r"""grepany case insensitive
+
+    This works like :class:`textops.grepany`, except it is case insensitive.
+
+    Args:
+        patterns (list): regular expression strings (case insensitive)
+        key (int or str): test only one column or one key (optional)
+
+    Yields:
+        str, list or dict: the filtered input text
+
+    Examples:
+        >>> input = 'error1\nerror2\nwarning1\ninfo1\nwarning2\ninfo2'
+        >>> input >> grepanyi(['ERROR','INFO'])
+        ['error1', 'error2', 'info1', 'info2']
+    """
+    flags = re.IGNORECASE
+
+class grepanyv(grepany):
+    r"""grepany with inverted matching
+
+    This works like :class:`textops.grepany`, except it returns lines that does NOT match any
+    of the patterns.
+
+    Args:
+        patterns (list): regular expression strings (case sensitive)
+        key (int or str): test only one column or one key (optional)
+
+    Yields:
+        str, list or dict: the filtered input text
+
+    Examples:
+        >>> input = 'error1\nerror2\nwarning1\ninfo1\nwarning2\ninfo2'
+        >>> input >> grepanyv(['^err','1$'])
+        ['warning2', 'info2']
+    """
+    reverse = True
+
+class grepanyvi(grepanyv):
+    r"""grepany case insensitive with inverted matching
+
+    This works like :class:`textops.grepanyv`, except it is case insensitive.
+
+    Args:
+        patterns (list): regular expression strings (case insensitive)
+        key (int or str): test only one column or one key (optional)
+
+    Yields:
+        str, list or dict: the filtered input text
+
+    Examples:
+        >>> input = 'error1\nerror2\nwarning1\ninfo1\nwarning2\ninfo2'
+        >>> input >> grepanyvi(['ERROR','INFO'])
+        ['warning1', 'warning2']
+    """
+    flags = re.IGNORECASE
+
 class grepc(TextOp):
     r"""Count lines having a specified pattern
 
@@ -206,12 +508,37 @@ class grepc(TextOp):
             return 0
         if pattern is None:
             pattern = cls.pattern
-        regex = re.compile(pattern,cls.flags) if isinstance(pattern,str) else pattern
+        regex = compile_regex(pattern,cls.flags)
+        lines = cls._tolist(text)
+        if cls.exit_on_found:
+            # line by line : no line is read after the first one found
+            return bool(cls.count_lines(lines, regex, key, has_key, attr, has_attr))
         count = 0
-        for line in cls._tolist(text):
+        select = None
+        lines_iter = iter(lines)
+        for lines in iter(lambda: list(itertools.islice(lines_iter, textops.base.BATCH_LINES)), []):
+            if select is None and len(lines) >= DEDICATED_LOOP_MIN:
+                # a loop dedicated to the type of the lines is chosen from the first one
+                select = _grep_select_fn(regex, cls.reverse, lines[0], key, has_key, attr, has_attr)
+            if select:
+                try:
+                    count += len(select(lines))
+                except (ValueError, TypeError, IndexError, KeyError, AttributeError):
+                    select = False  # the type of the lines has changed : generic code from now on
+                    count += cls.count_lines(lines, regex, key, has_key, attr, has_attr)
+            else:
+                count += cls.count_lines(lines, regex, key, has_key, attr, has_attr)
+        return count
+
+    @classmethod
+    def count_lines(cls, lines, regex, key, has_key, attr, has_attr):
+        search = literal_search(regex)
+        line_type, to_text = _line_type(regex)
+        count = 0
+        for line in lines:
             try:
-                if isinstance(line,str):
-                    if bool(regex.search(stru(line))) != cls.reverse:  # kind of XOR with cls.reverse
+                if isinstance(line,line_type):
+                    if bool(search(line)) != cls.reverse:  # kind of XOR with cls.reverse
                         count += 1
                         if cls.exit_on_found:
                             break
@@ -221,7 +548,7 @@ class grepc(TextOp):
                         if cls.exit_on_found:
                             break
                 elif key is not None:
-                    if bool(regex.search(stru(line[key]))) != cls.reverse:  # kind of XOR with cls.reverse
+                    if bool(search(to_text(line[key]))) != cls.reverse:  # kind of XOR with cls.reverse
                         count += 1
                         if cls.exit_on_found:
                             break
@@ -231,20 +558,18 @@ class grepc(TextOp):
                         if cls.exit_on_found:
                             break
                 elif attr is not None:
-                    if bool(regex.search(
-                            stru(getattr(line, attr, '')))) != cls.reverse:  # kind of XOR with cls.reverse
+                    if bool(search(
+                            to_text(getattr(line, attr, '')))) != cls.reverse:  # kind of XOR with cls.reverse
                         count += 1
                         if cls.exit_on_found:
                             break
                 else:
-                    if bool(regex.search(stru(line))) != cls.reverse:  # kind of XOR with cls.reverse
+                    if bool(search(to_text(line))) != cls.reverse:  # kind of XOR with cls.reverse
                         count += 1
                         if cls.exit_on_found:
                             break
             except (ValueError, TypeError, IndexError, KeyError):
                 pass
-        if cls.exit_on_found:
-            return bool(count)
         return count
 
 class grepci(grepc):
@@ -327,8 +652,15 @@ class haspattern(grepc):
         True
         >>> input | haspattern('ERROR')
         False
+        >>> def source():
+        ...     yield 'starting'
+        ...     yield 'error1'
+        ...     raise Exception('read past the pattern')
+        >>> source() | haspattern('error')
+        True
     """
     exit_on_found = True
+    stops_early = True
 
 class haspatterni(haspattern):
     r"""Tests if the input text matches the specified pattern
@@ -370,6 +702,10 @@ class rmblank(grepv):
 class lcount(TextOp):
     r"""Count lines
 
+    Args:
+        files (bool): if True, the input text lines are file paths and the lines of these files
+            are counted by big binary blocks (see :class:`textops.wcl`)
+
     Returns:
         int: number of lines
 
@@ -379,7 +715,9 @@ class lcount(TextOp):
         6
     """
     @classmethod
-    def op(cls,text,*args,**kwargs):
+    def op(cls,text,files=False,*args,**kwargs):
+        if files:
+            return textops.ops.wcl.op(text)
         count = 0
         for line in cls._tolist(text):
             count+=1
@@ -413,24 +751,25 @@ class wcount(TextOp):
             return 0
         if pattern is None:
             pattern = cls.pattern
-        regex = re.compile(pattern,cls.flags)
+        regex = compile_regex(pattern,cls.flags)
+        split = compile_regex(r'\s+').split
         count = 0
         for line in cls._tolist(text):
             try:
                 if isinstance(line,str):
-                    words = re.split(r'\s+',line.strip())
+                    words = split(line.strip())
                 elif isinstance(line,list):
                     if key is None:
                         words = line
                     else:
-                        words = re.split(r'\s+',stru(line[key]).strip())
+                        words = split(stru(line[key]).strip())
                 elif isinstance(line,dict):
                     if key is None:
                         words = list(line.values())
                     else:
-                        words = re.split(r'\s+',stru(line[key]).strip())
+                        words = split(stru(line[key]).strip())
                 else:
-                    words = re.split(r'\s+',stru(line).strip())
+                    words = split(stru(line).strip())
 
                 for word in words:
                     if bool(regex.search(stru(word))) != cls.reverse:  # kind of XOR with cls.reverse
@@ -647,50 +986,297 @@ class formatdicts(TextOp):
     def op(cls,items,format_str='{key} : {val}\n',join_str = '', context={}, defvalue='-',*args,**kwargs):
         return join_str.join([eformat(format_str,(),dict(context,**d),defvalue) for d in items ])
 
+# number of lines pickled at once in a sorted run file, also read at once when merging
+SORT_CHUNK = 1024
+
+def line_size(line):
+    r"""Returns the approximate memory size of a line in bytes
+
+    This is the size of the line object, plus the size of its items for a list, a tuple or
+    a dict (nested objects are not measured), plus the reference kept by the list of lines.
+
+    Args:
+        line (object): the line
+
+    Returns:
+        int: the size in bytes
+
+    Examples:
+        >>> import sys
+        >>> from textops.ops.listops import line_size
+        >>> line_size('abc') == sys.getsizeof('abc') + 8
+        True
+        >>> line_size(['a', 'b']) == sys.getsizeof(['a', 'b']) + 2 * sys.getsizeof('a') + 8
+        True
+    """
+    size = sys.getsizeof(line) + 8
+    if isinstance(line, (list, tuple)):
+        size += sum(map(sys.getsizeof, line))
+    elif isinstance(line, dict):
+        size += sum(map(sys.getsizeof, line.values())) + sum(map(sys.getsizeof, line))
+    return size
+
+def external_sort(lines, key=None, reverse=False, max_memory=None):
+    r"""Sorts lines like :func:`sorted`, within a memory budget
+
+    Lines are read and sorted by runs of about ``max_memory`` bytes (see :func:`line_size`).
+    Each sorted run but the last one is pickled in a temporary file (in the ``TMPDIR``
+    directory), then the runs are merged with :func:`heapq.merge` : only the last run and
+    ``SORT_CHUNK`` lines per file are kept in memory. The lines must be picklable.
+    The result is exactly the one of :func:`sorted` : the sort is stable, equal lines are
+    in the input order, even with ``reverse=True``. If all the lines fit in the budget,
+    no file is written.
+
+    Args:
+        lines (iterable): the lines to sort
+        key (callable): specifies a function of one argument that is used to extract a comparison
+            key from each line (Default : None)
+        reverse (bool): If set to True, the lines are sorted as if each comparison were reversed
+        max_memory (int): the memory budget in bytes, None for no budget (Default : None)
+
+    Yields:
+        object: the sorted lines
+
+    Examples:
+        >>> from textops.ops.listops import external_sort
+        >>> lines = [ 'line%d' % (i * 7 % 10) for i in range(10) ]
+        >>> list(external_sort(lines, max_memory=200)) == sorted(lines)
+        True
+        >>> list(external_sort(lines, key=lambda l:int(l[4]) % 3, reverse=True, max_memory=200))
+        ['line8', 'line5', 'line2', 'line7', 'line4', 'line1', 'line0', 'line9', 'line6', 'line3']
+    """
+    if max_memory is None:
+        yield from sorted(lines, key=key, reverse=reverse)
+        return
+    runs = []
+    try:
+        run = []
+        size = 0
+        for line in lines:
+            run.append(line)
+            size += line_size(line)
+            if size >= max_memory:
+                run.sort(key=key, reverse=reverse)
+                runs.append(_spill_run(run))
+                run = []
+                size = 0
+        run.sort(key=key, reverse=reverse)
+        if not runs:
+            yield from run
+            return
+        yield from heapq.merge(*[ _read_run(fh) for fh in runs ], run, key=key, reverse=reverse)
+    finally:
+        for fh in runs:
+            fh.close()
+
+def _spill_run(run):
+    r"""Pickles a list of lines in a temporary file by chunks of ``SORT_CHUNK`` lines
+
+    Args:
+        run (list): the lines
+
+    Returns:
+        file: the temporary file opened in binary mode, at offset 0, it is removed when closed
+    """
+    fh = tempfile.TemporaryFile()
+    for i in range(0, len(run), SORT_CHUNK):
+        pickle.dump(run[i:i + SORT_CHUNK], fh, pickle.HIGHEST_PROTOCOL)
+    fh.seek(0)
+    return fh
+
+def _read_run(fh):
+    r"""Yields the lines pickled by :func:`_spill_run`
+
+    Args:
+        fh (file): the file returned by :func:`_spill_run`
+
+    Yields:
+        object: the lines
+    """
+    while True:
+        try:
+            chunk = pickle.load(fh)
+        except EOFError:
+            return
+        yield from chunk
+
 class sortlists(TextOp):
-    r"""Sort list of dicts
+    r"""Sort list of lists
 
     Args:
         col (int or tuple/list): The column number or list of columns as sorting criteria
         reverse (bool): Reverse the sort (Default : False)
+        max_memory (int): if specified, the lines are sorted within this memory budget in bytes
+            by :func:`external_sort` (Default : None)
 
     Returns:
-        list of lists: sorted input
+        list of lists: sorted input (a generator if max_memory is specified)
 
     Examples:
-        to come...
+        >>> [ ['b',2], ['a',3], ['b',1] ] >> sortlists(0)
+        [['a', 3], ['b', 2], ['b', 1]]
+        >>> [ ['b',2], ['a',3], ['b',1] ] >> sortlists((0,1), reverse=True, max_memory=100)
+        [['b', 2], ['b', 1], ['a', 3]]
     """
     @classmethod
-    def op(cls,lists, col, reverse=False,*args,**kwargs):
-        if isinstance(col,(tuple,list)):
-            fn = lambda x:[ x[c] for c in col ]
-        else:
-            fn = lambda x: x[col]
-
+    def op(cls,lists, col, reverse=False, max_memory=None, *args,**kwargs):
+        fn = sort_key(col)
+        if max_memory is not None:
+            return external_sort(cls._tolist(lists), fn, reverse, max_memory)
         return sorted(lists,key = fn, reverse=reverse)
 
+    @classmethod
+    def merge_step(cls, step, next_step):
+        """Merges ``sortlists(col).head(n)`` into :class:`textops.bottomk` or :class:`textops.topk`"""
+        return _merge_sort_head(step, next_step,
+                               lambda col, reverse=False, *args,**kwargs: (sort_key(col), reverse))
+
 class sortdicts(TextOp):
     r"""Sort list of dicts
 
     Args:
         key (int or tuple/list): The dict key or list of keys as sorting criteria
         reverse (bool): Reverse the sort (Default : False)
+        max_memory (int): if specified, the lines are sorted within this memory budget in bytes
+            by :func:`external_sort` (Default : None)
 
     Returns:
-        list of dicts: sorted input
+        list of dicts: sorted input (a generator if max_memory is specified)
 
     Examples:
-        to come...
+        >>> [ {'n':'b','v':2}, {'n':'a','v':3}, {'n':'b','v':1} ] >> sortdicts('v')
+        [{'n': 'b', 'v': 1}, {'n': 'b', 'v': 2}, {'n': 'a', 'v': 3}]
+        >>> dicts = [ {'n':'b','v':2}, {'n':'a','v':3}, {'n':'b','v':1} ]
+        >>> dicts >> sortdicts(('n','v'), max_memory=100)
+        [{'n': 'a', 'v': 3}, {'n': 'b', 'v': 1}, {'n': 'b', 'v': 2}]
     """
     @classmethod
-    def op(cls,dicts, key, reverse=False,*args,**kwargs):
-        if isinstance(key,(tuple,list)):
-            fn = lambda x:[ x[k] for k in key ]
-        else:
-            fn = lambda x: x[key]
-
+    def op(cls,dicts, key, reverse=False, max_memory=None, *args,**kwargs):
+        fn = sort_key(key)
+        if max_memory is not None:
+            return external_sort(cls._tolist(dicts), fn, reverse, max_memory)
         return sorted(dicts,key = fn, reverse = reverse)
 
+    @classmethod
+    def merge_step(cls, step, next_step):
+        """Merges ``sortdicts(key).head(n)`` into :class:`textops.bottomk` or :class:`textops.topk`"""
+        return _merge_sort_head(step, next_step,
+                               lambda key, reverse=False, *args,**kwargs: (sort_key(key), reverse))
+
+def sort_key(key):
+    r"""Returns the function extracting a sort key from a line
+
+    Args:
+        key (int, str, tuple/list or callable): the column number or the dict key, a list of them,
+            or a function of one argument returning the key, None to compare the lines themselves
+
+    Returns:
+        callable: the key function, None if key is None
+
+    Examples:
+        >>> from textops.ops.listops import sort_key
+        >>> sort_key(1)(['a', 'b', 'c'])
+        'b'
+        >>> sort_key(('n', 'v'))({'n': 'a', 'v': 3})
+        ('a', 3)
+        >>> sort_key(len)('abc')
+        3
+    """
+    if key is None or callable(key):
+        return key
+    if isinstance(key,(tuple,list)):
+        return itemgetter(*key) if key else lambda x:()
+    return itemgetter(key)
+
+def _merge_sort_head(step, next_step, key_reverse):
+    r"""Merges a sort followed by ``head(n)`` into a selection of the n first lines by a heap
+
+    :func:`heapq.nsmallest` or :func:`heapq.nlargest` is used like :class:`textops.bottomk`
+    and :class:`textops.topk` : the result is the same, the input is read once and only n
+    lines are kept in memory. This is the ``merge_step()`` of :class:`textops.dosort`,
+    :class:`textops.sortlists` and :class:`textops.sortdicts`.
+
+    Args:
+        step (PlanStep): the sort step
+        next_step (PlanStep): the step following the sort
+        key_reverse (callable): given the sort arguments, returns the key function and
+            the reverse flag
+
+    Returns:
+        MergedStep: the merged step, None if the next step is not ``head(n)``
+    """
+    args, kwargs = next_step.args, next_step.kwargs
+    if next_step.opcls is not head or len(args) + len(kwargs) != 1 or set(kwargs) - {'lines'}:
+        return None
+    n = args[0] if args else kwargs['lines']
+    if not isinstance(n, int):
+        return None
+    def merged(text, *sort_args,**sort_kwargs):
+        key, reverse = key_reverse(*sort_args,**sort_kwargs)
+        select = heapq.nlargest if reverse else heapq.nsmallest
+        return select(n, TextOp._tolist(text), key=key)
+    return MergedStep((step, next_step), merged)
+
+class topk(TextOp):
+    r"""Return the n greatest lines
+
+    This gives the same result as a reverse sort followed by ``head(n)``, but it uses
+    :func:`heapq.nlargest` : only n lines are kept in memory and the input is not sorted.
+    Note that a sort (:class:`textops.dosort`, :class:`textops.sortlists` or
+    :class:`textops.sortdicts`) followed by ``head(n)`` is automatically merged into the same
+    selection.
+
+    Args:
+        n (int): the number of lines to return
+        key (int, str, tuple/list or callable): for lists, the column number or a list of columns,
+            for dicts, the key or a list of keys, or a function of one argument returning the key
+            to compare (Default : None, compare the lines themselves)
+
+    Returns:
+        list: the n greatest lines, the greatest first
+
+    Examples:
+        >>> '3\n10\n7\n1' >> topk(2, key=int)
+        ['10', '7']
+        >>> [ ['a',3], ['b',10], ['c',7] ] >> topk(2, 1)
+        [['b', 10], ['c', 7]]
+        >>> logs = [ {'url':'/a','bytes':300}, {'url':'/b','bytes':100}, {'url':'/c','bytes':200} ]
+        >>> logs >> topk(1, 'bytes')
+        [{'url': '/a', 'bytes': 300}]
+        >>> logs >> sortdicts('bytes', reverse=True).head(2)
+        [{'url': '/a', 'bytes': 300}, {'url': '/c', 'bytes': 200}]
+    """
+    select = staticmethod(heapq.nlargest)
+
+    @classmethod
+    def op(cls, text, n, key=None, *args,**kwargs):
+        return cls.select(n, cls._tolist(text), key=sort_key(key))
+
+class bottomk(topk):
+    r"""Return the n smallest lines
+
+    This works like :class:`textops.topk` except it uses :func:`heapq.nsmallest` : this gives
+    the same result as a sort followed by ``head(n)``.
+
+    Args:
+        n (int): the number of lines to return
+        key (int, str, tuple/list or callable): for lists, the column number or a list of columns,
+            for dicts, the key or a list of keys, or a function of one argument returning the key
+            to compare (Default : None, compare the lines themselves)
+
+    Returns:
+        list: the n smallest lines, the smallest first
+
+    Examples:
+        >>> '3\n10\n7\n1' >> bottomk(2, key=int)
+        ['1', '3']
+        >>> [ ['a',3], ['b',10], ['c',7] ] >> bottomk(2, 1)
+        [['a', 3], ['c', 7]]
+        >>> 'b\nd\na\nc' >> dosort().head(2)
+        ['a', 'b']
+    """
+    select = staticmethod(heapq.nsmallest)
+
 class dorender(TextOp):
     r"""Formats list of strings
 
@@ -835,6 +1421,7 @@ class first(TextOp):
         >>> [{'key':'a','val':1},{'key':'b','val':2},{'key':'c','val':3}] | first()
         {'key': 'a', 'val': 1}
     """
+    stops_early = True
     @classmethod
     def op(cls,text,*args,**kwargs):
         for line in cls._tolist(text):
@@ -891,6 +1478,7 @@ class head(TextOp):
         >>> [{'key':'a','val':1},{'key':'b','val':2},{'key':'c','val':3}] | head(2).tolist()
         [{'key': 'a', 'val': 1}, {'key': 'b', 'val': 2}]
     """
+    stops_early = True
     @classmethod
     def op(cls,text,lines,*args,**kwargs):
         for i,line in enumerate(cls._tolist(text)):
@@ -958,13 +1546,7 @@ class tail(TextOp):
     """
     @classmethod
     def op(cls,text,lines,*args,**kwargs):
-        buffer = []
-        for line in cls._tolist(text):
-            buffer.append(line)
-            if len(buffer) > lines:
-                buffer.pop(0)
-        for line in buffer:
-            yield line
+        yield from collections.deque(cls._tolist(text), maxlen=max(lines, 0))
 
 class less(TextOp):
     r"""Return all lines from the input text except the n last lines
@@ -993,11 +1575,7 @@ class less(TextOp):
     """
     @classmethod
     def op(cls,text,lines,*args,**kwargs):
-        buffer = []
-        for line in cls._tolist(text):
-            buffer.append(line)
-            if len(buffer) > lines:
-                yield buffer.pop(0)
+        return drop_last(cls._tolist(text), lines)
 
 class skess(TextOp):
     r"""skip x lines at the beginning and y at the end from the input text
@@ -1028,14 +1606,54 @@ class skess(TextOp):
     """
     @classmethod
     def op(cls,text,begin, end, *args,**kwargs):
-        buffer = []
-        for line in cls._tolist(text):
-            if begin > 0:
-                begin -= 1
-            else:
-                buffer.append(line)
-                if len(buffer) > end:
-                    yield buffer.pop(0)
+        return drop_last(itertools.islice(cls._tolist(text), max(begin, 0), None), end)
+
+def drop_last(lines, nb):
+    """ Yields all lines except the ``nb`` last ones, keeping only ``nb`` lines in a ring buffer """
+    lines = iter(lines)
+    if nb <= 0:
+        yield from lines
+        return
+    window = collections.deque(itertools.islice(lines, nb), maxlen=nb)
+    for line in lines:
+        oldest = window[0]
+        window.append(line)
+        yield oldest
+
+def context_lines(lines, match, before=0, after=0, first_only=False):
+    """ Yields the lines selected by ``match`` with their context, like ``grep -B -A``
+
+    ``match(line)`` returns a true value for the lines to select : ``(number, line, found)`` is
+    yielded for them, ``found`` being the value returned by ``match``, and for the ``before``
+    lines preceding them and the ``after`` lines following them with ``found`` set to None.
+    The preceding lines are kept in a ring buffer. None is yielded between two groups of
+    non-contiguous lines. If ``first_only`` is True, no more lines are selected after the first one.
+    """
+    window = collections.deque(maxlen=before) if before > 0 else None
+    remaining = 0
+    last = None
+    done = False
+    for nbr, line in enumerate(lines):
+        found = None if done else match(line)
+        if found:
+            first = nbr - len(window) if window else nbr
+            if last is not None and first > last + 1:
+                yield None
+            if window:
+                yield from zip(itertools.count(first), window, itertools.repeat(None))
+                window.clear()
+            yield nbr, line, found
+            last = nbr
+            remaining = after
+            done = first_only
+        elif remaining > 0:
+            remaining -= 1
+            last = nbr
+            yield nbr, line, None
+        elif done:
+            break
+        elif window is not None:
+            window.append(line)
 
 class findhighlight(TextOp):
     r"""find one or more pattern in a text then higlight it
@@ -1109,54 +1727,98 @@ class findhighlight(TextOp):
     def op(cls,text,pattern,line_prefix='   ',line_suffix='', hline_prefix='-> ',hline_suffix='',
            found_prefix='>>>',found_suffix='<<<',nlines=0, blines=0, elines=0, ellipsis='...',
            findall=True, ignorecase=False, line_nbr=False, *args,**kwargs):
-        buffer = []
         blines = blines or nlines
         elines = elines or nlines
-        if isinstance(pattern,str):
-            pattern = re.compile(pattern,re.I if ignorecase else 0)
-        elines_cptr = 0
-        last_found_line = 0
+        pattern = compile_regex(pattern,re.I if ignorecase else 0)
+        found = literal_search(pattern)
         if line_nbr:
             line_prefix='{line:4} '+line_prefix
             hline_prefix='{line:4} '+hline_prefix
-        for line_nbr,line in enumerate(cls._tolist(text)):
-            hlprefix=hline_prefix.format(line=line_nbr+1)
-            hlsuffix=hline_suffix.format(line=line_nbr+1)
-            lprefix=line_prefix.format(line=line_nbr+1)
-            lsuffix=line_suffix.format(line=line_nbr+1)
-            m=pattern.search(stru(line))
+
+        # prefixes, suffixes and highlighting are done only for the displayed lines
+        def format_line(nbr, line, m):
+            if not m:
+                return line_prefix.format(line=nbr+1) + line + line_suffix.format(line=nbr+1)
+            m = pattern.search(stru(line))
+            while m:
+                line = line[:m.end()] + found_suffix + line[m.end():]
+                line = line[:m.start()] + found_prefix + line[m.start():]
+                m = pattern.search(stru(line),m.end()+len(found_prefix+found_suffix))
+            return hline_prefix.format(line=nbr+1) + line + hline_suffix.format(line=nbr+1)
+
+        buffer = collections.deque()
+        elines_cptr = 0
+        last_found_line = 0
+        for nbr,line in enumerate(cls._tolist(text)):
+            m = found(line if isinstance(line, str) else stru(line))
             if m and (findall or last_found_line==0):
                 if blines:
-                    if last_found_line and ellipsis and line_nbr > last_found_line+blines+elines+1:
+                    if last_found_line and ellipsis and nbr > last_found_line+blines+elines+1:
                         yield ellipsis
-                    ellipsis_flag = True
-                    for l in buffer:
-                        yield l
-                    buffer=[]
-                while m:
-                    line = line[:m.end()] + found_suffix + line[m.end():]
-                    line = line[:m.start()] + found_prefix + line[m.start():]
-                    m=pattern.search(stru(line),m.end()+len(found_prefix+found_suffix))
-                line = hlprefix + line + hlsuffix
+                    while buffer:
+                        yield format_line(*buffer.popleft())
                 elines_cptr = elines+1
-                last_found_line = line_nbr
+                last_found_line = nbr
             else:
-                line = lprefix + line + lsuffix
-
-            buffer.append(line)
-            while len(buffer)>=blines+1 or (elines_cptr>0 and len(buffer)):
+                m = None
+            buffer.append((nbr, line, m))
+            while len(buffer)>=blines+1 or (elines_cptr>0 and buffer):
                 if not elines or elines_cptr>0:
-                    yield buffer.pop(0)
+                    yield format_line(*buffer.popleft())
                 else:
-                    buffer.pop(0)
+                    buffer.popleft()
                 elines_cptr-=1
-
-        for line in buffer:
+        for item in buffer:
             if not elines or elines_cptr>0:
-                yield line
+                yield format_line(*item)
             elines_cptr-=1
 
-class sed(TextOp):
+class grepctx(TextOp):
+    r"""Select lines having a specified pattern with the lines around them
+
+    This works like the shell command ``grep -B before -A after`` : the lines matching the pattern
+    are yielded with the ``before`` lines preceding them and the ``after`` lines following them.
+    Only the ``before`` last lines are kept in memory, in a ring buffer.
+    A separator is yielded between two groups of non-contiguous lines.
+    Like :class:`textops.grep`, one can test only one column or one key of lists or dicts.
+
+    Args:
+        pattern (str): a regular expression string (case sensitive)
+        before (int): number of lines to yield before each matching line (Default : 0)
+        after (int): number of lines to yield after each matching line (Default : 0)
+        sep (str): the separator between groups of lines, None for no separator (Default : ``--``)
+        key (int or str): test the pattern only one column or one key (optional)
+        has_key (int or str): test only if the test_key is in the inner list or dict (optional)
+        attr (str): for list of objects, test the pattern on the object `attr` attribute (optional)
+        has_attr (int or str): For list of objects, test if the attribute `has_attr` exists (optional)
+
+    Yields:
+        str, list or dict: the matching lines with their context and the separators
+
+    Examples:
+        >>> logs = ['start', 'connect', 'error: timeout', 'retry', 'ok', 'idle', 'connect',
+        ...         'error: refused', 'stop']
+        >>> logs >> grepctx('error', before=1, after=1)
+        ['connect', 'error: timeout', 'retry', '--', 'connect', 'error: refused', 'stop']
+        >>> logs >> grepctx('error', after=3, sep=None)
+        ['error: timeout', 'retry', 'ok', 'idle', 'error: refused', 'stop']
+        >>> logs >> grepctx('error', 4)
+        ['start', 'connect', 'error: timeout', 'retry', 'ok', 'idle', 'connect', 'error: refused']
+        >>> [('connect', 1), ('error', 2), ('ok', 3)] >> grepctx('error', 1, key=0)
+        [('connect', 1), ('error', 2)]
+    """
+    @classmethod
+    def op(cls, text, pattern, before=0, after=0, sep='--', key=None, has_key=None, attr=None,
+           has_attr=None, *args,**kwargs):
+        fn = grep.line_fn(pattern, key, has_key, attr, has_attr)
+        match = lambda line: fn(line) is not SKIP_LINE
+        for item in context_lines(cls._tolist(text), match, before, after):
+            if item is not None:
+                yield item[1]
+            elif sep is not None:
+                yield sep
+
+class sed(LineOp):
     r"""Replace pattern on-the-fly
 
     Works like the shell command 'sed'. It uses :func:`re.sub` to replace the pattern, this means that
@@ -1195,29 +1857,45 @@ class sed(TextOp):
     """
     flags = 0
     @classmethod
-    def op(cls,text,pats,repls,*args,**kwargs):
+    def substitutions(cls,pats,repls):
         if not isinstance(pats,(list,tuple)):
             pats = [pats]
         nbpats=len(pats)
         if not isinstance(repls,(list,tuple)):
             repls = [repls] * nbpats
         if nbpats != len(repls):
-            repls += [None] * nbpats
+            repls = list(repls) + [None] * nbpats
             repls = repls[:nbpats]
-        for line in cls._tolist(text):
-            for pat,repl in zip(pats,repls):
-                if repl is not None:
-                    if isinstance(pat, str):
-                        pat = re.compile(pat,cls.flags)
-                    if isinstance(line, str):
-                        line = pat.sub(repl,line)
-                    elif isinstance(line, list):
-                        line = [ pat.sub(repl,stru(item)) for item in line ]
-                    elif isinstance(line, dict):
-                        line = dict([(k,pat.sub(repl,stru(v))) for k,v in list(line.items())])
-                    else:
-                        line = pat.sub(repl,stru(line))
-            yield line
+        return [ (compile_regex(pat,cls.flags), repl)
+                 for pat,repl in zip(pats,repls) if repl is not None ]
+
+    @classmethod
+    def line_fn(cls,pats,repls,*args,**kwargs):
+        subs = cls.substitutions(pats,repls)
+        line_type, to_text = _line_type(subs[0][0] if subs else None)
+        def line_fn(line):
+            for pat,repl in subs:
+                if isinstance(line, line_type):
+                    line = pat.sub(repl,line)
+                elif isinstance(line, list):
+                    line = [ pat.sub(repl,to_text(item)) for item in line ]
+                elif isinstance(line, dict):
+                    line = dict([(k,pat.sub(repl,to_text(v))) for k,v in list(line.items())])
+                else:
+                    line = pat.sub(repl,to_text(line))
+            return line
+        return line_fn
+
+    @classmethod
+    def op_batch(cls,lines,pats,repls,*args,**kwargs):
+        subs = cls.substitutions(pats,repls)
+        if len(subs) == 1:
+            pat, repl = subs[0]
+            sub = pat.sub
+            line_type = _line_type(pat)[0]
+            fn = cls.line_fn(pats,repls)
+            return [ sub(repl,line) if isinstance(line, line_type) else fn(line) for line in lines ]
+        return list(map(cls.line_fn(pats,repls), lines))
 
 class sedi(sed):
     r"""Replace pattern on-the-fly (case insensitive)
@@ -1239,7 +1917,7 @@ class sedi(sed):
     """
     flags = re.IGNORECASE
 
-class dostrip(TextOp):
+class dostrip(LineOp):
     r"""Strip lines
 
     Works like the python :func:`str.strip` except it is more flexible it that way it works on list of lists
@@ -1253,16 +1931,17 @@ class dostrip(TextOp):
         'Hello Eric\nHello Guido'
     """
     @classmethod
-    def op(cls,text,*args,**kwargs):
-        for line in cls._tolist(text):
-            if isinstance(line, str):
-                yield line.strip()
-            elif isinstance(line, list):
-                yield [ stru(item).strip() for item in line ]
-            elif isinstance(line, dict):
-                yield dict([(k,stru(v).strip()) for k,v in list(line.items())])
-            else:
-                yield stru(line).strip()
+    def line_fn(cls,*args,**kwargs):
+        return _dostrip_line
+
+def _dostrip_line(line):
+    if isinstance(line, str):
+        return line.strip()
+    elif isinstance(line, list):
+        return [ stru(item).strip() for item in line ]
+    elif isinstance(line, dict):
+        return dict([(k,stru(v).strip()) for k,v in list(line.items())])
+    return stru(line).strip()
 
 class between(TextOp):
     r"""Extract lines between two patterns
@@ -1330,6 +2009,7 @@ class between(TextOp):
         >>> print(s | between(['Chapter 2','---'],r'^\s*$').tostr())
         infos I want
     """
+    stops_early = True
     flags = 0
     boundaries = False
     @classmethod
@@ -1340,7 +2020,7 @@ class between(TextOp):
             lst = [string_or_list]
         else:
             lst = list(string_or_list)
-        return [ re.compile(pat,cls.flags) if isinstance(pat, str) else pat for pat in lst ]
+        return [ compile_regex(pat,cls.flags) for pat in lst ]
 
     @classmethod
     def op(cls, text, begin, end, get_begin=None, get_end=None, key=None, *args,**kwargs):
@@ -1453,7 +2133,7 @@ class betweenbi(betweenb):
     """
     flags = re.IGNORECASE
 
-class linetester(TextOp):
+class linetester(LineOp):
     r""" Abstract class for by-line testing"""
     @classmethod
     def testline(cls, to_test, *args,**kwargs):
@@ -1474,7 +2154,7 @@ class linetester(TextOp):
             return lambda l:l
 
     @classmethod
-    def op(cls, text, *args,**kwargs):
+    def predicate(cls, *args,**kwargs):
         key = kwargs.get('key')
         attr = kwargs.get('attr')
         castfn = cls.castfn(*args,**kwargs)
@@ -1492,14 +2172,18 @@ class linetester(TextOp):
         else:
             getkey = lambda l: l
 
-        for line in cls._tolist(text):
-            try:
-                to_test = getkey(line)
-                to_test = castfn(to_test)
-                if cls.testline(to_test, *args,**kwargs):
-                    yield line
-            except (ValueError, TypeError, IndexError, KeyError):
-                raise
+        testline = cls.testline
+        return lambda line: testline(castfn(getkey(line)), *args,**kwargs)
+
+    @classmethod
+    def line_fn(cls, *args,**kwargs):
+        predicate = cls.predicate(*args,**kwargs)
+        return lambda line: line if predicate(line) else SKIP_LINE
+
+    @classmethod
+    def op_batch(cls, lines, *args,**kwargs):
+        predicate = cls.predicate(*args,**kwargs)
+        return [ line for line in lines if predicate(line) ]
 
 class inrange(linetester):
     r"""Extract lines between a range of strings
@@ -1923,7 +2607,7 @@ class afteri(after):
     """
     flags = re.IGNORECASE
 
-class mapfn(TextOp):
+class mapfn(LineOp):
     r"""Apply a specified function on every line
 
     It works like the python map() function.
@@ -1941,11 +2625,14 @@ class mapfn(TextOp):
         ['aa', 'bb', 'cc']
     """
     @classmethod
-    def op(cls, text, map_fn, *args,**kwargs):
-        for line in cls._tolist(text):
-            yield map_fn(line)
+    def line_fn(cls, map_fn, *args,**kwargs):
+        return map_fn
+
+    @classmethod
+    def op_batch(cls, lines, map_fn, *args,**kwargs):
+        return list(map(map_fn, lines))
 
-class iffn(TextOp):
+class iffn(LineOp):
     r"""Filters the input text with a specified function
 
     It works like the python filter() fonction.
@@ -1965,14 +2652,12 @@ class iffn(TextOp):
         ['line1', 'line3']
     """
     @classmethod
-    def op(cls, text, filter_fn=None, *args,**kwargs):
+    def line_fn(cls, filter_fn=None, *args,**kwargs):
         if filter_fn is None:
             filter_fn = lambda x:x
-        for line in cls._tolist(text):
-            if filter_fn(line):
-                yield line
+        return lambda line: line if filter_fn(line) else SKIP_LINE
 
-class mapif(TextOp):
+class mapif(LineOp):
     r"""Filters and maps the input text with 2 specified functions
 
     Filters input text AND apply a map function on every filtered lines.
@@ -1993,12 +2678,10 @@ class mapif(TextOp):
         ['a1a1', 'c3c3']
     """
     @classmethod
-    def op(cls, text, map_fn, filter_fn=None,*args,**kwargs):
+    def line_fn(cls, map_fn, filter_fn=None,*args,**kwargs):
         if filter_fn is None:
             filter_fn = lambda x:x
-        for line in cls._tolist(text):
-            if filter_fn(line):
-                yield map_fn(line)
+        return lambda line: map_fn(line) if filter_fn(line) else SKIP_LINE
 
 class doreduce(TextOp):
     r"""Reduce the input text
@@ -2047,6 +2730,490 @@ class merge_dicts(TextOp):
                 out.update(dct)
         return out
 
+def _to_number(value):
+    r"""Converts a string into an int or a float, other values are returned as they are
+
+    Args:
+        value (object): the value to convert
+
+    Returns:
+        int, float or object: the converted value
+
+    Raises:
+        ValueError: if the string is not a number
+
+    Examples:
+        >>> from textops.ops.listops import _to_number
+        >>> _to_number('42'), _to_number(' 4.5 '), _to_number(b'7'), _to_number(3)
+        (42, 4.5, 7, 3)
+    """
+    if isinstance(value, (str, bytes)):
+        try:
+            return int(value)
+        except ValueError:
+            return float(value)
+    return value
+
+_MISSING = object()
+
+class groupby(TextOp):
+    r"""Group lines by key and aggregate each group in one pass
+
+    The lines (lists or dicts) are read once : each group is a set of accumulators in a hash
+    table, so only one line and one accumulator per group are in memory. One row per group is
+    generated at the end, in the order the groups appeared : a :class:`textops.DictExt` having
+    the key fields and the aggregate values.
+
+    An aggregate is given as ``name: (function, field)`` in ``aggs``, where field is the column
+    number for lists or the dict key for dicts (or a callable given the line), function is one of :
+
+    * ``'count'`` : the number of lines, or the number of lines having the field if specified
+    * ``'sum'``, ``'mean'`` : the sum or the mean of the field values, strings are converted
+      into numbers, values that are not numbers (like ``'-'``) are ignored
+    * ``'min'``, ``'max'`` : the smallest or the greatest field value
+    * ``'first'``, ``'last'`` : the field value of the first or the last line of the group
+
+    ``name: 'count'`` may be written instead of ``name: ('count', None)``, a function without a
+    field applies to the whole line. A third item may give a function converting the field
+    values, for example ``('max', 'size', int)``. Lines not having the field (or having None or
+    NoAttr, as the rows of :class:`textops.parseg` for an optional group) are ignored by the
+    aggregate, lines not having the key are ignored. For a group having no value, ``count`` and
+    ``sum`` give 0, ``mean``, ``min``, ``max``, ``first`` and ``last`` give None.
+    Keys that are not hashable (lists, dicts...) are compared by their :meth:`uniq.hashable`
+    equivalent.
+
+    Args:
+        key (int, str, tuple/list or callable): the column number, the dict key or a list
+            of them to group on, or a function of one argument returning the group key
+            (Default : None, the lines themselves)
+        aggs (dict): the aggregates to compute by name (Default : ``{'count': 'count'}``)
+        key_name (str or list): the names of the key fields in the rows (Default : the key if it is
+            a string or a list of strings, otherwise 'key')
+
+    Yields:
+        DictExt: one row per group
+
+    Examples:
+        >>> logs = [ {'url':'/a','status':'200','size':'300'},
+        ...          {'url':'/b','status':'404','size':'-'},
+        ...          {'url':'/a','status':'200','size':'100'},
+        ...          {'url':'/a','status':'500','size':'20'} ]
+        >>> for row in logs | groupby('url', {'hits':'count', 'bytes':('sum','size'),
+        ...                                   'avg':('mean','size'), 'max':('max','size',int)}):
+        ...     print(row)
+        {'url': '/a', 'hits': 3, 'bytes': 420, 'avg': 140.0, 'max': 300}
+        {'url': '/b', 'hits': 1, 'bytes': 0, 'avg': None, 'max': None}
+        >>> logs >> groupby(['url','status'])                  # doctest: +NORMALIZE_WHITESPACE
+        [{'url': '/a', 'status': '200', 'count': 2}, {'url': '/b', 'status': '404', 'count': 1},
+        {'url': '/a', 'status': '500', 'count': 1}]
+        >>> s = 'sshd Failed 10.0.0.1\ncron ok\nsshd Failed 10.0.0.2\nsshd Accepted 10.0.0.1'
+        >>> aggs = {'n':'count', 'first':('first',2), 'last':('last',2)}
+        >>> s | cut().groupby(0, aggs).tolist()                # doctest: +NORMALIZE_WHITESPACE
+        [{'key': 'sshd', 'n': 3, 'first': '10.0.0.1', 'last': '10.0.0.1'},
+        {'key': 'cron', 'n': 1, 'first': None, 'last': None}]
+        >>> s | cut().groupby(0, key_name='prog').tolist()
+        [{'prog': 'sshd', 'count': 3}, {'prog': 'cron', 'count': 1}]
+        >>> 'b\na\nb\nb' | groupby().tolist()
+        [{'key': 'b', 'count': 3}, {'key': 'a', 'count': 1}]
+        >>> [['a',1],['a',1],['b',2]] >> groupby()
+        [{'key': ['a', 1], 'count': 2}, {'key': ['b', 2], 'count': 1}]
+        >>> s = 'GET /a 200 512\nGET /b 304\nGET /a 200 128'
+        >>> rows = s | parseg(r'(?P<method>\S+) (?P<url>\S+) (?P<status>\d+)(?: (?P<size>\d+))?')
+        >>> rows >> groupby('url', {'hits':'count', 'sized':('count','size'), 'bytes':('sum','size')})
+        [{'url': '/a', 'hits': 2, 'sized': 2, 'bytes': 640}, {'url': '/b', 'hits': 1, 'sized': 0, 'bytes': 0}]
+        >>> rows >> groupby('size')
+        [{'size': '512', 'count': 1}, {'size': '128', 'count': 1}]
+    """
+    @classmethod
+    def op(cls, text, key=None, aggs=None, key_name=None, *args,**kwargs):
+        if aggs is None:
+            aggs = {'count': 'count'}
+        if key_name is None:
+            if isinstance(key, str):
+                key_name = key
+            elif isinstance(key, (tuple, list)) and key and all(isinstance(k, str) for k in key):
+                key_name = list(key)
+            else:
+                key_name = 'key'
+        if isinstance(key_name, (tuple, list)) and len(key_name) == 1:
+            key_name = key_name[0]   # itemgetter() of a single key does not return a tuple
+        names = list(aggs)
+        specs = []
+        for name in names:
+            agg = aggs[name]
+            if isinstance(agg, str):
+                agg = (agg,)
+            func, field, convert = (tuple(agg) + (None, None))[:3]
+            if func not in cls.AGGREGATES:
+                raise ListOpError('Unknown aggregate function %r' % (func,))
+            if func in ('sum', 'mean'):
+                convert = convert or _to_number
+            specs.append((func, sort_key(field), convert))
+
+        get_key = sort_key(key)
+        if get_key is None:
+            key_kind = 'line'
+        elif isinstance(key, (tuple, list)):
+            key_kind = 'fields'
+        else:
+            key_kind = 'field'
+        kinds = tuple( (func, get is None, convert is None) for func, get, convert in specs )
+        fns = [ fn for func, get, convert in specs for fn in (get, convert) if fn is not None ]
+        groups = {}
+        unfrozen = {}   # the original keys of the frozen ones
+        cls.group_loop(kinds, key_kind)(cls._tolist(text), groups, unfrozen, get_key, *fns)
+
+        for group_key, acc in groups.items():
+            group_key = unfrozen.get(group_key, group_key)
+            if isinstance(key_name, (tuple, list)):
+                row = textops.DictExt(dict(zip(key_name, group_key)))
+            else:
+                row = textops.DictExt({key_name: group_key})
+            for name, (func, get, convert), value in zip(names, specs, acc):
+                if func == 'mean':
+                    value = value[0] / value[1] if value[1] else None
+                elif value is _MISSING:
+                    value = None
+                row[name] = value
+            yield row
+
+    AGGREGATES = ('count', 'sum', 'mean', 'min', 'max', 'first', 'last')
+    _group_loops = {}
+
+    @classmethod
+    def group_loop(cls, kinds, key_kind):
+        """Returns a function updating the groups accumulators with all the lines
+
+        The loop is unrolled so that each aggregate is updated inline without any function call
+        but the field getters and converters : the generated code is cached by aggregate kinds
+        and by key kind (``'line'``, ``'field'`` or ``'fields'``).
+        """
+        loop = cls._group_loops.get((kinds, key_kind))
+        if loop is not None:
+            return loop
+        args = []
+        inits = []
+        body = []
+        for i, (func, whole_line, no_convert) in enumerate(kinds):
+            inits.append({'count': '0', 'sum': '0', 'mean': '[0, 0]'}.get(func, 'MISSING'))
+            if func == 'count' and whole_line:
+                body.append('acc[%d] += 1' % i)
+                continue
+            if whole_line:
+                get = ['v = line']
+            else:
+                args.append('get%d' % i)
+                get = ['v = get%d(line)' % i, 'if v is None or v is NoAttr: raise KeyError']
+            if not no_convert:
+                args.append('convert%d' % i)
+                get.append('v = convert%d(v)' % i)
+            if func == 'count':
+                update = ['acc[%d] += 1' % i]
+            elif func == 'sum':
+                update = ['acc[%d] += v' % i]
+            elif func == 'mean':
+                update = ['a = acc[%d]' % i, 'a[0] += v', 'a[1] += 1']
+            elif func in ('min', 'max'):
+                update = ['a = acc[%d]' % i,
+                          'if a is MISSING or v %s a: acc[%d] = v' % ('<>'[func == 'max'], i)]
+            else:
+                update = ['acc[%d] = v' % i]
+            block = ['try:'] + [ '    ' + stmt for stmt in get + update ]
+            block.append('except (IndexError, KeyError, TypeError, ValueError): pass')
+            if func == 'first':
+                block = ['if acc[%d] is MISSING:' % i] + [ '    ' + stmt for stmt in block ]
+            body.extend(block)
+        src = 'def group_loop(lines, groups, unfrozen, get_key%s):\n' % ''.join(', ' + a for a in args)
+        src += '    for line in lines:\n'
+        if key_kind == 'line':
+            src += '        k = line\n'
+        else:
+            src += '        try: k = get_key(line)\n'
+            src += '        except (IndexError, KeyError, TypeError): continue\n'
+            # DictExt rows give NoAttr for missing keys
+            if key_kind == 'fields':
+                src += '        if NoAttr in k: continue\n'
+            else:
+                src += '        if k is NoAttr: continue\n'
+        src += '        try:\n'
+        src += '            acc = groups.get(k)\n'
+        src += '        except TypeError:\n'
+        src += '            f = hashable(k)\n'
+        src += '            acc = groups.get(f)\n'
+        src += '            if acc is None: unfrozen[f] = k\n'
+        src += '            k = f\n'
+        src += '        if acc is None: acc = groups[k] = [%s]\n' % ', '.join(inits)
+        src += ''.join('        %s\n' % stmt for stmt in body)
+        namespace = {'MISSING': _MISSING, 'NoAttr': NoAttr, 'hashable': uniq.hashable}
+        exec(src, namespace)
+        loop = cls._group_loops[(kinds, key_kind)] = namespace['group_loop']
+        return loop
+
+# number of files the records of a hashjoin are split into when they exceed max_memory
+JOIN_PARTITIONS = 64
+
+class _PartitionFiles(object):
+    r"""Items appended by partition number to files in a directory
+
+    The items are buffered, then pickled at the end of the file of their partition when the
+    buffers exceed ``max_memory`` bytes (see :func:`line_size`) : :meth:`flush` must be called
+    before reading. Each partition is read in the order its items were appended.
+    """
+    def __init__(self, tmpdir, name, max_memory):
+        self.path = os.path.join(tmpdir, name + '%d')
+        self.max_memory = max_memory
+        self.buffers = {}
+        self.size = 0
+
+    def append(self, partition, item):
+        """Adds an item at the end of a partition"""
+        self.buffers.setdefault(partition, []).append(item)
+        self.size += line_size(item)
+        if self.size > self.max_memory:
+            self.flush()
+
+    def flush(self):
+        """Writes the buffered items in the files"""
+        for partition, items in self.buffers.items():
+            with open(self.path % partition, 'ab') as fh:
+                pickle.dump(items, fh, pickle.HIGHEST_PROTOCOL)
+        self.buffers = {}
+        self.size = 0
+
+    def read(self, partition):
+        """Yields the items of a partition"""
+        try:
+            fh = open(self.path % partition, 'rb')
+        except FileNotFoundError:
+            return
+        with fh:
+            yield from _read_run(fh)
+
+class _JoinIndex(object):
+    r"""Lists of records by key, kept in a dict up to a memory budget then split in partitions
+
+    Records are added in memory. Once their size (see :func:`line_size`) exceeds ``max_memory``
+    bytes, all the records are appended to ``JOIN_PARTITIONS`` files in a temporary directory,
+    by the hash of their key : equal keys having equal hashes, the records of a key are all in
+    the dict returned by :meth:`load` for its partition, where keys are compared like in memory.
+    Keys that cannot be hashed (lists, dicts...) are replaced by their :meth:`uniq.hashable`
+    equivalent (see :meth:`frozen_key`).
+
+    Args:
+        max_memory (int): the memory budget in bytes, None for no budget (Default : None)
+
+    Examples:
+        >>> from textops.ops.listops import _JoinIndex, JOIN_PARTITIONS
+        >>> index = _JoinIndex(max_memory=500)
+        >>> for i in range(10):
+        ...     index.add(i % 3, {'id': i})
+        >>> index.close_build()
+        >>> index.spilled, index.load(hash(1.0) % JOIN_PARTITIONS)[1.0]
+        (True, [{'id': 1}, {'id': 4}, {'id': 7}])
+        >>> index.close()
+    """
+    def __init__(self, max_memory=None):
+        self.max_memory = max_memory
+        self.records = {}
+        self.size = 0
+        self.tmpdir = None
+        self.partitions = None
+
+    @property
+    def spilled(self):
+        """True if the records are in partition files"""
+        return self.partitions is not None
+
+    @staticmethod
+    def frozen_key(key):
+        """Returns the key, or its :meth:`uniq.hashable` equivalent if it cannot be hashed"""
+        try:
+            hash(key)
+        except TypeError:
+            return uniq.hashable(key, True)
+        return key
+
+    def add(self, key, record):
+        """Adds a record for a key"""
+        key = self.frozen_key(key)
+        if self.partitions is not None:
+            self.partitions.append(hash(key) % JOIN_PARTITIONS, (key, record))
+            return
+        self.records.setdefault(key, []).append(record)
+        if self.max_memory is not None:
+            self.size += line_size(record)
+            if self.size > self.max_memory:
+                self.spill()
+
+    def spill(self):
+        """Moves the records kept in memory into the partition files"""
+        self.tmpdir = tempfile.mkdtemp(prefix='textops_join_')
+        self.partitions = _PartitionFiles(self.tmpdir, 'index', self.max_memory)
+        for key, records in self.records.items():
+            partition = hash(key) % JOIN_PARTITIONS
+            for record in records:
+                self.partitions.append(partition, (key, record))
+        self.records = {}
+        self.size = 0
+
+    def close_build(self):
+        """To be called once all the records have been added"""
+        if self.partitions is not None:
+            self.partitions.flush()
+
+    def get(self, key, default=None):
+        """Returns the list of the records of a key, default if there are none (not spilled)"""
+        try:
+            return self.records.get(key, default)
+        except TypeError:
+            return self.records.get(self.frozen_key(key), default)
+
+    def load(self, partition):
+        """Returns the dict of the records lists by key of a partition (spilled)"""
+        records = {}
+        for key, record in self.partitions.read(partition):
+            records.setdefault(key, []).append(record)
+        return records
+
+    def close(self):
+        """Removes the partition files"""
+        if self.tmpdir is not None:
+            shutil.rmtree(self.tmpdir, ignore_errors=True)
+            self.tmpdir = None
+            self.partitions = None
+
+class hashjoin(TextOp):
+    r"""Join the input records with the records of another list having the same key
+
+    An index of the ``other`` records by key is built first : ``other`` should be the smaller
+    side, it can be a list of dicts or lists, or the result of text operations like
+    :class:`textops.cutdct` or :class:`textops.parseg`. The input text is then read
+    line by line : a record is merged with each ``other`` record having the same key,
+    in the ``other`` order. Merged dicts have the input record items, then the items of the
+    other record that are not in the input record. Merged lists are the concatenation of both.
+    With ``how='left'``, a record that has no match is yielded unchanged, otherwise it is dropped.
+    Keys that cannot be hashed (lists...) are compared by their :meth:`uniq.hashable` equivalent.
+
+    If ``max_memory`` is specified and the ``other`` records exceed this budget, the join is done
+    on disk like a grace hash join : the ``other`` records, then the input records, are split by
+    the hash of their key into ``JOIN_PARTITIONS`` temporary files, each partition of the index
+    is loaded in memory in turn to join the input records of the same partition, and the results
+    are merged back in the input order. The result is the same as in memory, but nothing is
+    yielded before the whole input text is read.
+
+    Args:
+        other (list or iterable): the records to join with, the build side
+        on (int, str, tuple/list or callable): the column number, the dict key or a list of them
+            to join on, or a function of one argument returning the join key
+        how (str): 'inner' or 'left' (Default : 'inner')
+        other_on (int, str, tuple/list or callable): the join key of the ``other`` records
+            (Default : ``on``)
+        max_memory (int): if specified, the memory budget in bytes of the index (Default : None)
+
+    Yields:
+        dict or list: the merged records
+
+    Examples:
+        >>> accounts = [ {'uid':'1', 'account':'eric'}, {'uid':'2', 'account':'guido'} ]
+        >>> logs = 'uid=2 url=/a\nuid=3 url=/b\nuid=1 url=/c\nuid=2 url=/d'
+        >>> pattern = r'uid=(?P<uid>\d+) url=(?P<url>\S+)'
+        >>> for rec in logs | cutdct(pattern).hashjoin(accounts, 'uid'):
+        ...     print(rec)
+        {'uid': '2', 'url': '/a', 'account': 'guido'}
+        {'uid': '1', 'url': '/c', 'account': 'eric'}
+        {'uid': '2', 'url': '/d', 'account': 'guido'}
+        >>> logs | cutdct(pattern).hashjoin(accounts, 'uid', how='left').tolist()  # doctest: +NORMALIZE_WHITESPACE
+        [{'uid': '2', 'url': '/a', 'account': 'guido'}, {'uid': '3', 'url': '/b'},
+        {'uid': '1', 'url': '/c', 'account': 'eric'}, {'uid': '2', 'url': '/d', 'account': 'guido'}]
+        >>> [ ['/a', 2], ['/b', 3] ] >> hashjoin([ [2, 'guido'], [2, 'gvr'] ], 1, other_on=0)
+        [['/a', 2, 2, 'guido'], ['/a', 2, 2, 'gvr']]
+        >>> accounts = [ {'uid':str(i), 'account':'user%d' % i} for i in range(100) ]
+        >>> logs | cutdct(pattern).hashjoin(accounts, 'uid', max_memory=1000).tolist()   # doctest: +NORMALIZE_WHITESPACE
+        [{'uid': '2', 'url': '/a', 'account': 'user2'}, {'uid': '3', 'url': '/b', 'account': 'user3'},
+        {'uid': '1', 'url': '/c', 'account': 'user1'}, {'uid': '2', 'url': '/d', 'account': 'user2'}]
+        >>> [{'k':1}] >> hashjoin([{'k':1.0}], 'k'), [{'k':1}] >> hashjoin([{'k':1.0}], 'k', max_memory=1)
+        ([{'k': 1}], [{'k': 1}])
+        >>> [{'a':[1]}] >> hashjoin([{'a':[1],'b':2}], 'a'), [{'a':[1]}] >> hashjoin([{'a':[1],'b':2}], 'a', max_memory=1)
+        ([{'a': [1], 'b': 2}], [{'a': [1], 'b': 2}])
+    """
+    @classmethod
+    def op(cls, text, other, on, how='inner', other_on=None, max_memory=None, *args,**kwargs):
+        if how not in ('inner', 'left'):
+            raise ListOpError("hashjoin how must be 'inner' or 'left', not %r" % (how,))
+        get_key = sort_key(on)
+        get_other_key = sort_key(on if other_on is None else other_on)
+        index = _JoinIndex(max_memory)
+        try:
+            for record in cls._tolist(other):
+                try:
+                    key = get_other_key(record)
+                except (IndexError, KeyError, TypeError):
+                    continue
+                index.add(key, record)
+            index.close_build()
+            left = how == 'left'
+            if index.spilled:
+                yield from cls.grace_join(cls._tolist(text), index, get_key, left)
+                return
+            for line in cls._tolist(text):
+                try:
+                    records = index.get(get_key(line))
+                except (IndexError, KeyError, TypeError):
+                    records = None
+                if records:
+                    for record in records:
+                        yield cls.merge(line, record)
+                elif left:
+                    yield line
+        finally:
+            index.close()
+
+    @classmethod
+    def grace_join(cls, lines, index, get_key, left):
+        """Joins the lines with a spilled index, partition by partition
+
+        The lines are numbered and appended to the partition of their key, the lines without key
+        to an extra partition. The results of each partition are in the line numbers order,
+        so they are merged back into the input order.
+        """
+        probe = _PartitionFiles(index.tmpdir, 'lines', index.max_memory)
+        results = _PartitionFiles(index.tmpdir, 'results', index.max_memory)
+        for nbr, line in enumerate(lines):
+            try:
+                key = get_key(line)
+            except (IndexError, KeyError, TypeError):
+                if left:
+                    results.append(JOIN_PARTITIONS, (nbr, line))
+                continue
+            key = index.frozen_key(key)
+            probe.append(hash(key) % JOIN_PARTITIONS, (nbr, key, line))
+        probe.flush()
+        for partition in range(JOIN_PARTITIONS):
+            records_by_key = index.load(partition)
+            for nbr, key, line in probe.read(partition):
+                records = records_by_key.get(key)
+                if records:
+                    for record in records:
+                        results.append(partition, (nbr, cls.merge(line, record)))
+                elif left:
+                    results.append(partition, (nbr, line))
+        results.flush()
+        partitions = [ results.read(partition) for partition in range(JOIN_PARTITIONS + 1) ]
+        for nbr, line in heapq.merge(*partitions, key=itemgetter(0)):
+            yield line
+
+    @staticmethod
+    def merge(line, record):
+        """Returns a record merged with an other record"""
+        if isinstance(line, dict):
+            merged = dict(line)
+            for k, v in record.items():
+                if k not in merged:
+                    merged[k] = v
+            return merged
+        as_list = lambda x: list(x) if isinstance(x, (list, tuple)) else [x]
+        return as_list(line) + as_list(record)
+
 class span(TextOp):
     r"""Ensure that a list of lists has exactly the specified number of column
 
@@ -2113,6 +3280,7 @@ class doslice(TextOp):
         >>> s >> doslice(None,None,2)
         ['a', 'c', 'e']
     """
+    stops_early = True
     @classmethod
     def op(cls, text, begin=0, end=sys.maxsize, step = 1, *args,**kwargs):
         for line in itertools.islice(cls._tolist(text), begin, end, step):
@@ -2200,7 +3368,24 @@ class uniq(TextOp):
 
     If a line is many times in the same text (even if there are some different lines between),
     only the first will be taken. Works also with list of lists or dicts. Input order is preserved.
-    Do not use this operation on huge data set as an internal list is maintained : if possible, use :class:`textops.norepeat`.
+
+    The lines already seen are kept in a set, the lists and dicts being converted into a hashable
+    equivalent (objects that cannot be hashed are compared to the ones kept in a list). As all
+    the distinct lines are remembered, the memory may grow with the input : for unbounded streams,
+    use ``window`` to remember only the last distinct lines seen (a line repeated farther than
+    that is yielded again), or ``bloom`` to remember lines in a fixed size
+    :class:`textops.BloomFilter` (some lines never seen may then be dropped, about ``error_rate``
+    of them once ``bloom`` distinct lines have been seen). If the repetitions are always
+    consecutive, use :class:`textops.norepeat`.
+
+    Args:
+        key (int, str or callable): if specified, lists or dicts are compared on ``line[key]``,
+            a callable is given the line and returns the value to compare (Default : None)
+        window (int): if specified, only the ``window`` last distinct lines are remembered
+            (Default : None)
+        bloom (int): if specified, a Bloom filter sized for ``bloom`` distinct lines is used
+            (Default : None)
+        error_rate (float): the Bloom filter false positive rate (Default : 0.001)
 
     Returns:
         generator: Uniqified text line by line.
@@ -2222,15 +3407,115 @@ class uniq(TextOp):
         >>> d = [ {'a':1}, {'b':2}, {'a':1} ]
         >>> d >> uniq()
         [{'a': 1}, {'b': 2}]
+        >>> [ {'a':[1,{2}]}, {'a':[1,{2}]}, {'a':[1,2]} ] >> uniq()
+        [{'a': [1, {2}]}, {'a': [1, 2]}]
+        >>> [ ('srv1','ok'), ('srv2','ok'), ('srv1','ko') ] >> uniq(key=0)
+        [('srv1', 'ok'), ('srv2', 'ok')]
+        >>> [ {'host':'srv1'}, {'host':'SRV1'}, {} ] >> uniq(key=lambda d:d.get('host','').lower())
+        [{'host': 'srv1'}, {}]
+        >>> s >> uniq(window=2)
+        ['f', 'a', 'b', 'c', 'e', 'a', 'c', 'f']
+        >>> s >> uniq(bloom=1000)
+        ['f', 'a', 'b', 'c', 'e']
     """
     @classmethod
-    def op(cls, text, *args,**kwargs):
-        s=[]
-        for line in cls._tolist(text):
-            if line not in s:
-                s.append(line)
+    def op(cls, text, key=None, window=None, bloom=None, error_rate=0.001, *args,**kwargs):
+        lines = cls._tolist(text)
+        if key is not None and not callable(key):
+            key = cls.key_getter(key)
+        if bloom is not None:
+            seen = textops.BloomFilter(bloom, error_rate)
+            for line in lines:
+                if not seen.add(cls.hashable(line if key is None else key(line), True)):
+                    yield line
+        elif window is not None:
+            seen = collections.OrderedDict()
+            for line in lines:
+                value = cls.hashable(line if key is None else key(line), True)
+                if value in seen:
+                    seen.move_to_end(value)
+                    continue
+                seen[value] = None
+                if len(seen) > window:
+                    seen.popitem(last=False)
+                yield line
+        else:
+            seen = set()
+            add = seen.add
+            others = []   # values that cannot be hashed
+            # other unhashable types are frozen after the set has raised TypeError
+            freeze_types = { list, dict, set, textops.ListExt, textops.DictExt }
+            for line in lines:
+                value = line if key is None else key(line)
+                if type(value) in freeze_types:
+                    value = cls.hashable(value)
+                try:
+                    if value in seen:
+                        continue
+                    add(value)
+                except TypeError:
+                    value = cls.hashable(value)
+                    try:
+                        if value in seen:
+                            continue
+                        add(value)
+                    except TypeError:
+                        if value in others:
+                            continue
+                        others.append(value)
                 yield line
 
+    @staticmethod
+    def key_getter(key):
+        """Returns a function getting the column or the key ``key`` from lists or dicts"""
+        def get(line):
+            if isinstance(line, (str, bytes)):
+                return line
+            try:
+                return line[key]
+            except (IndexError, KeyError, TypeError):
+                return None
+        return get
+
+    @classmethod
+    def hashable(cls, value, force=False):
+        """Returns a hashable equivalent of a list, a tuple, a dict or a set
+
+        Two equal values have equal equivalents. If ``force`` is True, a value that still
+        cannot be hashed is replaced by its ``repr()``
+        """
+        if isinstance(value, list):
+            frozen = (list, tuple(value))
+        elif isinstance(value, dict):
+            frozen = (dict, tuple(value.items()))
+        elif isinstance(value, set):
+            return frozenset(value)
+        else:
+            frozen = value
+        try:
+            hash(frozen)
+        except TypeError:
+            if isinstance(value, list):
+                frozen = (list, tuple( cls.hashable(v) for v in value ))
+            elif isinstance(value, tuple):
+                frozen = tuple( cls.hashable(v) for v in value )
+            elif isinstance(value, dict):
+                items = [ (k, cls.hashable(v)) for k,v in value.items() ]
+                try:
+                    frozen = (dict, frozenset(items))
+                except TypeError:
+                    frozen = (dict, dict(items))
+            if force:
+                try:
+                    hash(frozen)
+                except TypeError:
+                    return repr(frozen)
+            return frozen
+        if isinstance(value, dict):
+            # dicts are equal whatever the order of their items
+            return (dict, frozenset(frozen[1]))
+        return frozen
+
 class norepeat(TextOp):
     r"""Remove line repetitions that follows
 
@@ -2332,8 +3617,7 @@ class splitblock(TextOp):
 
     @classmethod
     def op(cls, text, pattern, include_separator=0, skip_first=False, *args,**kwargs):
-        if isinstance(pattern, str):
-            pattern = re.compile(pattern,cls.flags)
+        pattern = compile_regex(pattern,cls.flags)
         blk=[]
         for line in cls._tolist(text):
             if pattern.match(line):
@@ -2447,8 +3731,7 @@ class resplitblock(TextOp):
 
     @classmethod
     def op(cls, text, pattern, include_separator=0, skip_first=False, *args,**kwargs):
-        if isinstance(pattern, str):
-            pattern = re.compile(pattern,kwargs.get('flags',cls.flags))
+        pattern = compile_regex(pattern,kwargs.get('flags',cls.flags))
         text = cls._tostr(text)
         blks = []
         pos = 0
@@ -2530,8 +3813,7 @@ class aggregate(TextOp):
 
     @classmethod
     def op(cls, text, having, same_key=False, join_str='|', *args,**kwargs):
-        if isinstance(having, str):
-            having = re.compile(having,kwargs.get('flags',cls.flags))
+        having = compile_regex(having,kwargs.get('flags',cls.flags))
 
         buffer=[]
         prev_key=None
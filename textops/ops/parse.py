@@ -6,7 +6,8 @@
 #
 """ This module gathers parsers to handle whole input text"""
 
-from textops import TextOp, NoAttr, dformat, pp, stru
+from textops import TextOp, NoAttr, SKIP_LINE, dformat, pp, stru, compile_regex, MultiPattern, \
+    required_literal
 import textops
 import types
 import string
@@ -15,6 +16,12 @@ import copy
 from datetime import datetime
 import collections
 
+__all__ = ['index_normalize', 'context_key_not_found', 'ParsingError', 'mgrep', 'mgrepi',
+    'mgrepv', 'mgrepvi', 'sgrep', 'sgrepi', 'sgrepv', 'sgrepvi', 'parseg', 'parsegi', 'parsek',
+    'parseki', 'parsekv', 'parsekvi', 'keyval', 'keyvali', 'find_pattern', 'find_patterni',
+    'find_patterns', 'find_patternsi', 'find_first_pattern', 'find_first_patterni',
+    'parse_indented', 'parse_smart', 'state_pattern']
+
 logger = textops.logger
 
 def index_normalize(index_val):
@@ -38,10 +45,10 @@ def index_normalize(index_val):
 
     """
     index_val = index_val.lower().strip()
-    index_val = re.sub(r'^\W*','',index_val)
-    index_val = re.sub(r'\W*$','',index_val)
-    index_val = re.sub(r'\W+','_',index_val)
-    index_val = re.sub('_+','_',index_val)
+    index_val = compile_regex(r'^\W*').sub('',index_val)
+    index_val = compile_regex(r'\W*$').sub('',index_val)
+    index_val = compile_regex(r'\W+').sub('_',index_val)
+    index_val = compile_regex('_+').sub('_',index_val)
     return index_val
 
 def context_key_not_found(key):
@@ -54,7 +61,8 @@ class mgrep(TextOp):
     r"""Multiple grep
 
     This works like :class:`textops.grep` except that it can do several greps in a single command.
-    By this way, you can select many patterns in a big file.
+    By this way, you can select many patterns in a big file. The patterns are combined into a
+    :class:`textops.MultiPattern` : each line is classified in a single pass of the regex engine.
 
     Args:
         patterns_dict (dict): a dictionary where all patterns to search are in values.
@@ -110,24 +118,24 @@ class mgrep(TextOp):
     reverse = False
     @classmethod
     def op(cls,text,patterns_dict,key = None, *args,**kwargs):
-        for k,pattern in list(patterns_dict.items()):
-            if isinstance(pattern,str):
-                patterns_dict[k] = re.compile(pattern,cls.flags)
+        keys = list(patterns_dict)
+        patterns = MultiPattern(patterns_dict.values(), cls.flags)
         dct = {}
         for line in cls._tolist(text):
-            for k,regex in list(patterns_dict.items()):
-                try:
-                    if isinstance(line,str):
-                        if bool(regex.search(stru(line))) != cls.reverse:  # kind of XOR with cls.reverse
-                            dct.setdefault(k,[]).append(line)
-                    elif key is None:
-                        if bool(regex.search(stru(line))) != cls.reverse:  # kind of XOR with cls.reverse
-                            dct.setdefault(k,[]).append(line)
-                    else:
-                        if bool(regex.search(stru(line[key]))) != cls.reverse:  # kind of XOR with cls.reverse
-                            dct.setdefault(k,[]).append(line)
-                except (ValueError, TypeError, IndexError, KeyError):
-                    pass
+            try:
+                if isinstance(line,str):
+                    found = patterns.matching(line)
+                elif key is None:
+                    found = patterns.matching(stru(line))
+                else:
+                    found = patterns.matching(stru(line[key]))
+            except (ValueError, TypeError, IndexError, KeyError):
+                continue
+            if cls.reverse:
+                found = set(found)
+                found = [ i for i in range(len(keys)) if i not in found ]
+            for i in found:
+                dct.setdefault(keys[i],[]).append(line)
         return dct
 
 class mgrepi(mgrep):
@@ -223,7 +231,8 @@ class sgrep(TextOp):
     If N patterns are given to search, it will return N+1 lists, where the last list will be filled
     of lines that does not match any pattern in the given patterns list.
     The patterns list order is important : only the first
-    matching pattern will be taken in account.
+    matching pattern will be taken in account. As for :class:`textops.mgrep`, the patterns are
+    combined into a :class:`textops.MultiPattern`.
     One can consider that ``sgrep`` works like a **switch()** :
     it will do for each line a kind of ::
 
@@ -260,27 +269,23 @@ class sgrep(TextOp):
     reverse = False
     @classmethod
     def op(cls,text,patterns,key = None, *args,**kwargs):
-        patterns = [ re.compile(pattern,cls.flags) if isinstance(pattern,str) else pattern for pattern in patterns ]
-        lst = [ [] for i in range(len(patterns)+1) ] # surtout pas faire [] * (len(patterns)+1)
+        patterns = MultiPattern(patterns, cls.flags)
+        nb_patterns = len(patterns)
+        lst = [ [] for i in range(nb_patterns+1) ] # surtout pas faire [] * (len(patterns)+1)
         for line in cls._tolist(text):
-            for i,regex in enumerate(patterns):
-                try:
-                    if isinstance(line,str):
-                        if bool(regex.search(stru(line))) != cls.reverse:  # kind of XOR with cls.reverse
-                            lst[i].append(line)
-                            break
-                    elif key is None:
-                        if bool(regex.search(stru(line))) != cls.reverse:  # kind of XOR with cls.reverse
-                            lst[i].append(line)
-                            break
-                    else:
-                        if bool(regex.search(stru(line[key]))) != cls.reverse:  # kind of XOR with cls.reverse
-                            lst[i].append(line)
-                            break
-                except (ValueError, TypeError, IndexError, KeyError):
-                    pass
-            else:
-                lst[-1].append(line)
+            try:
+                if not isinstance(line,str):
+                    line_str = stru(line) if key is None else stru(line[key])
+                else:
+                    line_str = line
+                if cls.reverse:
+                    found = set(patterns.matching(line_str))
+                    i = next(( i for i in range(nb_patterns) if i not in found ), None)
+                else:
+                    i = patterns.first(line_str)
+            except (ValueError, TypeError, IndexError, KeyError):
+                i = None
+            lst[-1 if i is None else i].append(line)
         return lst
 
 class sgrepi(sgrep):
@@ -323,16 +328,31 @@ class parseg(TextOp):
         {'key': 'country', 'val': 'France'}]
     """
     ignore_case = False
+    fusable = False
     @classmethod
     def op(cls,text, pattern, *args,**kwargs):
-        if isinstance(pattern,str):
-            pattern = re.compile(pattern, re.I if cls.ignore_case else 0)
-        out = []
-        for line in cls._tolist(text):
-            m = pattern.match(line)
-            if m:
-                out.append(m.groupdict())
-        return out
+        fn = cls.line_fn(pattern)
+        return [ dct for dct in map(fn, cls._tolist(text)) if dct is not SKIP_LINE ]
+
+    @classmethod
+    def line_fn(cls, pattern, *args,**kwargs):
+        pattern = compile_regex(pattern, re.I if cls.ignore_case else 0)
+        match = pattern.match
+        literal = required_literal(pattern)
+        if literal is None:
+            def line_fn(line):
+                m = match(line)
+                return m.groupdict() if m else SKIP_LINE
+        else:
+            # lines without the literal the pattern requires are rejected without the regex engine,
+            # other types than the literal one are left to the regex engine
+            literal_type = type(literal)
+            def line_fn(line):
+                if isinstance(line, literal_type) and literal not in line:
+                    return SKIP_LINE
+                m = match(line)
+                return m.groupdict() if m else SKIP_LINE
+        return line_fn
 
 class parsegi(parseg):
     r"""Same as parseg but case insensitive
@@ -378,8 +398,7 @@ class parsek(TextOp):
     ignore_case = False
     @classmethod
     def op(cls,text, pattern, key_name = 'key', key_update = None, *args,**kwargs):
-        if isinstance(pattern,str):
-            pattern = re.compile(pattern, re.I if cls.ignore_case else 0)
+        pattern = compile_regex(pattern, re.I if cls.ignore_case else 0)
         out = []
         for line in cls._tolist(text):
             m = pattern.match(line)
@@ -462,8 +481,7 @@ class parsekv(TextOp):
     def op(cls,text, pattern, key_name = 'key', key_update = None, val_name = None, *args,**kwargs):
         if val_name is None:
             val_name = cls.val_name
-        if isinstance(pattern,str):
-            pattern = re.compile(pattern, re.I if cls.ignore_case else 0)
+        pattern = compile_regex(pattern, re.I if cls.ignore_case else 0)
 
         def _op(text):
             out = {}
@@ -604,8 +622,7 @@ class find_pattern(TextOp):
 
     @classmethod
     def op(cls,text, pattern, *args,**kwargs):
-        if isinstance(pattern,str):
-            pattern = re.compile(pattern, re.M | (re.I if cls.ignore_case else 0))
+        pattern = compile_regex(pattern, re.M | (re.I if cls.ignore_case else 0))
         text = cls._tostr(text)
         m = pattern.search(text)
         if m :
@@ -691,8 +708,7 @@ class find_patterns(TextOp):
         else:
             patterns_list = enumerate(patterns)
         for attr,pattern in patterns_list:
-            if isinstance(pattern,str):
-                pattern = re.compile(pattern, re.M | (re.I if cls.ignore_case else 0))
+            pattern = compile_regex(pattern, re.M | (re.I if cls.ignore_case else 0))
             if pattern:
                 m = pattern.search(text)
                 if m :
@@ -833,11 +849,13 @@ class parse_indented(TextOp):
         indent_node = {indent_level:out}
         dct = out
         prev_k = None
+        match_indent = compile_regex(r'^(\s*)(\S.*)').match
+        split_sep = compile_regex(sep).split
         # parse the text
         for line in cls._tolist(text):
-            m = re.match(r'^(\s*)(\S.*)', line)
+            m = match_indent(line)
             if m:
-                k,v = (re.split(sep,m.group(2)) + [''])[:2]
+                k,v = (split_sep(m.group(2)) + [''])[:2]
                 indent = len(m.group(1))
                 if indent < indent_level:
                     dct = indent_node.get(indent)
@@ -963,20 +981,23 @@ class parse_smart(TextOp):
         block_step = 1
         if key_filter is None:
             key_filter=lambda x:x
+        match_indent = compile_regex(r'^(\s*)(\S.*)').match
+        split_sep = compile_regex(sep).split
+        search_word = compile_regex(r'\w+').search
         # parse the text
         for line in cls._tolist(text):
             if not line.strip():
                 block_step = 1
             else:
-                m = re.match(r'^(\s*)(\S.*)', line)
+                m = match_indent(line)
                 if m:
-                    k,v = (re.split(sep,m.group(2),1) + [''])[:2]
+                    k,v = (split_sep(m.group(2),1) + [''])[:2]
                     original_k = k
                     v = v.strip()
                     indent = len(m.group(1))
                     #print indent,indent_level,block_step,line,'****',prev_k,k
                     if block_step==1:
-                        if not v and re.search(r'\w+',k):
+                        if not v and search_word(k):
                             block_step = 2
                         else:
                             block_step = 0
@@ -1308,21 +1329,23 @@ class state_pattern(TextOp):
             else:
                 if isinstance(ifstate, str):
                     ifstate = ifstate.split(',')
-            if isinstance(pattern, str):
-                pattern = re.compile(pattern,reflags)
+            pattern = compile_regex(pattern, reflags)
+            literal = required_literal(pattern)
             if isinstance(datapath, str):
                 if not datapath:
                     datapath = []
                 else:
                     datapath = datapath.split('.')
-            states_patterns.append((ifstate, gotostate, pattern, datapath, outfilter))
+            states_patterns.append((ifstate, gotostate, pattern, literal, datapath, outfilter))
 
         # parse the text
         for line in cls._tolist(text):
             logger.debug('state:%10s, line = %s',state, line)
-            for ifstate, gotostate, pattern, datapath, outfilter in states_patterns:
+            for ifstate, gotostate, pattern, literal, datapath, outfilter in states_patterns:
                 logger.debug('  ? %10s "%10s" r\'%s\' "%s" "%s"',ifstate, gotostate, pattern.pattern, datapath, outfilter)
                 if not ifstate or state in ifstate:
+                    if literal is not None and isinstance(line, type(literal)) and literal not in line:
+                        continue
                     m=pattern.match(line)
                     if m:
                         g = m.groupdict()
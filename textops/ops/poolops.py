@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+#
+# Created : 2026-10-17
+#
+# @author: Eric Lapouyade
+#
+""" This module gathers operations running other operations in a pool of processes """
+
+from textops import TextOp
+from textops.base import TextOpException, Pipeline, resolve_op, batch_fn
+import concurrent.futures
+import collections
+import collections.abc
+import itertools
+import pickle
+import os
+
+__all__ = ['parallel', 'foreach_file']
+
+class parallel(TextOp):
+    r"""Run the following line-wise operations in a pool of processes
+
+    The input text is split into chunks of lines that are sent to a
+    :class:`concurrent.futures.ProcessPoolExecutor`. Every line-wise operation chained just after
+    ``parallel()`` (grep family, sed, cut family, parseg, mapfn, iffn, mapif, dostrip, resub ...)
+    is run by the worker processes on each chunk, like in a :class:`textops.base.BatchStep`,
+    then the results are merged back.
+    The first operation that does not work line by line ends the parallel part of the chain.
+
+    Use it for CPU-bound operations on big inputs : for small inputs, the cost of the processes and
+    of the data transfer is higher than the gain. The arguments of the parallelized operations
+    must be picklable (no lambda, use functions defined at module level instead).
+    In debug mode, or if fusion is disabled on the chain, operations are run in the current process.
+
+    Args:
+        workers (int): number of worker processes (default : the number of CPUs)
+        chunk_lines (int): number of lines sent to a worker at once (default : 5000)
+        ordered (bool): if True (default), results are yielded in input order, otherwise chunk
+            results are yielded as soon as they are ready.
+
+    Yields:
+        any: the lines processed by the parallelized operations
+
+    Examples:
+        >>> logs = ['error 1','info 2','error 3','info 4','error 5']
+        >>> logs >> parallel(2, chunk_lines=2).grep('error').cut(col=1).mapfn(int)
+        [1, 3, 5]
+        >>> logs >> parallel(2, chunk_lines=1, ordered=False).grepv('error').sed('info','i') | dosort()
+        ['i 2', 'i 4']
+        >>> logs >> parallel(2).grep('error').cut(col=1).mapfn(int).getmax()
+        5
+        >>> logs >> parallel(2).parseg(r'(?P<level>\w+) (?P<nb>\d+)').grep('4','nb')
+        [{'level': 'info', 'nb': '4'}]
+        >>> (parallel(2).grep('error').cut(col=1).tolist()).plan.fused   #doctest: +NORMALIZE_WHITESPACE
+        (AbsorbingStep(parallel(2).grep('error').cut(col=1)), PlanStep('tolist', (), {}))
+    """
+    absorb_line_ops = True
+
+    @classmethod
+    def op(cls, text, workers=None, chunk_lines=5000, ordered=True, line_steps=(), *args,**kwargs):
+        if not line_steps:
+            return text
+        specs = tuple( (step.name, step.args, step.kwargs) for step in line_steps )
+        try:
+            pickle.dumps(specs)
+        except (pickle.PicklingError, AttributeError, TypeError) as e:
+            raise TextOpException('parallel() : the arguments of the ops to run in parallel '
+                                  'must be picklable (%s)' % e)
+        return _parallel_gen(cls._tolist(text), specs, workers or os.cpu_count() or 1,
+                            chunk_lines, ordered)
+
+def _parallel_gen(lines, specs, workers, chunk_lines, ordered):
+    lines = iter(lines)
+    chunks = iter(lambda: list(itertools.islice(lines, chunk_lines)), [])
+    results = _pool_results(_run_chunk, chunks, workers, _init_worker, (specs,), ordered)
+    try:
+        for chunk in results:
+            yield from chunk
+    finally:
+        results.close()
+
+def _pool_results(fn, tasks, workers, initializer, initargs, ordered):
+    """ Yields the results of ``fn(task)`` run in a pool of processes
+
+    At most ``workers * 2`` tasks are submitted ahead, the results are yielded in tasks order if
+    ``ordered`` is True, otherwise as soon as they are ready. The tasks not yet started are
+    cancelled when the generator is closed, without waiting for the running ones.
+    """
+    max_pending = workers * 2
+    executor = concurrent.futures.ProcessPoolExecutor(workers, initializer=initializer,
+                                                      initargs=initargs)
+    pending = ()
+    try:
+        if ordered:
+            pending = collections.deque()
+            for task in tasks:
+                pending.append(executor.submit(fn, task))
+                if len(pending) >= max_pending:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        else:
+            pending = set()
+            for task in tasks:
+                pending.add(executor.submit(fn, task))
+                if len(pending) >= max_pending:
+                    done, pending = concurrent.futures.wait(pending,
+                        return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+            for future in concurrent.futures.as_completed(pending):
+                yield future.result()
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+_worker_batch_fns = ()
+
+def _init_worker(specs):
+    global _worker_batch_fns
+    _worker_batch_fns = [ batch_fn(resolve_op(name), args, kwargs) for name,args,kwargs in specs ]
+
+def _run_chunk(chunk):
+    for fn in _worker_batch_fns:
+        chunk = fn(chunk)
+    return chunk
+
+class foreach_file(TextOp):
+    r"""Run a pipeline on each input file path in a pool of processes
+
+    Each line of the input text is a file path that is given, in a worker process, as the input
+    text of ``pipeline`` : it usually begins with :class:`textops.cat` (or ``bcat``, ``gzcat`` ...).
+    The files are therefore read and processed at the same time instead of one after another
+    by ``cat()``. The results of the pipeline on each file are streamed back : lists and
+    generators are flattened, other results (a count, a dict ...) are yielded as is.
+
+    If ``combine`` is given, the results of all the files are gathered in a list that is given to
+    ``combine`` : a callable (ex: ``sum`` to add the counts of :class:`textops.grepc`) or a
+    TextOp (ex: :class:`textops.merge_dicts`) whose result is returned.
+
+    Like for :class:`textops.parallel`, the arguments of the pipeline ops must be picklable
+    and it is worth it only for CPU-bound pipelines on big files.
+
+    Args:
+        pipeline (TextOp or Pipeline): the operations to run on each path
+        workers (int): number of worker processes (default : the number of CPUs)
+        ordered (bool): if True (default), results are yielded in input order, otherwise file
+            results are yielded as soon as they are ready.
+        combine (callable or TextOp): combines the list of the per file results (Optionnal)
+
+    Yields:
+        any: the results of the pipeline on each file, or the combined result
+
+    Examples:
+        >>> import os
+        >>> os.makedirs('/tmp/textops_tests_foreach', exist_ok=True)
+        >>> paths = []
+        >>> for name, content in (('a', 'error 1\ninfo 2\nerror 3'), ('b', 'info 4\nerror 5')):
+        ...     paths.append('/tmp/textops_tests_foreach/%s.log' % name)
+        ...     _ = open(paths[-1], 'w').write(content)
+        >>> paths >> foreach_file(cat().grep('error').cut(col=1), 2)
+        ['1', '3', '5']
+        >>> paths >> foreach_file(cat().grepv('error'), 2, ordered=False) | dosort()
+        ['info 2', 'info 4']
+        >>> paths >> foreach_file(cat().grepc('error'), 2)
+        [2, 1]
+        >>> paths | foreach_file(cat().grepc('error'), 2, combine=sum)
+        3
+        >>> paths | foreach_file(cat().cutre(' ').todict(), 2, combine=merge_dicts())
+        {'error': '5', 'info': '4'}
+    """
+    @classmethod
+    def op(cls, text, pipeline, workers=None, ordered=True, combine=None, *args,**kwargs):
+        ops = Pipeline(pipeline).ops
+        try:
+            pickle.dumps(ops)
+        except (pickle.PicklingError, AttributeError, TypeError) as e:
+            raise TextOpException('foreach_file() : the arguments of the ops to run on each file '
+                                  'must be picklable (%s)' % e)
+        results = _pool_results(_run_file, cls._tolist(text), workers or os.cpu_count() or 1,
+                               _init_file_worker, (ops,), ordered)
+        if combine is None:
+            return _foreach_file_gen(results)
+        results = list(results)
+        if isinstance(combine, (TextOp, Pipeline)):
+            return results >> combine
+        return combine(results)
+
+def _foreach_file_gen(results):
+    try:
+        for result in results:
+            if isinstance(result, list):
+                yield from result
+            else:
+                yield result
+    finally:
+        results.close()
+
+_worker_pipeline = None
+
+def _init_file_worker(ops):
+    global _worker_pipeline
+    _worker_pipeline = Pipeline(ops, raw=True)
+
+def _run_file(path):
+    result = path >> _worker_pipeline
+    if isinstance(result, collections.abc.Iterator):
+        result = list(result)
+    return result
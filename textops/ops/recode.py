@@ -10,6 +10,7 @@ from textops import TextOp
 import copy
 import re
 
+__all__ = ['MULTIPLELINESTRING_TAG', 'list_to_multilinestring', 'multilinestring_to_list']
 
 MULTIPLELINESTRING_TAG = '{0:-^78}'.format('< Multiline string as list >')
 
@@ -11,6 +11,41 @@ import re
 import subprocess
 import sys
 import os
+import signal
+
+__all__ = ['run', 'mrun', 'xrun']
+
+def popen_lines(cmd, decode=True):
+    r""" Run a command and yield its output line by line
+
+    The output is read as it comes, so the first lines are available before the command ends.
+    The command is started in a new session : when the generator is closed before the output
+    is exhausted (for example by :class:`textops.head` or :class:`textops.first`),
+    the command and all its sub-processes are killed.
+
+    Args:
+        cmd (list): the command and its arguments as given to :class:`subprocess.Popen`
+        decode (bool): if False, bytes lines are yielded (Default : True)
+
+    Yields:
+        str or bytes: the execution output lines
+    """
+    p=subprocess.Popen(cmd,stdout=subprocess.PIPE,start_new_session=True)
+    try:
+        for chunk in p.stdout:
+            for line in chunk.splitlines():
+                yield line.decode() if decode else line
+    finally:
+        p.stdout.close()
+        if p.poll() is None:
+            try:
+                if hasattr(os, 'killpg'):
+                    os.killpg(p.pid, signal.SIGKILL)
+                else:
+                    p.kill()
+            except OSError:
+                pass
+        p.wait()
 
 class run(TextOp):
     r""" Run the command from the input text and return execution output
@@ -43,21 +78,21 @@ class run(TextOp):
         f1
         f2
         f3
+
+        The output is streamed : when the next operation stops reading, the command is killed,
+        so ``'yes' | run().head(3).tolist()`` gives ``['y', 'y', 'y']``.
     """
     @classmethod
     def op(cls,text, context = {},*args,**kwargs):
         if isinstance(text, str):
             if context:
                 text = text.format(**context)
-            p=subprocess.Popen(['sh','-c',text],stdout=subprocess.PIPE)
+            cmd = ['sh','-c',text]
         else:
             if context:
                 text = [ t.format(**context) for t in text ]
-            p=subprocess.Popen(text,stdout=subprocess.PIPE)
-        while p.returncode is None:
-            (stdout, stderr) = p.communicate()
-            for line in stdout.splitlines():
-                yield line.decode()
+            cmd = text
+        yield from popen_lines(cmd)
 
 class mrun(TextOp):
     r""" Run multiple commands from the input text and return execution output
@@ -102,11 +137,7 @@ class mrun(TextOp):
         for cmd in cls._tolist(text):
             if context:
                 cmd = cmd.format(**context)
-            p=subprocess.Popen(['sh','-c',cmd],stdout=subprocess.PIPE)
-            while p.returncode is None:
-                (stdout, stderr) = p.communicate()
-                for line in stdout.splitlines():
-                    yield line.decode()
+            yield from popen_lines(['sh','-c',cmd])
 
 class xrun(TextOp):
     r""" Run the command formatted with the context taken from the input text
@@ -131,9 +162,5 @@ class xrun(TextOp):
                 custom_cmd = eformat(cmd, incontext, context, defvalue)
             else:
                 custom_cmd = eformat(cmd, (incontext,), context, defvalue)
-            p=subprocess.Popen(['sh','-c',custom_cmd],stdout=subprocess.PIPE)
-            while p.returncode is None:
-                (stdout, stderr) = p.communicate()
-                for line in stdout.splitlines():
-                    yield line
+            yield from popen_lines(['sh','-c',custom_cmd],decode=False)
 
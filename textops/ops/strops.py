@@ -6,11 +6,15 @@
 #
 """ This module gathers text operations to be run on a string """
 
-from textops import TextOp
+from textops import TextOp, compile_regex, required_literal
 import re
 import types
 from functools import reduce
 
+__all__ = ['PyStrWrapper', 'strop', 'length', 'echo', 'splitln', 'matches', 'searches',
+    'StrOp', 'cut', 'cutre', 'cutca', 'cutm', 'cutmi', 'cuts', 'cutsi', 'cutsa', 'cutsai',
+    'cutdct', 'cutkv']
+
 class PyStrWrapper(object):
     """ This is a help to be able to use python string method with piped notation """
 
@@ -127,11 +131,17 @@ class matches(TextOp):
         >>> state=StrExt('Error')
         >>> print('OK' if state.matches(r'good|not_present|charging') else 'CRITICAL')
         CRITICAL
+        >>> state.matches(re.compile('error'), re.I)
+        Traceback (most recent call last):
+        ...
+        ValueError: cannot process flags argument with a compiled pattern
 
     """
     @classmethod
     def op(cls,text,pattern,*args,**kwargs):
-        return re.match(pattern,text,*args,**kwargs)
+        if not isinstance(pattern,(str,bytes)):
+            return re.match(pattern,text,*args,**kwargs)
+        return compile_regex(pattern,*args,**kwargs).match(text)
 
 class searches(TextOp):
     r""" Search a pattern
@@ -161,11 +171,14 @@ class searches(TextOp):
     """
     @classmethod
     def op(cls,text,pattern,*args,**kwargs):
-        return re.search(pattern,text,*args,**kwargs)
+        if not isinstance(pattern,(str,bytes)):
+            return re.search(pattern,text,*args,**kwargs)
+        return compile_regex(pattern,*args,**kwargs).search(text)
 
 
 
 class StrOp(TextOp):
+    fuse_as_head = False
     @classmethod
     def op(cls,text,*args,**kwargs):
         if ( ( isinstance(text, str) and '\n' in text ) or
@@ -174,12 +187,18 @@ class StrOp(TextOp):
         if isinstance(text, (str,bytes)):
             return cls.fn(text,*args,**kwargs)
         elif isinstance(text, list):
-            return [ cls.fn(line,*args,**kwargs) for line in text ]
+            return list(map(cls.line_fn(*args,**kwargs), text))
         return cls.gop(text,*args,**kwargs)
     @classmethod
     def gop(cls,text,*args,**kwargs):
-        for line in text:
-            yield cls.fn(line,*args,**kwargs)
+        yield from map(cls.line_fn(*args,**kwargs), text)
+    @classmethod
+    def line_fn(cls,*args,**kwargs):
+        fn = cls.fn
+        return lambda line: fn(line,*args,**kwargs)
+    @classmethod
+    def op_batch(cls,lines,*args,**kwargs):
+        return list(map(cls.line_fn(*args,**kwargs), lines))
 
 class cut(StrOp):
     r""" Extract columns from a string or a list of strings
@@ -238,20 +257,42 @@ class cut(StrOp):
     def split(cls, text, sep, maxsplit=-1,*args,**kwargs):
         return text.split(sep,maxsplit)
 
+    @classmethod
+    def line_fn(cls, sep=None, col=None, default='', *args,**kwargs):
+        # separator and columns are parsed once, not for every line
+        if cls.sep_is_regex:
+            sep = compile_regex(sep,cls.flags)
+        if isinstance(col, str):
+            col = [int(i) for i in col.split(',')]
+        fn = cls.fn
+        return lambda line: fn(line, sep, col, default, *args,**kwargs)
+
+    @classmethod
+    def op_batch(cls, lines, sep=None, col=None, default='', *args,**kwargs):
+        if ( cls.split.__func__ is cut.split.__func__ and isinstance(col, int) and col >= 0
+             and not args and not kwargs ):
+            # most common case : one column from a str.split()
+            try:
+                return [ cols[col] if col < len(cols) else default
+                         for cols in ( line.split(sep) for line in lines ) ]
+            except (AttributeError, TypeError):
+                pass    # not a list of strings
+        return list(map(cls.line_fn(sep, col, default, *args,**kwargs), lines))
+
     @classmethod
     def fn(cls, text, sep=None, col=None, default='', *args,**kwargs):
         if cls.sep_is_regex:
-            if isinstance(sep, str):
-                sep = re.compile(sep,cls.flags)
+            sep = compile_regex(sep,cls.flags)
         if isinstance(col, str):
             col = [int(i) for i in col.split(',')]
+        return cls.columns(cls.split(text,sep, *args,**kwargs), col, default)
+
+    @staticmethod
+    def columns(line_cols, col, default):
         if isinstance(col,(list,tuple)):
-            nbcol = len(col)
-            line_cols = cls.split(text,sep, *args,**kwargs)
             nblinecol = len(line_cols)
             return [ line_cols[c] if c < nblinecol else default for c in col ]
         else:
-            line_cols = cls.split(text,sep, *args,**kwargs)
             if line_cols is None:
                 return default
             nblinecol = len(line_cols)
@@ -303,9 +344,26 @@ class cutre(cut):
         >>> mysep = re.compile(r'[\s|]+')
         >>> s | cutre(mysep)
         [['col1.1', 'col1.2', 'col1.3'], ['col2.1', 'col2.2', 'col2.3']]
+        >>> ['a => 1', 'b', 'c => 3'] | cutre(r'\s*=>\s*', col=[0,1], default='-').tolist()
+        [['a', '1'], ['b', '-'], ['c', '3']]
     """
     sep_is_regex = True
 
+    @classmethod
+    def line_fn(cls, sep=None, col=None, default='', *args,**kwargs):
+        sep = compile_regex(sep,cls.flags)
+        fn = super(cutre, cls).line_fn(sep, col, default, *args,**kwargs)
+        literal = required_literal(sep)
+        if literal is None:
+            return fn
+        # a line without the literal the separator requires is not split : it is its only column
+        if isinstance(col, str):
+            col = [int(i) for i in col.split(',')]
+        columns = cls.columns
+        line_type = type(literal)
+        return lambda line: ( fn(line) if literal in line or not isinstance(line, line_type)
+                              else columns([line], col, default) )
+
     @classmethod
     def split(cls, text, sep, maxsplit=0, *args,**kwargs):
         return sep.split(text,maxsplit)
@@ -8,8 +8,11 @@
 """ This module gathers text operations that are wrapped from standard python functions """
 
 from textops import TextOp, WrapOp, WrapOpStr, WrapOpIter
+import textops
 import re
 
+__all__ = ['dosort', 'doreverse', 'getmax', 'getmin', 'alltrue', 'anytrue', 'linenbr', 'resub']
+
 class dosort(WrapOpIter):
     r"""Sort input text
 
@@ -21,6 +24,9 @@ class dosort(WrapOpIter):
             The default value is None (compare the elements directly).
         reverse(bool): If set to True, then the list elements are sorted as if each comparison
             were reversed.
+        max_memory(int): if specified, the input text is sorted within this memory budget in bytes
+            by :func:`textops.ops.listops.external_sort` : above it, sorted runs are written in
+            temporary files then merged (Default : None)
 
     Returns:
         generator: The sorted input text
@@ -40,9 +46,24 @@ class dosort(WrapOpIter):
         [('c', 1), ('b', 2), ('a', 3)]
         >>> [{'k':3},{'k':1},{'k':2}] >> dosort(key=lambda x:x['k'])
         [{'k': 1}, {'k': 2}, {'k': 3}]
+        >>> 'a\nd\nc\nb' >> dosort(reverse=True, max_memory=100)
+        ['d', 'c', 'b', 'a']
     """
     fn=sorted
 
+    @classmethod
+    def op(cls, text, key=None, reverse=False, max_memory=None, *args,**kwargs):
+        if max_memory is not None:
+            return textops.ops.listops.external_sort(cls._tolist(text), key, reverse, max_memory)
+        return sorted(cls._tolist(text), key=key, reverse=reverse)
+
+    @classmethod
+    def merge_step(cls, step, next_step):
+        """Merges ``dosort().head(n)`` into :class:`textops.bottomk` or :class:`textops.topk`"""
+        return textops.ops.listops._merge_sort_head(step, next_step,
+                                           lambda key=None, reverse=False, *args,**kwargs:
+                                           (key, reverse))
+
 class doreverse(WrapOpIter):
     r"""reverse input text
 